@@ -0,0 +1,54 @@
+"""
+Per-item overhead of array validation.
+
+    $ python benchmarks/arrays.py
+
+Compares the all-items qualifier ('*') to the equivalent callable qualifier
+and to the cost of running the item schema directly in a Python loop. The
+'*' row runs the item loop, the vectorized checks of `vino.vectorized`
+(with NumPy) have a row of their own.
+"""
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vino import arr, prim, is_int
+from vino import vectorized as vec
+
+
+def per_item(fnc, size, repeat):
+    best = min(timeit.repeat(fnc, number=1, repeat=repeat))
+    return best / size * 1e9
+
+
+def main():
+    item = prim(is_int)
+    schemas = [
+        ("apply_to('*')", arr(item.apply_to('*'))),
+        ('apply_to(callable)', arr(item.apply_to(lambda i, d: True))),
+    ]
+    print('{:<22} {:>12} {:>12}'.format('', '10k ns/item', '1M ns/item'))
+    results = {}
+    for size, repeat in ((10**4, 20), (10**6, 3)):
+        data = list(range(size))
+        item_run = item.run
+        results.setdefault('python loop', []).append(per_item(
+            lambda: [item_run(d, None) for d in data], size, repeat))
+        min_length, vec.min_length = vec.min_length, float('inf')
+        try:
+            for name, schema in schemas:
+                results.setdefault(name, []).append(per_item(
+                    lambda: schema.validate(data), size, repeat))
+        finally:
+            vec.min_length = min_length
+        if vec.np is not None:
+            schema = schemas[0][1]
+            results.setdefault("apply_to('*') numpy", []).append(per_item(
+                lambda: schema.validate(data), size, repeat))
+    for name, (small, large) in results.items():
+        print('{:<22} {:>12.0f} {:>12.0f}'.format(name, small, large))
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Batch validation of many small documents.
+
+    $ python benchmarks/batch.py
+
+Compares `validate_many()` to a plain loop over `validate()`, with and
+without automatic garbage collection, for the interpreted and compiled
+engines.
+"""
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vino import obj, arr, prim, is_str, is_int, errors, unmatched_properties
+
+
+def loop(schema, documents):
+    values, failed = [], {}
+    for i, data in enumerate(documents):
+        try:
+            values.append(schema.validate(data))
+        except errors.ValidationError as e:
+            failed[i] = e
+    return values, failed
+
+
+def per_document(fnc, size, repeat):
+    best = min(timeit.repeat(fnc, number=1, repeat=repeat))
+    return best / size * 1e6
+
+
+def main(size=50000):
+    user = obj(
+        prim(is_str).apply_to('name', 'email'),
+        prim(is_int).apply_to('age'),
+        arr(prim(is_str).apply_to('*')).apply_to('tags'),
+        unmatched_properties('remove'),
+    )
+    documents = [{'name': 'user', 'email': 'user@example.com',
+                  'age': 'x' if i%100==0 else i, 'tags': ['a', 'b'],
+                  'extra': i} for i in range(size)]
+    print('{:<34} {:>12}'.format('', 'us/document'))
+    for engine, schema in (('interpreted', user), ('compiled', user.compile())):
+        cases = (
+            ('loop', lambda: loop(schema, documents)),
+            ('validate_many', lambda: schema.validate_many(documents)),
+            ('validate_many, gc off', lambda: schema.validate_many(
+                documents, gc_threshold=0)),
+        )
+        for name, fnc in cases:
+            print('{:<34} {:>12.2f}'.format(
+                '{} {}'.format(engine, name), per_document(fnc, size, 5)))
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Arrays of flat objects validated object by object, or by columns.
+
+    $ python benchmarks/columnar.py
+"""
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vino import arr, obj, prim, is_int, is_str, between, one_of
+from vino import unmatched_properties
+
+
+def best(fnc, repeat=3):
+    rv = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fnc()
+        rv.append(time.perf_counter() - start)
+    return min(rv)
+
+
+def main():
+    size = 10**5
+    schema = arr(obj(
+        prim(is_int, between(0)).apply_to('ts'),
+        prim(is_str, one_of('click', 'view')).apply_to('kind'),
+        prim(is_str).apply_to('user'),
+        unmatched_properties('remove'),
+    ).apply_to('*'))
+    rows = [{'ts': i, 'kind': 'view', 'user': 'u{}'.format(i % 100),
+             'debug': True} for i in range(size)]
+    cases = [
+        ('objects', schema),
+        ('objects, compiled', schema.compile()),
+        ('columnar', schema.columnar()),
+        ('columnar, as_columns', schema.columnar(as_columns=True)),
+    ]
+    for name, s in cases:
+        print('{:<22} {:>8.0f} ns/object'.format(
+            name, best(lambda: s.validate(rows)) / size * 1e9))
+
+
+if __name__=='__main__':
+    main()
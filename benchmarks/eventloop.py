@@ -0,0 +1,54 @@
+"""
+Event loop stalls while validating a large array.
+
+    $ python benchmarks/eventloop.py
+
+Validates a 200k-item array with `validate_async()` while another task
+measures how late the event loop wakes it up, with and without cooperative
+yielding.
+"""
+import os
+import sys
+import time
+import asyncio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vino import arr, obj, prim, is_int, is_str
+
+
+async def measure(schema, data, **kwargs):
+    lags = []
+    async def probe():
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(0)
+            lags.append(time.perf_counter() - started)
+    task = asyncio.ensure_future(probe())
+    await asyncio.sleep(0)
+    started = time.perf_counter()
+    await schema.validate_async(data, **kwargs)
+    elapsed = time.perf_counter() - started
+    # the probe's last wake up
+    await asyncio.sleep(0)
+    task.cancel()
+    return elapsed, max(lags)
+
+
+def main(size=200000):
+    schema = arr(obj(
+        prim(is_int).apply_to('id'),
+        prim(is_str).apply_to('name'),
+    ).apply_to('*'))
+    data = [{'id': i, 'name': 'n'} for i in range(size)]
+    print('{:<28} {:>10} {:>14}'.format('', 'total ms', 'max stall ms'))
+    for name, kwargs in (
+            ('validate_async', {}),
+            ('yield_every=1000', {'yield_every': 1000}),
+            ('yield_interval=0.005', {'yield_interval': 0.005})):
+        elapsed, stall = asyncio.run(measure(schema, data, **kwargs))
+        print('{:<28} {:>10.1f} {:>14.2f}'.format(
+            name, elapsed * 1e3, stall * 1e3))
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+Validation of one schema shared by many threads.
+
+    $ python benchmarks/threads.py
+
+Splits a batch of documents between 1, 2, 4, 8 and 16 threads of a
+`ThreadPoolExecutor`, all validating with the same schema. On a free-threaded
+build of CPython (3.13t and later) the throughput should grow with the
+number of threads, up to the number of cores. With the GIL it stays flat.
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vino import obj, arr, prim, is_str, is_int, unmatched_properties
+
+
+def validate_all(schema, documents):
+    validate = schema.validate
+    for data in documents:
+        validate(data)
+
+
+def throughput(schema, documents, workers):
+    chunks = [documents[i::workers] for i in range(workers)]
+    with ThreadPoolExecutor(workers) as executor:
+        started = time.perf_counter()
+        list(executor.map(lambda c: validate_all(schema, c), chunks))
+        return len(documents) / (time.perf_counter() - started)
+
+
+def main(size=100000):
+    user = obj(
+        prim(is_str).apply_to('name', 'email'),
+        prim(is_int).apply_to('age'),
+        arr(prim(is_str).apply_to('*')).apply_to('tags'),
+        unmatched_properties('remove'),
+    )
+    documents = [{'name': 'user', 'email': 'user@example.com', 'age': i,
+                  'tags': ['a', 'b'], 'extra': i} for i in range(size)]
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print('GIL {}, {} CPUs'.format('enabled' if gil else 'disabled',
+                                   os.cpu_count()))
+    print('{:<14} {:>8} {:>14} {:>8}'.format(
+        '', 'threads', 'documents/s', 'speedup'))
+    for engine, schema in (('interpreted', user), ('compiled', user.compile())):
+        base = None
+        for workers in (1, 2, 4, 8, 16):
+            rate = throughput(schema, documents, workers)
+            base = base or rate
+            print('{:<14} {:>8} {:>14.0f} {:>8.2f}'.format(
+                engine, workers, rate, rate / base))
+
+
+if __name__=='__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Arrays of primitives validated item by item, or vectorized with NumPy.
+
+    $ python benchmarks/vectorized.py
+"""
+import os
+import sys
+import timeit
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vino import arr, prim, is_int, is_str, between, one_of, maxlength
+from vino import vectorized as vec
+
+
+def per_item(fnc, size, repeat):
+    best = min(timeit.repeat(fnc, number=1, repeat=repeat))
+    return best / size * 1e9
+
+
+def main():
+    size = 10**5
+    cases = [
+        ('ints in range', arr(prim(is_int, between(0, size)).apply_to('*')),
+         list(range(size))),
+        ('floats in range', arr(prim(between(0, 1)).apply_to('*')),
+         [i / size for i in range(size)]),
+        ('tags', arr(prim(is_str, maxlength(8), one_of('a', 'b', 'c')
+                          ).apply_to('*')), ['a', 'b', 'c'] * (size // 3)),
+    ]
+    print('{:<18} {:>14} {:>14}'.format('', 'items ns/item',
+                                        'numpy ns/item'))
+    for name, schema, data in cases:
+        vec.min_length = float('inf')
+        items = per_item(lambda: schema.validate(data), len(data), 3)
+        vec.min_length = 256
+        vectorized = per_item(lambda: schema.validate(data), len(data), 3)
+        print('{:<18} {:>14.0f} {:>14.0f}'.format(name, items, vectorized))
+
+
+if __name__=='__main__':
+    main()
@@ -4,6 +4,7 @@ import random
 from string import ascii_letters, digits
 from vino import errors as err
 from vino import contexts as ctx
+from vino import compiler as cpl
 
 def pytest_itemcollected(item):
     par = item.parent.obj
@@ -58,3 +59,40 @@ def fails_continue():
     def fail3(value, state):
         raise err.ValidationError('third failure', interrupt_validation=False)
     return fail1, fail2, fail3
+
+@pytest.fixture(params=['interpreted', 'compiled'])
+def engine(request):
+    """ Runs a functional test against both the interpreted and the compiled
+    engines. Schemas (or Contexts) are wrapped with `engine(schema)` before
+    validating.
+    """
+    if request.param=='compiled':
+        return cpl.compile_schema
+    return lambda schema: schema
+
+def outcome(fnc, *args):
+    """ The outcome of `fnc(*args)`, in a form that compares across engines:
+    `('ok', value, keys)`, with the keys of a dict in their order, or
+    `('error', type, message, messages, data, index)` of the ValidationError
+    raised, `index` being the one of its first error, if any.
+    """
+    try:
+        return succeeded(fnc(*args))
+    except err.ValidationError as e:
+        return failed(e)
+
+async def outcome_async(fnc, *args):
+    """ `outcome()` of a coroutine function """
+    try:
+        return succeeded(await fnc(*args))
+    except err.ValidationError as e:
+        return failed(e)
+
+def succeeded(value):
+    return 'ok', value, list(value) if isinstance(value, dict) else None
+
+def failed(e):
+    errors = list(e) if isinstance(e, err.ValidationErrorStack) else [e]
+    index = getattr(errors[0], 'index', None) if errors else None
+    return ('error', type(e), str(e), [str(x) for x in errors],
+            getattr(e, 'data', None), index)
@@ -30,7 +30,10 @@ class TestPrimitiveTypeProcessor:
         with pytest.raises(err.ValidationError) as exc:
             p.run({'a': 'e'}, None)
         assert err_msg in str(exc.value).lower()
-        #TODO: what happens with byte type
+
+    def test_accepts_bytes(s):
+        p = vld.PrimitiveTypeProcessor()
+        assert p.run(b'\x00\x01', None)==b'\x00\x01'
 
 class TestArrayTypeProcessor:
     def test_can_validate_listlike_data(s):
@@ -46,6 +49,18 @@ class TestArrayTypeProcessor:
             rv = p.run(f(s), None)
             assert rv==list(s)
 
+    def test_unpacks_buffers_to_lists(s):
+        import array
+        p = vld.ArrayTypeProcessor()
+        assert p.run(array.array('l', [1, 2]), None)==[1, 2]
+        assert p.run(memoryview(b'ab'), None)==[97, 98]
+
+    def test_rejects_bytes(s):
+        p = vld.ArrayTypeProcessor()
+        for data in [b'abcd', bytearray(b'abcd')]:
+            with pytest.raises(err.ValidationError):
+                p.run(data, None)
+
     def test_accepts_empty_list(s):
         p = vld.ArrayTypeProcessor()
         p.run([], None)
@@ -162,3 +177,13 @@ class TestObjectTypeProcessor:
         assert 'wrong data type' in e.value.args[0].lower()
         assert 'got "tuple"' in e.value.args[0].lower()
 
+
+    def test_owned_objects_are_handed_over_once(s):
+        p = vld.ObjectTypeProcessor()
+        value = {'a': 1}
+        token = vld.owned_objects.set({id(value): value})
+        try:
+            assert p.run(value, None) is value
+            assert p.run(value, None) is not value
+        finally:
+            vld.owned_objects.reset(token)
@@ -0,0 +1,122 @@
+import pytest
+from vino import errors as err
+from vino import utils as uls
+from vino.processors import validating as vld
+from vino.processors import marshalling as msh
+
+
+class TestBetween:
+
+    @pytest.mark.parametrize('data', [0, 5, 10, 2.5, True, None])
+    def test_accepts_values_within_bounds(s, data):
+        assert vld.between(0, 10).run(data)==data
+
+    @pytest.mark.parametrize('data', [-1, 10.5, '5', [5]])
+    def test_rejects_other_values(s, data):
+        with pytest.raises(err.ValidationError):
+            vld.between(0, 10).run(data)
+
+    def test_bounds_are_optional(s):
+        assert vld.between(maximum=0).run(-10**9)==-10**9
+        assert vld.between(0).run(10**9)==10**9
+
+
+class TestOneOf:
+
+    @pytest.mark.parametrize('data', ['a', 1, None])
+    def test_accepts_listed_values(s, data):
+        assert vld.one_of('a', 1).run(data)==data
+
+    @pytest.mark.parametrize('data', ['b', 2, [1]])
+    def test_rejects_other_values(s, data):
+        with pytest.raises(err.ValidationError) as e:
+            vld.one_of('a', 'c').run(data)
+        assert str(e.value)=="data must be one of 'a', 'c'"
+
+
+class TestMaxLength:
+
+    def test_truncates_longer_data(s):
+        assert msh.maxlength(3).run('abcdef', None)=='abc'
+        assert msh.maxlength(2).run(b'abc', None)==b'ab'
+        assert msh.maxlength(2).run([1, 2, 3], None)==[1, 2]
+
+    def test_returns_shorter_data_as_is(s):
+        data = [1, 2]
+        assert msh.maxlength(2).run(data, None) is data
+        assert msh.maxlength().run(data, None) is data
+
+    def test_rejects_longer_data_without_truncating(s):
+        with pytest.raises(err.ValidationError) as e:
+            msh.maxlength(2, truncate=False).run('abc', None)
+        assert str(e.value)=='data must not be longer than 2'
+        assert msh.maxlength(3, truncate=False).run('abc', None)=='abc'
+
+    @pytest.mark.parametrize('data', [None, uls._undef])
+    def test_missing_data_passes(s, data):
+        assert msh.maxlength(2).run(data, None) is data
+
+    def test_rejects_data_without_length(s):
+        with pytest.raises(err.ValidationError) as e:
+            msh.maxlength(2).run(12345, None)
+        assert 'wrong data type' in str(e.value)
+
+    def test_numpy_arrays_are_truncated_to_views(s):
+        np = pytest.importorskip('numpy')
+        data = np.arange(10)
+        rv = msh.maxlength(4).run(data, None)
+        assert rv.tolist()==[0, 1, 2, 3] and rv.base is data
+
+
+class TestTypedArray:
+
+    @pytest.mark.parametrize('typecode, data', [
+        ('b', [-128, 127, True]),
+        ('B', [0, 255]),
+        ('Q', [0, 2**64 - 1]),
+        ('f', [0.1, 2**24, -2**24, float('inf'), float('nan')]),
+        ('d', [0.1, 2**53, 2**60, 1e308]),
+        ('l', []),
+    ])
+    def test_packs_numbers_that_fit(s, typecode, data):
+        import array
+        rv = msh.typed_array(typecode).run(data)
+        assert isinstance(rv, array.array) and rv.typecode==typecode
+        assert len(rv)==len(data)
+
+    @pytest.mark.parametrize('typecode, data, index, reason', [
+        ('b', [1, 128], 1, 'out of range'),
+        ('B', [-1], 0, 'out of range'),
+        ('l', [1, 2.0], 1, 'not an integer'),
+        ('l', [1, '2'], 1, 'not a number'),
+        ('d', [None], 0, 'not a number'),
+        ('f', [1, 2**24 + 1], 1, 'not exactly representable'),
+        ('d', [2**53 + 1], 0, 'not exactly representable'),
+        ('f', [float('nan'), 1e39], 1, 'out of range'),
+    ])
+    def test_rejects_items_that_dont_fit(s, typecode, data, index, reason):
+        with pytest.raises(err.ValidationError) as e:
+            msh.typed_array(typecode).run(data)
+        assert e.value.index==index
+        assert str(e.value).endswith(reason)
+
+    def test_packed_arrays_are_returned_as_is(s):
+        import array
+        data = array.array('h', [1, 2])
+        assert msh.typed_array('h').run(data) is data
+        rv = msh.typed_array('l').run(data)
+        assert rv.typecode=='l' and rv.tolist()==[1, 2]
+
+    def test_numpy_dtypes(s):
+        np = pytest.importorskip('numpy')
+        rv = msh.typed_array(dtype='int16').run([1, -2, 3])
+        assert rv.dtype==np.int16 and rv.tolist()==[1, -2, 3]
+        with pytest.raises(err.ValidationError):
+            msh.typed_array(dtype='uint8').run([256])
+
+    @pytest.mark.parametrize('kwargs', [
+        {}, {'typecode': 'l', 'dtype': 'int64'}, {'typecode': 'u'},
+    ])
+    def test_invalid_declarations(s, kwargs):
+        with pytest.raises(err.VinoError):
+            msh.typed_array(**kwargs)
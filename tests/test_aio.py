@@ -0,0 +1,368 @@
+import asyncio
+import pytest
+from vino import aio
+from vino import errors as err
+from vino import schema as shm
+from vino import qualifiers as qls
+from vino.processors import validating as vld
+from vino.processors import marshalling as msh
+from .conftest import outcome, outcome_async, failed
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def sync_version(fnc):
+    # the coroutine function as a plain function, for parity checks
+    def rv(*args, **kwargs):
+        coroutine = fnc(*args, **kwargs)
+        try:
+            coroutine.send(None)
+        except StopIteration as e:
+            return e.value
+        raise AssertionError('suspended')
+    return rv
+
+async def positive(data, state):
+    if data<=0:
+        raise err.ValidationError('not positive: {}'.format(data))
+    return data
+
+async def doubled(data, state):
+    return data * 2
+
+def make_schema(check, double):
+    return shm.obj(
+        shm.prim(vld.is_int, check).apply_to('a', 'b'),
+        shm.prim(vld.is_int, double).apply_to(qls.prefix('x_')),
+        shm.arr(shm.prim(vld.is_int, check).apply_to('*'),
+                (double, 0)).apply_to('items'),
+        shm.dictof(shm.prim(check)).apply_to('scores'),
+        msh.unmatched_properties('remove'),
+    )
+
+
+class TestValidateAsync:
+
+    @pytest.mark.parametrize('data', [
+        {'a': 1, 'b': 2, 'x_1': 3, 'items': [1, 2, 3], 'scores': {'s': 1},
+         'other': 0},
+        {'a': 1, 'b': -2, 'items': [1, 2]},
+        {'a': 1, 'b': 2, 'items': [1, -2, -3]},
+        {'a': 1, 'b': 2, 'scores': {'s': 0}},
+        {'a': 'x', 'b': 2},
+        [],
+    ])
+    def test_same_outcome_as_validate(s, data):
+        async_schema = make_schema(positive, doubled)
+        sync_schema = make_schema(sync_version(positive),
+                                  sync_version(doubled))
+        expected = outcome(sync_schema.validate, data)
+        assert run(outcome_async(async_schema.validate_async, data))==expected
+        compiled = async_schema.compile()
+        assert run(outcome_async(compiled.validate_async, data))==expected
+
+    def test_sync_schemas_go_through_validate(s, mocker):
+        schema = make_schema(sync_version(positive), sync_version(doubled))
+        engine = mocker.patch.object(aio, 'AsyncEngine')
+        spy = mocker.spy(schema.runners, 'run')
+        data = {'a': 1, 'b': 2, 'items': [1], 'scores': {'s': 1}}
+        assert run(schema.validate_async(data))==schema.validate(data)
+        assert spy.call_count==2
+        assert not engine.called
+
+    def test_members_are_awaited_concurrently(s):
+        both = []
+        async def meet(data, state):
+            # completes once both members are awaited
+            both.append(data)
+            while len(both)<2:
+                await asyncio.sleep(0)
+            return data
+        schema = shm.obj(shm.prim(meet).apply_to('a'),
+                         shm.prim(vld.is_int, meet).apply_to('b'))
+        rv = run(asyncio.wait_for(schema.validate_async({'a': 1, 'b': 2}), 1))
+        assert rv=={'a': 1, 'b': 2}
+
+    def test_limit(s):
+        running, peak = [0], [0]
+        async def slow(data, state):
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            await asyncio.sleep(0.001)
+            running[0] -= 1
+            return data
+        schema = shm.arr(shm.prim(slow).apply_to('*'))
+        assert run(schema.validate_async(list(range(20)), limit=3))==list(
+            range(20))
+        assert peak[0]==3
+
+    def test_callbacks(s):
+        async def default(data, state):
+            return 'default'
+        async def failsafe(data, state):
+            return 0
+        schema = shm.obj(
+            shm.prim(vld.required(default=default)).apply_to('a'),
+            shm.prim(vld.is_int(failsafe=failsafe)).apply_to('b'),
+        )
+        assert run(schema.validate_async({'b': 'x'}))=={'a': 'default', 'b': 0}
+
+    def test_failing_members_dont_await_lookups_again(s):
+        lookups = []
+        async def lookup(data, state):
+            lookups.append(data)
+            return data
+        def nested(lookup):
+            rv = shm.prim(vld.is_int)
+            for i in range(3):
+                rv = shm.obj(shm.prim(lookup).apply_to('a'),
+                             shm.prim(vld.is_int).apply_to('b'),
+                             rv.apply_to('n'))
+            return rv
+        data = 'x'
+        for i in range(3):
+            data = {'a': i, 'b': 'y' if i==2 else i, 'n': data}
+        expected = outcome(nested(sync_version(lookup)).validate, data)
+        del lookups[:]
+        assert run(outcome_async(nested(lookup).validate_async, data)
+                   )==expected
+        assert len(lookups)==3
+
+
+class TestOffload:
+
+    def test_independent_members_run_on_threads(s):
+        import threading
+        barrier = threading.Barrier(2, timeout=5)
+        def meet(data, state):
+            # blocks until both members are being validated
+            barrier.wait()
+            return data.upper()
+        schema = shm.obj(shm.prim(vld.is_str, aio.offload(meet)).apply_to('a'),
+                         shm.prim(aio.offload(meet)).apply_to('b'))
+        assert schema.validate_offloaded({'a': 'x', 'b': 'y'})=={
+            'a': 'X', 'b': 'Y'}
+        assert schema.compile().validate_offloaded({'a': 'x', 'b': 'y'})=={
+            'a': 'X', 'b': 'Y'}
+
+    def test_order_of_items_and_errors(s):
+        import time
+        def slow_check(data, state):
+            time.sleep((10 - data) / 2000)
+            if data in (4, 7):
+                raise err.ValidationError('failed {}'.format(data))
+            return data * 2
+        schema = shm.arr(shm.prim(aio.offload(slow_check)).apply_to('*'))
+        assert schema.validate_offloaded(list(range(4)))==[0, 2, 4, 6]
+        data = list(range(10))
+        expected = outcome(schema.validate, data)
+        assert 'failed 4' in expected[2]
+        assert outcome(schema.validate_offloaded, data, 3)==expected
+
+    def test_callbacks_of_offloaded_processors(s):
+        check = aio.offload(vld.is_int(failsafe=lambda data, state: 0))
+        schema = shm.obj(shm.prim(check).apply_to('a'))
+        assert schema.validate_offloaded({'a': 'x'})=={'a': 0}
+
+    def test_offloaded_with_coroutines(s):
+        schema = make_schema(positive, aio.offload(sync_version(doubled)))
+        data = {'a': 1, 'b': 2, 'x_1': 3, 'items': [1, 2], 'scores': {'s': 1}}
+        assert run(schema.validate_async(data))==schema.validate_offloaded(
+            data)=={'a': 1, 'b': 2, 'x_1': 6, 'items': [2, 2],
+                    'scores': {'s': 1}}
+
+
+class TestCooperative:
+
+    @pytest.mark.parametrize('data', [
+        {'a': 1, 'b': 2, 'x_1': 3, 'items': [1, 2, 3], 'scores': {'s': 1},
+         'other': 0},
+        {'a': 1, 'b': 2, 'items': [1, -2, -3], 'scores': {}},
+        {'a': 1, 'b': 2, 'items': [1], 'scores': {'s': 0}},
+    ])
+    @pytest.mark.parametrize('check, double', [
+        (sync_version(positive), sync_version(doubled)),
+        (positive, doubled),
+    ])
+    def test_same_outcome_as_validate(s, data, check, double):
+        schema = make_schema(check, double)
+        sync_schema = make_schema(sync_version(positive),
+                                  sync_version(doubled))
+        expected = outcome(sync_schema.validate, data)
+        for kwargs in ({'yield_every': 1}, {'yield_interval': 0}):
+            assert run(outcome_async(
+                lambda d: schema.validate_async(d, **kwargs), data))==expected
+
+    def test_event_loop_keeps_running(s):
+        schema = shm.arr(shm.obj(
+            shm.arr(shm.prim(vld.is_int).apply_to('*')).apply_to('values')
+        ).apply_to('*'))
+        data = [{'values': list(range(100))} for i in range(100)]
+        async def main(**kwargs):
+            ticks = []
+            async def ticker():
+                while True:
+                    ticks.append(None)
+                    await asyncio.sleep(0)
+            task = asyncio.ensure_future(ticker())
+            await asyncio.sleep(0)
+            rv = await schema.validate_async(data, **kwargs)
+            task.cancel()
+            return rv, len(ticks)
+        rv, ticks = run(main())
+        assert rv==data and ticks==1
+        rv, ticks = run(main(yield_every=100))
+        assert rv==data
+        # 100 objects, their 100 members and 10000 numbers, each array of
+        # numbers being validated in one go
+        assert ticks==1 + 100
+        rv, ticks = run(main(yield_every=10))
+        assert rv==data
+        # arrays longer than yield_every are traversed
+        assert ticks==1 + 1020
+
+
+class TestBatched:
+
+    @pytest.fixture
+    def users(s):
+        import sqlite3
+        db = sqlite3.connect(':memory:')
+        db.execute('create table users (id integer primary key)')
+        db.executemany('insert into users values (?)',
+                       [(i,) for i in range(0, 100, 2)])
+        queries = []
+        db.set_trace_callback(queries.append)
+        def existing(ids):
+            rows = db.execute('select id from users where id in ({})'.format(
+                ','.join('?' * len(ids))), ids)
+            found = {r[0] for r in rows}
+            return [i if i in found else err.ValidationError(
+                'unknown user {}'.format(i)) for i in ids]
+        return existing, queries
+
+    def make_schema(s, existing, **kwargs):
+        check = aio.batched(existing, **kwargs)
+        return shm.obj(
+            shm.prim(vld.is_int, check).apply_to('owner'),
+            shm.arr(shm.prim(vld.is_int, check).apply_to('*')
+                    ).apply_to('members'),
+        )
+
+    def test_one_query_per_traversal(s, users):
+        existing, queries = users
+        schema = s.make_schema(existing)
+        data = {'owner': 0, 'members': list(range(0, 40, 2))}
+        assert schema.validate(data)==data
+        assert len(queries)==21
+        del queries[:]
+        assert run(schema.validate_async(data))==data
+        assert len(queries)==1
+
+    def test_errors_per_value(s, users):
+        existing, queries = users
+        schema = s.make_schema(existing)
+        data = {'owner': 0, 'members': [2, 3, 4, 5]}
+        expected = outcome(schema.validate, data)
+        del queries[:]
+        assert run(outcome_async(schema.validate_async, data))==expected
+        assert 'unknown user 3' in expected[2]
+        assert len(queries)==1
+
+    def test_documents_of_a_batch(s, users):
+        existing, queries = users
+        schema = s.make_schema(existing, max_size=25)
+        documents = [{'owner': i * 2, 'members': [i * 2, i * 2 + 1]}
+                     for i in range(20)]
+        rv = run(schema.validate_many_async(documents))
+        # 40 distinct values in batches of at most 25
+        assert len(queries)==2
+        assert sorted(rv.errors)==list(range(20))
+        documents = [{'owner': i * 2, 'members': [i * 2]} for i in range(20)]
+        rv = run(schema.validate_many_async(documents))
+        assert rv.ok and rv.values==documents
+        del queries[:]
+        rv = run(schema.compile().validate_many_async(documents))
+        assert rv.ok and rv.values==documents
+        assert len(queries)==1
+
+    def test_windows_of_a_generator(s, users):
+        existing, queries = users
+        schema = s.make_schema(existing)
+        taken = []
+        def documents():
+            for i in range(25):
+                taken.append(i)
+                yield {'owner': i * 2, 'members': [i * 2]}
+        for validator in (schema, schema.compile()):
+            del queries[:]
+            rv = run(validator.validate_many_async(documents(), window=10))
+            # a batch per window
+            assert len(queries)==3
+            assert rv.ok and len(rv)==25
+            assert rv.values==[{'owner': i * 2, 'members': [i * 2]}
+                               for i in range(25)]
+        async def stream():
+            del taken[:]
+            rv = []
+            async for i, value, e in aio.validate_windows(
+                    schema, documents(), window=10):
+                # the documents are taken a window at a time
+                assert len(taken)==(i // 10 + 1) * 10 or len(taken)==25
+                rv.append((i, e is None))
+            return rv
+        assert run(stream())==[(i, True) for i in range(25)]
+
+    def test_errors_of_a_window_are_indexed_in_the_batch(s, users):
+        existing, queries = users
+        schema = s.make_schema(existing)
+        documents = ({'owner': i, 'members': [0]} for i in range(25))
+        rv = run(schema.validate_many_async(documents, window=10))
+        assert sorted(rv.errors)==list(range(1, 25, 2))
+        assert [i for i, value in rv.items()]==list(range(0, 25, 2))
+
+    def test_coroutine_batches_and_nested_objects(s):
+        calls = []
+        async def double(values):
+            calls.append(values)
+            await asyncio.sleep(0)
+            return [v * 2 for v in values]
+        check = aio.batched(double)
+        schema = shm.arr(shm.obj(
+            shm.prim(check).apply_to('a'),
+            shm.arr(shm.prim(check).apply_to('*')).apply_to('b'),
+        ).apply_to('*'))
+        data = [{'a': i, 'b': [i, i + 1]} for i in range(5)]
+        assert run(schema.validate_async(data))==[
+            {'a': i * 2, 'b': [i * 2, i * 2 + 2]} for i in range(5)]
+        # 15 values, 6 distinct
+        assert calls==[[0, 1, 2, 3, 4, 5]]
+        with pytest.raises(err.VinoError):
+            schema.validate(data)
+
+    def test_equal_values_of_different_types(s):
+        calls = []
+        def identity(values):
+            calls.append(values)
+            return values
+        schema = shm.arr(shm.prim(aio.batched(identity)).apply_to('*'))
+        data = [1, True, 1.0, 1]
+        rv = run(schema.validate_async(data))
+        assert [type(v) for v in rv]==[int, bool, float, int]
+        assert calls==[[1, True, 1.0]]
+
+    def test_validate_many(s, users):
+        existing, queries = users
+        schema = s.make_schema(existing)
+        documents = [{'owner': i * 2, 'members': [i * 2, i * 2 + 1]}
+                     for i in range(20)]
+        expected = [outcome(schema.validate, d) for d in documents]
+        for validator in (schema, schema.compile()):
+            del queries[:]
+            rv = validator.validate_many(documents)
+            assert len(queries)==1
+            assert sorted(rv.errors)==list(range(20))
+            assert [failed(e) for i, e in sorted(rv.errors.items())
+                    ]==expected
+
@@ -0,0 +1,123 @@
+import collections
+import pytest
+from vino import columnar as col
+from vino import errors as err
+from vino import schema as shm
+from vino import qualifiers as qls
+from vino.processors import validating as vld
+from vino.processors import marshalling as msh
+from .conftest import outcome
+
+
+def failing_index(schema, data):
+    with pytest.raises(err.ValidationErrorStack) as e:
+        schema.validate(data)
+    return e.value[0].index
+
+def records(*processors):
+    return shm.arr(shm.obj(
+        shm.prim(vld.is_int, vld.between(0)).apply_to('id'),
+        shm.prim(vld.is_str, vld.allowempty).apply_to('name', 'label'),
+        shm.prim(vld.optional(default=lambda data, state: 'new'),
+                 vld.one_of('new', 'done')).apply_to('status'),
+        shm.prim(~vld.required, lambda data, state: data * 2).apply_to('n'),
+        *processors
+    ).apply_to('*'))
+
+rows = [{'id': i, 'name': 'n{}'.format(i), 'label': '', 'status': 'done',
+         'n': i} for i in range(300)]
+partial = [{'id': i, 'name': 'x', 'label': 'y', 'other': i}
+           for i in range(300)]
+
+
+class TestColumnar:
+
+    @pytest.mark.parametrize('processors', [
+        (),
+        (msh.unmatched_properties('remove'),),
+        (msh.unmatched_properties('ignore'),),
+        (msh.unmatched_properties('raise'),),
+    ])
+    @pytest.mark.parametrize('data', [rows, partial, rows[:5], []])
+    def test_same_outcome_as_object_by_object(s, engine, processors, data):
+        schema = records(*processors)
+        expected = outcome(schema.validate, data)
+        assert outcome(engine(schema.columnar()).validate, data)==expected
+        if expected[0]=='ok':
+            assert [list(d) for d in schema.columnar().validate(data)]==[
+                list(d) for d in expected[1]]
+
+    @pytest.mark.parametrize('update, index', [
+        ((250, 'id', -1), 250),
+        ((120, 'name', 5), 120),
+        ((70, 'status', 'todo'), 70),
+        ((10, 'n', 'x'), None),
+    ])
+    def test_first_failing_object(s, engine, update, index):
+        data = [dict(d) for d in rows]
+        i, key, value = update
+        data[i][key] = value
+        data[280]['id'] = -1
+        schema = records()
+        expected = outcome(schema.validate, data)
+        assert outcome(engine(schema.columnar()).validate, data)==expected
+        assert failing_index(engine(schema.columnar()), data)==(
+            280 if index is None else index)
+
+    def test_object_level_clauses(s, engine):
+        schema = records(msh.unmatched_properties('raise'))
+        data = [{'id': 1, 'name': 'a', 'label': 'b'},
+                {'id': 2, 'name': 'a', 'label': 'b', 'extra': 0}]
+        assert failing_index(engine(schema.columnar()), data)==1
+        schema = shm.arr(shm.obj(
+            shm.prim(~vld.required).apply_to('a')).apply_to('*'))
+        assert failing_index(engine(schema.columnar()), [{'a': 1}, {}])==1
+
+    def test_as_columns(s, engine):
+        schema = engine(records(msh.unmatched_properties('remove')).columnar(
+            as_columns=True))
+        assert schema.validate(partial[:3])=={
+            'id': [0, 1, 2], 'label': ['y', 'y', 'y'], 'name': ['x', 'x', 'x'],
+            'status': ['new', 'new', 'new'], 'n': [None, None, None]}
+
+    def test_as_columns_async(s):
+        import asyncio
+        async def kind(data, state):
+            return data.upper()
+        def events(kind):
+            return shm.arr(shm.obj(
+                shm.prim(vld.is_int).apply_to('ts'),
+                shm.prim(vld.is_str, kind).apply_to('kind'),
+            ).apply_to('*')).columnar(as_columns=True)
+        data = [{'ts': i, 'kind': 'view'} for i in range(5)]
+        expected = {'ts': list(range(5)), 'kind': ['VIEW'] * 5}
+        sync = events(lambda data, state: data.upper())
+        assert sync.validate(data)==expected
+        assert asyncio.run(sync.validate_async(data, yield_every=2))==expected
+        assert asyncio.run(events(kind).validate_async(data))==expected
+
+    @pytest.mark.parametrize('item', [
+        shm.obj(shm.prim(vld.is_int).apply_to(lambda k, v: True)),
+        shm.obj(shm.prim(vld.is_int).apply_to(qls.prefix('x'))),
+        shm.obj(shm.prim(vld.is_int).apply_to('a'),
+                shm.prim(vld.between(0)).apply_to('a')),
+        shm.obj(lambda data, state: data),
+        shm.prim(vld.is_int),
+    ])
+    def test_other_schemas_object_by_object(s, engine, item):
+        schema = shm.arr(item.apply_to('*'))
+        assert col.plan(schema.runners.runners[2]['runner']) is None
+        data = [{'a': 1, 'x1': 2}, {'a': 3}]
+        if isinstance(item, shm.PrimitiveTypeSchema):
+            data = [1, 2]
+        assert outcome(engine(schema.columnar()).validate, data)==outcome(
+            schema.validate, data)
+
+    def test_other_data_object_by_object(s, engine):
+        # not dicts
+        data = [collections.OrderedDict(d) for d in partial[:2]]
+        schema = records()
+        assert engine(schema.columnar()).validate(data)==schema.validate(data)
+        assert engine(schema.columnar(as_columns=True)).validate(data)=={
+            'id': [0, 1], 'label': ['y', 'y'], 'name': ['x', 'x'],
+            'status': ['new', 'new'], 'n': [None, None]}
@@ -0,0 +1,128 @@
+import pytest
+from vino import errors as err
+from vino import schema as shm
+from vino import qualifiers as qls
+from vino import compiler as cpl
+from vino import contexts as ctx
+from vino.processors import validating as vld
+from vino.processors import marshalling as msh
+from vino.utils import _undef
+from .conftest import outcome
+
+
+def assert_parity(schema, *samples):
+    compiled = schema.compile()
+    for data in samples:
+        assert outcome(schema.validate, data)==outcome(
+            compiled.validate, data)
+
+
+@pytest.fixture
+def registration():
+    lastname = lambda k, v: k=='lastname'
+    def email_format(data, state):
+        if not '@' in data:
+            raise err.ValidationError('Email format does not seem valid')
+        return data
+    return shm.obj(
+        shm.prim(~vld.required, vld.is_str, vld.allownull,
+                 ~vld.allowempty).apply_to('firstname', lastname),
+        shm.prim(vld.required, ~vld.allownull, ~vld.allowempty, vld.is_str,
+                 email_format).apply_to('email'),
+        shm.arr(~vld.required, vld.allowempty, ~vld.allownull,
+            msh.maxlength(8),
+            shm.prim(~vld.allownull, ~vld.allowempty,
+                     vld.is_str).apply_to(range(3)),
+            shm.prim(vld.allownull, vld.is_int).apply_to(range(4,7)),
+        ).apply_to('technologies'),
+        msh.unmatched_properties('remove'),
+    )
+
+
+class TestParity:
+
+    def test_primitives(s):
+        assert_parity(shm.prim(vld.is_int), 1, 2.3, 'a', None, '', _undef)
+
+    def test_object_with_keys_and_callables(s, registration):
+        assert_parity(registration,
+            {'email': 'a@b.c'},
+            {'email': 'a@b.c', 'firstname': 'Peter', 'lastname': None,
+             'technologies': ['python', 'c', 'go', 1, 2, 3, 4, 5, 6, 7],
+             'extra': 'removed'},
+            {'email': 'nope'},
+            {'firstname': ''},
+            {'email': 'a@b.c', 'technologies': ['python', '', 3]},
+            [], 'abc', _undef)
+
+    def test_callbacks(s):
+        default = lambda data, state: 'default'
+        override = lambda data, state: data.strip() if data else data
+        def failsafe(data, state):
+            if data=='rescue':
+                return 'rescued'
+            raise err.ValidationError('no rescue')
+        def must_be_default(data, state):
+            if data not in ('default', 'rescued'):
+                raise err.ValidationError('not default')
+            return data
+        checker = vld.is_int(failsafe=failsafe)
+        schema = shm.obj(
+            shm.prim(vld.required(default=default)).apply_to('a'),
+            shm.prim(vld.required(override=override),
+                     must_be_default).apply_to('b'),
+            shm.prim(checker).apply_to('c'),
+        )
+        assert_parity(schema,
+            {'b': ' default '}, {'b': 'x'}, {'b': 'default', 'c': 'rescue'},
+            {'b': 'default', 'c': 'fails'}, {'b': 'default', 'c': 3})
+
+    def test_errors_that_do_not_interrupt_validation(s, fails_continue, tags):
+        schema = shm.prim(*(fails_continue + tags))
+        assert_parity(schema, 'abc')
+
+    def test_nested_arrays_and_objects(s):
+        point = shm.obj(
+            shm.prim(vld.is_int).apply_to('x', 'y'),
+            msh.unmatched_properties('raise'),
+        )
+        schema = shm.obj(
+            shm.arr(point.apply_to(lambda i, d: True)).apply_to('points'),
+        )
+        assert_parity(schema,
+            {'points': [{'x': 1, 'y': 2}, {'x': 3, 'y': 4}]},
+            {'points': [{'x': 1, 'y': 2}, {'x': 3}]},
+            {'points': [{'x': 1, 'y': 2, 'z': 3}]},
+            {'points': ['a']})
+
+    def test_shared_sub_schema_is_compiled_once(s):
+        name = shm.prim(vld.is_str)
+        schema = shm.obj(name.apply_to('first'), name.apply_to('last'))
+        compiled = schema.compile()
+        assert compiled.source.count('def context_')==2
+
+
+class TestCompiledSchema:
+
+    def test_can_be_nested_as_processor(s):
+        compiled = shm.prim(vld.is_int).compile()
+        schema = shm.obj((compiled, 'a'))
+        assert schema.validate({'a': 1})=={'a': 1}
+        with pytest.raises(err.ValidationErrorStack):
+            schema.validate({'a': 'b'})
+
+    def test_unknown_qualifier_stack_is_applied_as_is(s):
+        class Everything(qls.ItemQualifierStack):
+            def apply(self, data, runner, state):
+                return [runner.run(d, state) for d in data]
+        schema = ctx.Context(
+            (lambda d, s: d*2, 0), qualifier_stack_cls=Everything)
+        assert schema.validate([1, 2, 3])==[2, 4, 6]
+        assert cpl.compile_schema(schema).validate([1, 2, 3])==[2, 4, 6]
+
+    def test_rejects_contexts_that_override_run(s, context):
+        class Custom(shm.prim):
+            def run(self, data, context):
+                return data
+        with pytest.raises(err.VinoError):
+            cpl.compile_schema(Custom())
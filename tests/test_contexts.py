@@ -100,7 +100,8 @@ class TestContext:
         assert rv==(c, 'abc', 'def')
 
     # NOTE: functional test?
-    def test_validation_continues_if_interrupt_flag_not_raised(s, tags):
+    def test_validation_continues_if_interrupt_flag_not_raised(s, tags,
+                                                               engine):
         # tags are : bold, italic, and underline in that order
         def failing_processor(value, state):
             e = err.ValidationError("I'll fail you, no matter what", 
@@ -108,7 +109,7 @@ class TestContext:
             raise e
         processors = (failing_processor,) + tags
         try:
-            c = ctx.Context(*processors)
+            c = engine(ctx.Context(*processors))
             value = c.validate('some contents')
         except err.ValidationErrorStack as e:
             assert e.data=='<u><i><b>'+'some contents'+'</b></i></u>'
@@ -205,3 +206,115 @@ class TestContext:
         })
 
 
+
+
+class TestStreamContext:
+
+    def test_validates_items_lazily(s):
+        seen = []
+        def produce():
+            for i in range(3):
+                seen.append(i)
+                yield i
+        stream = ctx.StreamContext(prim(lambda data, state: data*2))
+        rv = stream.validate(produce())
+        assert seen==[]
+        assert next(rv)==0
+        assert seen==[0]
+        assert list(rv)==[2, 4]
+
+    def test_failing_item_raises_with_its_index(s):
+        from vino.processors import validating as vld
+        stream = ctx.StreamContext(prim(vld.is_int))
+        rv = stream.validate(iter([1, 2, 'x', 4]))
+        assert next(rv)==1
+        assert next(rv)==2
+        with pytest.raises(err.ValidationError) as e:
+            next(rv)
+        assert e.value.index==2
+
+    def test_on_error_skips_failing_items(s):
+        from vino.processors import validating as vld
+        errors = []
+        stream = ctx.StreamContext(
+            prim(vld.is_int), on_error=lambda i, e: errors.append(i))
+        assert list(stream.validate([1, 'a', 3, 'b']))==[1, 3]
+        assert errors==[1, 3]
+
+    def test_rejects_non_iterables(s):
+        stream = ctx.StreamContext(prim())
+        for data in (1, 'abc', {'a': 1}):
+            with pytest.raises(err.ValidationError):
+                stream.validate(data)
+        assert stream.validate(None) is None
+
+    def test_can_be_nested_as_processor(s, engine):
+        stream = ctx.StreamContext(prim(lambda data, state: data+1))
+        schema = engine(obj((stream, 'rows')))
+        rv = schema.validate({'rows': range(3)})
+        assert list(rv['rows'])==[1, 2, 3]
+
+
+class TestValidateMany:
+
+    @pytest.fixture
+    def user(s):
+        from vino.processors import validating as vld
+        from vino.processors import marshalling as msh
+        return obj(
+            prim(vld.is_str).apply_to('name'),
+            prim(~vld.required, vld.is_int).apply_to('age'),
+            msh.unmatched_properties('raise'),
+        )
+
+    @pytest.fixture
+    def documents(s):
+        return [{'name': 'a', 'age': 1}, {'name': 'b', 'x': 1},
+                {'name': 'c'}, {'age': 2}, {'name': 'e'}]
+
+    def test_collects_values_and_errors_by_index(s, user, documents, engine):
+        rv = engine(user).validate_many(documents)
+        assert len(rv)==5 and not rv.ok
+        assert rv.values==[{'name': 'a', 'age': 1}, {'name': 'c'},
+                           {'name': 'e'}]
+        assert sorted(rv.errors)==[1, 3]
+        assert list(rv.items())==[(0, rv.values[0]), (2, rv.values[1]),
+                                  (4, rv.values[2])]
+
+    def test_same_outcome_as_validating_one_by_one(s, user, documents,
+                                                   engine):
+        rv = engine(user).validate_many(documents)
+        for i, data in enumerate(documents):
+            if i in rv.errors:
+                with pytest.raises(err.ValidationErrorStack) as e:
+                    user.validate(data)
+                assert str(e.value)==str(rv.errors[i])
+            else:
+                assert user.validate(data)==rv.values.pop(0)
+
+    def test_tunes_gc_for_the_batch_only(s, user, documents, mocker):
+        import gc
+        threshold = gc.get_threshold()
+        seen = []
+        original = user.validate
+        def validate(data):
+            seen.append(gc.get_threshold()[0])
+            return original(data)
+        mocker.patch.object(user, 'validate', side_effect=validate)
+        user.validate_many(documents, gc_threshold=0)
+        assert set(seen)=={0}
+        assert gc.get_threshold()==threshold
+
+    def test_documents_do_not_share_their_state(s):
+        def first(data, state):
+            if 'seen' in state:
+                raise err.ValidationError('state of another document')
+            state['seen'] = True
+            return data
+        schema = obj(first)
+        rv = schema.validate_many([{'name': 'a'}, {'name': 'b'}])
+        assert rv.ok and len(rv)==2
+
+    def test_empty_batch(s, user, engine):
+        rv = engine(user).validate_many(iter([]))
+        assert rv.ok and len(rv)==0 and rv.values==[]
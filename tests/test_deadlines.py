@@ -0,0 +1,81 @@
+import time
+import asyncio
+import threading
+from concurrent import futures
+import pytest
+from vino import deadlines as dls
+from vino import errors as err
+from vino import schema as shm
+from vino.processors import validating as vld
+
+
+@pytest.fixture
+def schema():
+    def slow(data, state):
+        time.sleep(0.001)
+        return data
+    return shm.obj(
+        shm.arr(shm.prim(vld.is_int, slow).apply_to('*')).apply_to('items'))
+
+@pytest.fixture
+def data():
+    return {'items': list(range(1000))}
+
+class TestDeadlines:
+
+    def test_timeout(s, schema, data, engine):
+        started = time.monotonic()
+        with pytest.raises(err.ValidationTimeout) as e:
+            engine(schema).validate(data, deadline=started + 0.02)
+        assert 0.02<=e.value.elapsed<0.5
+        assert time.monotonic() - started<0.5
+        assert e.value.steps>0
+        assert 'timed out' in str(e.value)
+
+    def test_expired_deadline_stops_at_first_check(s, schema, data):
+        with pytest.raises(err.ValidationTimeout) as e:
+            schema.validate(data, deadline=time.monotonic() - 1)
+        assert e.value.steps==1
+
+    def test_cancel_from_another_thread(s, schema, data):
+        token = dls.CancelToken()
+        threading.Timer(0.02, token.cancel).start()
+        with pytest.raises(err.ValidationCancelled):
+            schema.validate(data, cancel=token)
+
+    def test_interruptions_are_not_validation_errors(s, schema, data):
+        assert not issubclass(err.ValidationInterrupted, err.ValidationError)
+        with dls.budget(deadline=time.monotonic()):
+            with pytest.raises(err.ValidationTimeout):
+                schema.validate_many([data])
+            with pytest.raises(err.ValidationTimeout):
+                schema.compile().validate_many([data])
+
+    def test_no_budget_outside_of_the_call(s, schema):
+        with pytest.raises(err.ValidationTimeout):
+            schema.validate({'items': [1]}, deadline=time.monotonic() - 1)
+        assert dls.current.get() is None
+        assert schema.validate({'items': [1]})=={'items': [1]}
+
+    def test_timeout_inside_a_chunked_array(s, data, engine):
+        def slow(data, state):
+            time.sleep(0.001)
+            return data
+        with futures.ThreadPoolExecutor(2) as pool:
+            schema = engine(shm.arr(shm.prim(vld.is_int, slow).apply_to('*')
+                                    ).chunked(pool, chunk_size=100))
+            started = time.monotonic()
+            with pytest.raises(err.ValidationTimeout):
+                schema.validate(data['items'], deadline=started + 0.02)
+            assert time.monotonic() - started<0.5
+
+    def test_budget_around_validate_async(s, data):
+        async def slow(data, state):
+            await asyncio.sleep(0.001)
+            return data
+        schema = shm.arr(shm.prim(slow).apply_to('*'))
+        async def main():
+            with dls.budget(deadline=time.monotonic() + 0.02, check_every=1):
+                return await schema.validate_async(data['items'], limit=1)
+        with pytest.raises(err.ValidationTimeout):
+            asyncio.run(main())
@@ -0,0 +1,208 @@
+import io
+import json
+import pytest
+from vino import errors as err
+from vino import schema as shm
+from vino import jsonstream as js
+from vino.processors import validating as vld
+from vino.processors import marshalling as msh
+from vino.utils import _undef
+from .conftest import outcome
+
+
+def parse(text, chunk_size=js.CHUNK_SIZE, plan=None):
+    stream = js.events(io.BytesIO(text.encode('utf-8')), chunk_size)
+    kind, value = next(stream)
+    rv = js.build(kind, value, stream, plan)
+    # check what follows the document
+    list(stream)
+    return rv
+
+
+@pytest.fixture
+def user():
+    return shm.obj(
+        shm.prim(vld.is_str).apply_to('name'),
+        shm.arr(~vld.required,
+                shm.prim(vld.is_int).apply_to('*')).apply_to('scores'),
+        msh.unmatched_properties('remove'),
+    )
+
+
+class TestTokenizer:
+
+    @pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 1024])
+    def test_builds_what_json_loads(s, chunk_size):
+        text = ('{"a": [1, -2.5, 3e2, true, false, null, "x\\"y\\u00e9\\n"],'
+                ' "b": {}, "c": [[], [{}]], "d": "été"}')
+        assert parse(text, chunk_size)==json.loads(text)
+
+    def test_scalar_documents(s):
+        for text in ('5', '-0.5', '"s"', 'true', 'null', ' [] '):
+            assert parse(text, 1)==json.loads(text)
+
+    def test_reads_text_files(s):
+        stream = js.events(io.StringIO('{"a": [1]}'), 2)
+        assert list(stream)==[
+            ('start_map', None), ('key', 'a'), ('start_array', None),
+            ('value', 1), ('end_array', None), ('end_map', None)]
+
+    @pytest.mark.parametrize('text', [
+        '[1,]', '{"a" 1}', '[1 2]', 'tru', '[', '{"a": 1}}', '01', '"abc',
+        '', '{1: 2}', '["\x01"]'])
+    def test_rejects_invalid_documents(s, text):
+        with pytest.raises(err.JSONDecodeError):
+            parse(text, 2)
+
+
+class TestLoad:
+
+    def test_same_result_as_validating_the_decoded_document(s, user):
+        for text in ('{"name": "Peter", "scores": [1, 2], "extra": [1]}',
+                     '{"name": 5, "extra": {"deep": [1]}}',
+                     '{"name": "Peter", "scores": {"a": 1}}',
+                     '{"name": ["a", "b"], "scores": "abc"}',
+                     '{"scores": [1, "a", [2]]}',
+                     '[1, 2]'):
+            loaded = outcome(js.load, io.BytesIO(text.encode()), user)
+            # errors hold what was decoded of the document so far
+            assert loaded[:4]==outcome(user.validate, json.loads(text))[:4]
+
+    def test_removed_properties_are_not_built(s, user):
+        data = parse('{"name": "a", "extra": [1, 2, {"x": 1}]}',
+                     plan=js.plan_for(user))
+        assert data=={'name': 'a', 'extra': _undef}
+
+    def test_rejected_containers_are_not_built(s, user):
+        data = parse('{"name": [1, 2, 3], "scores": [{"a": 1}]}',
+                     plan=js.plan_for(user))
+        assert data=={'name': [], 'scores': [{}]}
+
+    def test_value_qualifiers_prevent_pruning(s):
+        schema = shm.obj(
+            shm.prim().apply_to(lambda k, v: v==1),
+            msh.unmatched_properties('remove'))
+        data = parse('{"a": 1, "b": [2]}', plan=js.plan_for(schema))
+        assert data=={'a': 1, 'b': [2]}
+
+    def test_unqualified_processors_see_everything(s):
+        schema = shm.obj(
+            lambda data, state: data,
+            shm.prim().apply_to('a'),
+            msh.unmatched_properties('remove'))
+        data = parse('{"a": 1, "b": [2]}', plan=js.plan_for(schema))
+        assert data=={'a': 1, 'b': [2]}
+
+    def test_map_values_follow_their_schema(s, user):
+        data = parse('{"u1": {"name": "a", "x": 1}, "u2": []}',
+                     plan=js.plan_for(shm.dictof(user)))
+        assert data=={'u1': {'name': 'a', 'x': _undef}, 'u2': []}
+
+
+class TestIterLoad:
+
+    def test_validates_items_at_path(s, user):
+        text = '{"meta": {"n": 2}, "users": [{"name": "a", "x": 1}, {"name": "b"}]}'
+        rv = js.iterload(io.BytesIO(text.encode()), user, path=['users'], 
+                         chunk_size=4)
+        assert list(rv)==[{'name': 'a'}, {'name': 'b'}]
+
+    def test_reports_failing_items(s, user):
+        failed = []
+        text = '[{"name": "a"}, {"name": 1}, {"name": "c"}]'
+        rv = js.iterload(io.BytesIO(text.encode()), user,
+                         on_error=lambda i, e: failed.append(i))
+        assert list(rv)==[{'name': 'a'}, {'name': 'c'}]
+        assert failed==[1]
+
+    def test_missing_path(s, user):
+        with pytest.raises(err.ValidationError):
+            list(js.iterload(io.BytesIO(b'{"a": []}'), user, path=['b']))
+
+
+class TestLoads:
+
+    def make_schema(s, *members):
+        return shm.obj(
+            shm.prim(~vld.required, vld.is_str).apply_to('name'),
+            shm.arr(~vld.required, shm.obj(
+                shm.prim(vld.is_int).apply_to('x'),
+                msh.unmatched_properties('remove'),
+            ).apply_to('*')).apply_to('points'),
+            *members + (msh.unmatched_properties('remove'),)
+        )
+
+    @pytest.fixture
+    def schema(s):
+        return s.make_schema()
+
+    @pytest.mark.parametrize('closed', [True, False])
+    def test_same_result_as_validating_the_decoded_document(s, closed):
+        if closed:
+            schema = s.make_schema()
+        else:
+            schema = s.make_schema(shm.dictof(
+                shm.prim(vld.is_int), ~vld.required).apply_to('tags'))
+            assert js.key_filter(schema) is None
+        for text in ('{"name": "a", "extra": {"b": 1}}',
+                     '{"junk": 1}',
+                     '{"points": [{"x": 1, "y": 2}, {"y": 3}]}',
+                     '{"points": [{"x": 1, "y": 2}], "name": 1}',
+                     '{"tags": {"a": 1, "b": 2}}',
+                     '{"tags": {"a": "b"}}',
+                     '{"name": {"x": 1}}',
+                     '[{"x": 1}]', '1'):
+            # errors hold what was decoded of the document so far
+            expected = outcome(schema.validate, json.loads(text))[:4]
+            assert outcome(schema.loads, text)[:4]==expected
+            assert outcome(schema.compile().loads, text)[:4]==expected
+
+    def test_unknown_properties_are_dropped_while_decoding(s, schema):
+        retained = js.key_filter(schema)
+        assert retained('name') and retained('x')
+        assert not retained('extra')
+
+    def test_open_schemas_keep_every_property(s, schema):
+        assert js.key_filter(shm.obj(shm.prim().apply_to('a'))) is None
+        assert js.key_filter(shm.dictof(schema)) is None
+        assert js.key_filter(shm.obj(
+            shm.prim().apply_to(lambda k, v: True),
+            msh.unmatched_properties('remove'))) is None
+
+    def test_decoded_objects_are_not_copied(s, mocker):
+        decode = mocker.spy(js.json, 'loads')
+        check = mocker.spy(vld, 'is_object_type')
+        schema = s.make_schema()
+        assert schema.loads('{"name": "a", "junk": 1}')=={'name': 'a'}
+        assert check.spy_return is decode.spy_return
+        assert vld.owned_objects.get() is None
+
+
+class TestValidateDumps:
+
+    def test_same_as_serializing_the_validated_data(s, user, engine):
+        schema = engine(user)
+        data = {'name': 'Peter', 'scores': [1, 2], 'extra': 1}
+        assert schema.validate_dumps(data)==json.dumps(schema.validate(data))
+        assert (schema.validate_dumps(data, separators=(',', ':'))
+                =='{"name":"Peter","scores":[1,2]}')
+        fp = io.StringIO()
+        schema.validate_dump(data, fp)
+        assert fp.getvalue()==json.dumps(schema.validate(data))
+
+    def test_typed_arrays(s, engine):
+        schema = engine(shm.arr(shm.prim(vld.is_int).apply_to('*'),
+                                typecode='l'))
+        assert schema.validate_dumps([1, 2])=='[1, 2]'
+        fp = io.StringIO()
+        schema.validate_dump([1, 2], fp)
+        assert fp.getvalue()=='[1, 2]'
+
+    def test_numpy_arrays(s, engine):
+        pytest.importorskip('numpy')
+        schema = engine(shm.arr(shm.prim().apply_to('*'), dtype='float32'))
+        assert schema.validate_dumps([1, 2.5])=='[1.0, 2.5]'
+
+    def test_raises_validation_errors(s, user):
+        with pytest.raises(err.ValidationErrorStack):
+            user.validate_dumps({'name': 1})
@@ -0,0 +1,145 @@
+import gzip
+import json
+import pytest
+from vino import __main__ as cli
+
+
+SCHEMA = '''
+from vino import obj, prim, is_str, is_int, unmatched_properties
+user = obj(
+    prim(is_str).apply_to('name'),
+    prim(is_int).apply_to('age'),
+    unmatched_properties('remove'),
+)
+'''
+
+@pytest.fixture
+def records():
+    rv = []
+    for i in range(100):
+        rv.append({'name': 'u{}'.format(i), 'age': 'x' if i%10==3 else i,
+                   'extra': [i]})
+    return rv
+
+@pytest.fixture
+def ndjson(tmp_path, monkeypatch, records):
+    (tmp_path/'cli_schemas.py').write_text(SCHEMA)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    path = tmp_path/'users.ndjson'
+    path.write_text(''.join(json.dumps(r) + '\n' for r in records))
+    return path
+
+def run(ndjson, *args):
+    out, errors = ndjson.with_suffix('.out'), ndjson.with_suffix('.err')
+    code = cli.main(['cli_schemas:user', str(ndjson), '-o', str(out),
+                     '-e', str(errors), '-q', '--chunk-size', '200'] 
+                    + list(args))
+    return (code, out.read_text().splitlines(),
+            [json.loads(l) for l in errors.read_text().splitlines()])
+
+
+class TestMain:
+
+    @pytest.mark.parametrize('workers', ['1', '2'])
+    def test_splits_valid_and_invalid_records(s, ndjson, records, workers):
+        code, valid, invalid = run(ndjson, '-w', workers)
+        assert code==1
+        assert len(valid)==90 and len(invalid)==10
+        assert json.loads(valid[0])=={'name': 'u0', 'age': 0}
+        assert json.loads(invalid[0]['record'])==records[3]
+        assert invalid[0]['errors']
+        offset = invalid[0]['offset']
+        with open(str(ndjson), 'rb') as fp:
+            fp.seek(offset)
+            assert json.loads(fp.readline())==records[3]
+
+    def test_batched_lookups_per_chunk(s, ndjson, tmp_path):
+        expected = run(ndjson, '-w', '1')
+        (tmp_path/'cli_batched.py').write_text(SCHEMA + '''
+from vino import batched
+calls = []
+def existing(ages):
+    calls.append(ages)
+    return ages
+user = obj(prim(is_int, batched(existing)).apply_to('age'), user)
+''')
+        out, errors = ndjson.with_suffix('.out'), ndjson.with_suffix('.err')
+        code = cli.main(['cli_batched:user', str(ndjson), '-o', str(out),
+                         '-e', str(errors), '-q', '-w', '1'])
+        assert (code, out.read_text().splitlines(), [
+            json.loads(l) for l in errors.read_text().splitlines()])==expected
+        import cli_batched
+        # one chunk
+        assert len(cli_batched.calls)==1
+
+    @pytest.mark.parametrize('schema', ['cli_schemas:user',
+                                        'cli_batched:user'])
+    def test_records_that_raise_are_reported(s, ndjson, tmp_path, schema):
+        (tmp_path/'cli_batched.py').write_text(SCHEMA + '''
+from vino import batched
+user = obj(prim(is_int, batched(lambda ages: ages)).apply_to('age'), user)
+''')
+        ndjson.write_text('{"name": "a", "age": 1}\nnull\n[1, 2]\n'
+                          '{"name": "b", "age": 2}\n')
+        out, errors = ndjson.with_suffix('.out'), ndjson.with_suffix('.err')
+        code = cli.main([schema, str(ndjson), '-o', str(out),
+                         '-e', str(errors), '-q', '-w', '1'])
+        assert code==1
+        assert [json.loads(l) for l in out.read_text().splitlines()]==[
+            {'name': 'a', 'age': 1}, {'name': 'b', 'age': 2}]
+        invalid = [json.loads(l) for l in errors.read_text().splitlines()]
+        assert [(e['offset'], e['record']) for e in invalid]==[
+            (24, 'null'), (29, '[1, 2]')]
+        assert all(e['errors'] for e in invalid)
+
+    def test_reads_gzip(s, ndjson):
+        expected = run(ndjson, '-w', '1')
+        compressed = ndjson.with_suffix('.gz')
+        compressed.write_bytes(gzip.compress(ndjson.read_bytes()))
+        assert run(compressed, '-w', '1', '--compiled')==expected
+
+    def test_resumes_from_checkpoint(s, ndjson, records):
+        checkpoint = str(ndjson.with_suffix('.offset'))
+        expected = run(ndjson, '-w', '1')
+        # a crash after the first chunks
+        chunks = list(cli.mapped_chunks(str(ndjson), 0, 200))
+        half = chunks[len(chunks)//2][0]
+        # same outputs as `ndjson`
+        truncated = ndjson.with_suffix('.part')
+        truncated.write_bytes(ndjson.read_bytes()[:half])
+        run(truncated, '-w', '1', '--checkpoint', checkpoint)
+        assert cli.read_checkpoint(checkpoint).offset==half
+        rv = run(ndjson, '-w', '1', '--checkpoint', checkpoint, '--resume')
+        assert rv==expected
+        assert cli.read_checkpoint(checkpoint).offset==ndjson.stat().st_size
+
+    def test_resume_drops_records_written_past_the_checkpoint(s, ndjson):
+        checkpoint = str(ndjson.with_suffix('.offset'))
+        expected = run(ndjson, '-w', '1')
+        chunks = list(cli.mapped_chunks(str(ndjson), 0, 200))
+        half = chunks[len(chunks)//2][0]
+        truncated = ndjson.with_suffix('.part')
+        truncated.write_bytes(ndjson.read_bytes()[:half])
+        run(truncated, '-w', '1', '--checkpoint', checkpoint)
+        # a crash once the outputs of the next chunk are written, before it
+        # is checkpointed
+        for suffix in ('.out', '.err'):
+            with open(str(ndjson.with_suffix(suffix)), 'a') as fp:
+                fp.write('{"partial": true}\n')
+        rv = run(ndjson, '-w', '1', '--checkpoint', checkpoint, '--resume')
+        assert rv==expected
+
+    def test_errors_default_to_a_file(s, ndjson, capsys):
+        out = ndjson.with_suffix('.out')
+        assert cli.main(['cli_schemas:user', str(ndjson), '-o', str(out),
+                         '-w', '1'])==1
+        with open(str(ndjson) + '.errors') as fp:
+            assert len(fp.read().splitlines())==10
+        assert '10 invalid' in capsys.readouterr().err
+
+    def test_chunks_end_on_line_boundaries(s, ndjson):
+        data = ndjson.read_bytes()
+        chunks = list(cli.mapped_chunks(str(ndjson), 0, 100))
+        assert chunks[0][0]==0 and chunks[-1][1]==len(data)
+        for start, end, _ in chunks:
+            assert data[end-1:end]==b'\n'
@@ -0,0 +1,78 @@
+import decimal
+import multiprocessing
+import pytest
+from vino import parallel as par
+from vino import errors as err
+from vino import obj, prim, is_str, is_int, unmatched_properties
+
+pytestmark = pytest.mark.skipif(
+    'fork' not in multiprocessing.get_all_start_methods(),
+    reason='workers are forked')
+
+
+SCHEMA = '''
+from vino import obj, prim, is_str, is_int
+user = obj(prim(is_str).apply_to('name'), prim(is_int).apply_to('age'))
+'''
+
+@pytest.fixture
+def user():
+    return obj(
+        prim(is_str).apply_to('name'),
+        # a lambda, the schema is not pickled
+        prim(is_int, lambda data, state: data * 2).apply_to('age'),
+        unmatched_properties('remove'),
+    )
+
+@pytest.fixture
+def records():
+    return [{'name': 'u{}'.format(i), 'age': 'x' if i%7==3 else i, 'x': 1}
+            for i in range(200)]
+
+class TestParallelValidator:
+
+    def test_results_match_validate_many(self, user, records):
+        expected = user.validate_many(records)
+        with par.ParallelValidator(user, workers=2, batch_size=8) as pv:
+            rv = pv.validate_many(records)
+        assert rv.values==expected.values
+        assert rv.count==200
+        assert sorted(rv.errors)==sorted(expected.errors)
+        for i, e in rv.errors.items():
+            assert isinstance(e, err.ValidationErrorStack)
+            assert par.messages(e)==par.messages(expected.errors[i])
+
+    def test_schema_may_be_an_import_path(self, tmp_path, monkeypatch,
+                                          records):
+        (tmp_path/'par_schemas.py').write_text(SCHEMA)
+        monkeypatch.syspath_prepend(str(tmp_path))
+        with par.ParallelValidator('par_schemas:user', workers=2) as pv:
+            rv = pv.validate_many(records)
+        assert len(rv.values)==200 - len(rv.errors)
+        assert 3 in rv.errors
+
+    def test_pool_is_reused_across_calls(self, user, records):
+        with par.ParallelValidator(user, workers=2) as pv:
+            executor = pv.executor
+            pv.validate_many(records[:10])
+            rv = pv.validate_many(records[10:20])
+            assert pv.executor is executor
+        assert pv.executor is None
+        assert sorted(rv.errors)==[0, 7]
+
+    def test_batch_size_adapts_to_cost(self, user):
+        pv = par.ParallelValidator(user, batch_time=0.05, batch_size=32)
+        pv.adapt(32, 0.0032)  # 100us per document: 500 per batch
+        assert pv.batch_size==266
+        pv.adapt(266, 10.0)  # very slow documents
+        assert pv.batch_size==133
+        for _ in range(20):
+            pv.adapt(pv.batch_size, 1e-9)
+        assert pv.batch_size==pv.max_batch_size
+
+    def test_unmarshallable_values_are_pickled(self):
+        data = [{'a': 1}, decimal.Decimal('1.5')]
+        assert par.unpack(par.pack(data[:1]))==data[:1]
+        assert par.pack(data[:1])[:1]==b'm'
+        assert par.pack(data)[:1]==b'p'
+        assert par.unpack(par.pack(data))==data
@@ -89,3 +89,402 @@ def test_takes_state(): assert 0
 #    @pytest.mark.skip
 #    def test_items_are_processed_by_index_not_by_qualifiers_orders():
 #        assert 0
+
+
+from vino import errors as err
+from vino import schema as shm
+from vino import qualifiers as qls
+from vino.processors import validating as vld
+from vino.processors import marshalling as msh
+from .conftest import outcome
+
+
+class TestMemberQualifierIndex:
+
+    @pytest.fixture
+    def schemas(s, monkeypatch):
+        """ builds the same declaration with and without the key index """
+        def build(*processors):
+            indexed = shm.obj(*processors)
+            with monkeypatch.context() as m:
+                m.setattr(qls.MemberQualifierStack, 'index_cls', None)
+                plain = shm.obj(*processors)
+            return indexed, plain
+        return build
+
+    def test_consecutive_member_runners_are_grouped(s, schemas):
+        indexed, plain = schemas(
+            shm.prim().apply_to('a'),
+            shm.prim().apply_to('b'),
+            msh.unmatched_properties('remove'),
+            shm.prim().apply_to('c'),
+        )
+        steps = [len(runners) for index, runners, runs in indexed.runners.plan]
+        assert steps==[1, 1, 2, 1, 1, 1, 1]
+        assert all(index is None for index, r, rs in plain.runners.plan)
+
+    def test_single_member_runners_with_patterns_are_indexed(s, schemas):
+        indexed, plain = schemas(
+            shm.prim(vld.is_int).apply_to(qls.prefix('m_'), qls.prefix('n_')),
+            msh.unmatched_properties('remove'),
+        )
+        steps = [(index is not None, len(runners))
+                 for index, runners, runs in indexed.runners.plan]
+        assert steps==[(False, 1)]*2 + [(True, 1)] + [(False, 1)]*3
+        unqualified = shm.obj(shm.prim().apply_to('a'))
+        assert all(index is None for index, r, rs in unqualified.runners.plan)
+        for data in ({'m_1': 1, 'n_2': 2, 'x': 3}, {'m_1': 'x'}):
+            assert outcome(indexed.validate, data)==outcome(
+                plain.validate, data)
+
+    def test_index_maps_keys_to_runners_in_declaration_order(s):
+        stacks = [qls.MemberQualifierStack('a', 'b'),
+                  qls.MemberQualifierStack(lambda k, v: True),
+                  qls.MemberQualifierStack('b')]
+        index = qls.MemberQualifierIndex(stacks)
+        assert index.index['a']==((0, True), (1, False))
+        assert index.index['b']==((0, True), (1, False), (2, True))
+        assert index.fallback==((1, False),)
+
+    def test_runner_order_is_kept_for_each_key(s, schemas):
+        append = lambda tag: lambda data, state: data+tag
+        processors = (
+            shm.prim(append('1')).apply_to('a', 'b'),
+            shm.prim(append('2')).apply_to(lambda k, v: v.endswith('1')),
+            shm.prim(append('3')).apply_to('b', 'c'),
+        )
+        for schema in schemas(*processors):
+            assert schema.validate({'a': '', 'b': '', 'c': '', 'd': ''})=={
+                'a': '12', 'b': '123', 'c': '3', 'd': ''}
+
+    def test_defaults_go_through_following_runners(s, schemas):
+        default = vld.required(default=lambda data, state: 'x')
+        processors = (
+            shm.prim(vld.is_str).apply_to('a'),
+            shm.prim(default).apply_to('b', 'c'),
+            shm.prim(lambda data, state: data*2).apply_to('c'),
+            msh.unmatched_properties('raise'),
+        )
+        indexed, plain = schemas(*processors)
+        for data in ({}, {'a': 'y'}, {'a': 'y', 'c': 'z'}, {'d': 1}):
+            assert outcome(indexed.validate, data)==outcome(
+                plain.validate, data)
+
+    def test_errors_are_reported_as_without_index(s, schemas, fails_continue):
+        def no_x(data, state):
+            if data=='x':
+                raise err.ValidationError('no x', interrupt_validation=False)
+            return data
+        processors = (
+            shm.prim(vld.is_str).apply_to('a', 'b'),
+            (no_x, 'b'),
+            shm.prim(vld.is_int).apply_to(lambda k, v: k.startswith('n')),
+            (fails_continue[0], 'c'),
+            msh.unmatched_properties('remove'),
+        )
+        indexed, plain = schemas(*processors)
+        for data in ({'a': 'a', 'b': 'x', 'n1': 1}, {'a': 1, 'n1': 'a'},
+                     {'b': 'b', 'n1': 'a', 'c': 'c'}, {'c': 'c'}, {}):
+            assert outcome(indexed.validate, data)==outcome(
+                plain.validate, data)
+
+    def test_failing_groups_dont_run_processors_again(s, engine, monkeypatch):
+        calls = []
+        def count(data, state):
+            calls.append(data)
+            return data
+        def nested(depth):
+            rv = shm.prim(vld.is_int)
+            for i in range(depth):
+                rv = shm.obj(shm.prim(count).apply_to('a'), rv.apply_to('n'))
+            return rv
+        data = 'x'
+        for i in range(5):
+            data = {'a': i, 'n': data}
+        with monkeypatch.context() as m:
+            m.setattr(qls.MemberQualifierStack, 'index_cls', None)
+            expected = outcome(nested(5).validate, data)
+        del calls[:]
+        assert outcome(engine(nested(5)).validate, data)==expected
+        assert len(calls)==5
+
+
+class TestShapeCache:
+
+    @pytest.fixture
+    def counter(s):
+        calls = []
+        def is_name(k):
+            calls.append(k)
+            return k.endswith('name')
+        return qls.keyonly(is_name), calls
+
+    def test_keyonly_qualifier_ignores_value(s):
+        q = qls.keyonly(lambda k: k=='a')
+        assert q('a', 'whatever') and not q('b', 'a')
+
+    def test_keyonly_predicates_called_once_per_shape(s, counter):
+        is_name, calls = counter
+        schema = shm.obj(
+            shm.prim(vld.is_str).apply_to(is_name),
+            shm.prim(vld.is_int).apply_to('age'),
+        ).cache_shapes(maxsize=8)
+        data = {'firstname': 'a', 'lastname': 'b', 'age': 3}
+        for i in range(5):
+            assert schema.validate(data)==data
+        assert sorted(calls)==['age', 'firstname', 'lastname']
+        info = schema.shape_cache_info()
+        assert (info.hits, info.misses, info.currsize)==(4, 1, 1)
+
+    def test_cache_is_opt_in(s, counter):
+        is_name, calls = counter
+        schema = shm.obj(shm.prim(vld.is_str).apply_to(is_name))
+        schema.validate({'name': 'a'})
+        schema.validate({'name': 'a'})
+        assert calls==['name', 'name']
+        assert schema.shape_cache_info().maxsize is None
+
+    def test_cache_is_bounded(s, counter):
+        is_name, calls = counter
+        schema = shm.obj(
+            shm.prim(vld.is_str).apply_to(is_name)).cache_shapes(maxsize=2)
+        for data in ({'a': 1}, {'b': 1}, {'c': 1}, {'a': 1}):
+            schema.validate(data)
+        info = schema.shape_cache_info()
+        assert (info.hits, info.misses, info.currsize)==(0, 4, 2)
+
+    def test_value_predicates_still_see_every_value(s, counter):
+        is_name, calls = counter
+        is_upper = lambda k, v: v.isupper()
+        schema = shm.obj(
+            shm.prim(lambda d, s: d.lower()).apply_to(is_name, is_upper),
+            msh.unmatched_properties('remove'),
+        ).cache_shapes()
+        assert schema.validate({'name': 'A', 'x': 'B', 'y': 'c'})=={
+            'name': 'a', 'x': 'b'}
+        assert schema.validate({'name': 'A', 'x': 'b', 'y': 'C'})=={
+            'name': 'a', 'y': 'c'}
+        assert schema.shape_cache_info().hits==1
+
+
+class TestPatternQualifiers:
+
+    def test_prefix_suffix_glob_and_regex(s):
+        assert qls.prefix('metric_')('metric_cpu')
+        assert not qls.prefix('metric_')('cpu_metric_')
+        assert qls.suffix('.count')('hits.count')
+        assert not qls.suffix('.count')('hits_count')
+        assert qls.glob('tag_*')('tag_env')
+        assert not qls.glob('tag_?')('tag_env')
+        assert qls.regex('[0-9]+')('label42')
+        assert not qls.regex('[0-9]+')(42)
+
+    def test_stack_keeps_patterns_apart(s):
+        q = qls.MemberQualifierStack('a', qls.prefix('b'), lambda k, v: False)
+        assert len(q.qualifiers['patterns'])==1
+        assert len(q.qualifiers['callables'])==1
+        assert q.call_match('bob', None)
+        assert not q.call_match('alice', None)
+
+    def test_patterns_are_combined_and_memoized(s):
+        stacks = [qls.MemberQualifierStack(qls.prefix('metric_')),
+                  qls.MemberQualifierStack('a'),
+                  qls.MemberQualifierStack(qls.glob('*_ms'), qls.suffix('_s'))]
+        index = qls.MemberQualifierIndex(stacks)
+        assert index.all_combined and index.combined is not None
+        assert index.pattern_positions('metric_cpu_ms')==frozenset([0, 2])
+        assert index.pattern_positions('a')==frozenset()
+        index.pattern_positions('metric_cpu_ms')
+        assert index.pattern_positions.cache_info().hits==1
+
+    def test_patterns_with_groups_are_searched_separately(s):
+        stacks = [qls.MemberQualifierStack(qls.regex(r'(x)\1')),
+                  qls.MemberQualifierStack(qls.prefix('y'))]
+        index = qls.MemberQualifierIndex(stacks)
+        assert not index.all_combined
+        assert index.pattern_positions('xx')==frozenset([0])
+        assert index.pattern_positions('yx')==frozenset([1])
+
+    def test_object_validation_with_patterns(s, engine):
+        schema = shm.obj(
+            shm.prim(vld.is_int).apply_to(qls.prefix('metric_')),
+            shm.prim(vld.is_str).apply_to('host', qls.glob('tag_*')),
+            msh.unmatched_properties('remove'),
+        )
+        data = dict(('metric_{}'.format(i), i) for i in range(50))
+        data.update(host='h', tag_env='prod', other=1)
+        rv = engine(schema).validate(data)
+        del data['other']
+        assert rv==data
+        data['metric_3'] = 'three'
+        with pytest.raises(err.ValidationErrorStack):
+            engine(schema).validate(data)
+
+
+class TestSequenceQualifier:
+
+    def test_follows_slice_semantics(s):
+        data = list(range(10))
+        assert list(qls.seq(2).indices(10))==data[2:]
+        assert list(qls.seq(-3).indices(10))==data[-3:]
+        for args in ((0, 5), (1, -1, 3), (None, None, -2), (-1, 2, -1)):
+            sq = qls.seq(*args)
+            assert list(sq.indices(10))==sorted(data[slice(*args)])
+
+    def test_accepts_range_and_slice(s):
+        assert list(qls.seq(range(4, 7)).indices(10))==[4, 5, 6]
+        assert list(qls.seq(slice(-2, None)).indices(10))==[8, 9]
+        with pytest.raises(err.VinoError):
+            qls.seq(range(3), 4)
+
+    def test_rejects_invalid_values(s):
+        with pytest.raises(err.VinoError):
+            qls.seq('a')
+        with pytest.raises(err.VinoError):
+            qls.seq(0, 10, 0)
+
+    def test_inverting_returns_a_new_qualifier(s):
+        sq = qls.seq(0, 2)
+        inv = ~sq
+        assert inv is not sq and inv.inverted and not sq.inverted
+        assert [i for i in range(4) if inv.match(i, 4)]==[2, 3]
+
+
+class TestItemQualifierStack:
+
+    def test_ranges_are_not_expanded(s):
+        q = qls.ItemQualifierStack(range(0, 10**12, 2), 3)
+        assert q.qualifiers['indices']=={3}
+        assert len(q.qualifiers['sequences'])==1
+        assert q.is_sparse()
+
+    def test_matched_indices_are_merged_in_order(s):
+        q = qls.ItemQualifierStack(range(0, 6, 2), 3, 4, 12, -1,
+                                   qls.seq(-2))
+        assert list(q.matched_indices(10))==[0, 2, 3, 4, 8, 9]
+
+    def test_callables_and_inverted_sequences_are_not_sparse(s):
+        assert not qls.ItemQualifierStack(lambda i, d: True).is_sparse()
+        assert not qls.ItemQualifierStack(~qls.seq(2)).is_sparse()
+
+    def test_sparse_apply_only_visits_matched_items(s, engine):
+        visited = []
+        def double(data, state):
+            visited.append(data)
+            return data*2
+        schema = shm.arr((double, range(0, 10**6, 250000), -1, qls.seq(-1)))
+        data = list(range(10**6))
+        rv = engine(schema).validate(data)
+        assert visited==[0, 250000, 500000, 750000, 999999]
+        assert rv[250000]==500000 and rv[-1]==999999*2 and rv[1]==1
+
+    def test_inverted_and_negative_sequences(s, engine):
+        schema = shm.arr(
+            (lambda d, s: d.upper(), ~qls.seq(1, -1)),
+            (lambda d, s: d+'!', qls.seq(-2), lambda i, d: d=='b'),
+        )
+        assert engine(schema).validate(list('abcde'))==[
+            'A', 'b!', 'c', 'd!', 'E!']
+
+    def test_all_items_qualifier(s, engine):
+        q = qls.ItemQualifierStack(qls.ALL)
+        assert q.qualifiers['all'] and not q.empty()
+        schema = shm.arr(shm.prim(vld.is_int).apply_to('*'))
+        assert engine(schema).validate([1, 2, 3])==[1, 2, 3]
+        with pytest.raises(err.ValidationErrorStack):
+            engine(schema).validate([1, 'b', 3])
+
+    @pytest.mark.parametrize('qualifier', [
+        qls.ALL, 7, range(5, 10), qls.seq(5, 10), lambda i, d: i>5])
+    @pytest.mark.parametrize('length', [10, 1000])
+    def test_failing_items_report_their_index(s, engine, monkeypatch,
+                                              qualifier, length):
+        from vino import vectorized as vec
+        data = list(range(length))
+        data[7] = 'x'
+        schema = shm.arr(shm.prim(vld.is_int).apply_to(qualifier))
+        for np in (vec.np, None):
+            monkeypatch.setattr(vec, 'np', np)
+            with pytest.raises(err.ValidationErrorStack) as e:
+                engine(schema).validate(data)
+            assert e.value[0].index==7
+
+    def test_all_items_runs_in_order_without_bookkeeping(s):
+        seen = []
+        def record(data, state):
+            seen.append(data)
+            return data
+        schema = shm.arr((record, '*'), (lambda d, s: d, 0))
+        schema.validate(list('abc'))
+        assert seen==list('abc')
+
+
+class TestChunkedItemQualifierStack:
+
+    @pytest.fixture
+    def pool(s):
+        from concurrent.futures import ThreadPoolExecutor
+        with ThreadPoolExecutor(4) as executor:
+            yield executor
+
+    def test_items_are_stitched_back_in_order(s, pool, engine):
+        schema = shm.arr(shm.prim(vld.is_int, lambda d, s: d*2).apply_to('*'))
+        chunked = schema.chunked(pool, chunk_size=7)
+        data = list(range(100))
+        assert engine(chunked).validate(data)==schema.validate(data)
+
+    def test_qualifiers_see_absolute_indices(s, pool, engine):
+        seen = []
+        def is_odd(i, d):
+            seen.append(i)
+            return i%2
+        schema = shm.arr(
+            (lambda d, s: -d, 45, qls.seq(-3), is_odd),
+            (lambda d, s: d*10, ~qls.seq(0, 90)),
+        )
+        chunked = schema.chunked(pool, chunk_size=10)
+        data = list(range(100))
+        assert engine(chunked).validate(data)==schema.validate(data)
+        # neither 45 nor the last 3 items reach the callable
+        assert sorted(seen)==sorted(2 * [i for i in range(97) if i!=45])
+
+    def test_error_of_first_failing_item_with_global_index(s, pool, engine):
+        schema = shm.arr(shm.prim(vld.is_int).apply_to('*')).chunked(
+            pool, chunk_size=10)
+        data = list(range(100))
+        data[93] = data[37] = 'x'
+        with pytest.raises(err.ValidationErrorStack) as e:
+            engine(schema).validate(data)
+        assert e.value[0].index==37
+
+    def test_process_pools(s, engine):
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            pytest.skip('workers cannot be forked')
+        pool = ProcessPoolExecutor(
+            2, mp_context=multiprocessing.get_context('fork'))
+        with pool:
+            # not picklable, the workers inherit it
+            schema = shm.arr(shm.prim(vld.is_int, lambda d, s: d*2
+                                      ).apply_to('*')).chunked(pool, 10)
+            data = list(range(100))
+            assert engine(schema).validate(data)==[d*2 for d in data]
+            data[93] = data[37] = 'x'
+            with pytest.raises(err.ValidationErrorStack) as e:
+                engine(schema).validate(data)
+            assert e.value[0].index==37
+
+    def test_small_arrays_are_not_chunked(s, mocker):
+        pool = mocker.Mock()
+        schema = shm.arr(shm.prim(vld.is_int).apply_to('*')).chunked(
+            pool, chunk_size=10)
+        assert schema.validate(list(range(19)))==list(range(19))
+        assert not pool.submit.called
+
+    def test_original_schema_is_left_alone(s, pool):
+        schema = shm.arr((lambda d, s: d, 0))
+        chunked = schema.chunked(pool)
+        assert type(schema.runners[2]['qualifiers']) is qls.ItemQualifierStack
+        assert isinstance(chunked.runners[2]['qualifiers'],
+                          qls.ChunkedItemQualifierStack)
@@ -8,6 +8,17 @@ from vino import errors as err
 from vino import contexts as ctx
 from vino import qualifiers as quals
 
+
+@pytest.fixture
+def validators(engine):
+    """ The `run` of a RunnerStack of the given processors, and the
+    `validate` of a Context of the same processors, through `engine`.
+    """
+    def build(*processors):
+        return (RunnerStack(None, *processors).run,
+                engine(ctx.Context(*processors)).validate)
+    return build
+
 class TestRunner:
 
     def test_callable_processor_should_register(s):
@@ -52,6 +63,18 @@ class TestRunner:
         r = Runner(mk)
         assert mk.vino_init.called
 
+    def test_registered_traits_are_set_once_built(s, monkeypatch):
+        calls = []
+        def described(runner):
+            calls.append(runner)
+            return runner.processor.run
+        monkeypatch.setitem(Runner.traits, 'described', described)
+        processor = lambda data, state: data
+        r = Runner(processor)
+        assert r.described is processor and calls==[r]
+        r.run('abc')
+        assert calls==[r]
+
     def test_get_processor_proxy_should_return_ProcProxy_object(s):
         """pp = get_processor_proxy(proc)
         if proc valid processor, pp should be a ProcProxy instance
@@ -444,20 +467,20 @@ class TestRunnerStack:
         rs.add_qualifiers(9,5,0,1)
         assert qualifiers['indices']=={0,1,3,8,9,5}
 
-    def test_run_method_returns_value(s, randstr):
-        context = None
+    def test_run_method_returns_value(s, randstr, validators):
         processor = (lambda v,c: v), None
-        rs = RunnerStack(context, processor)
-        assert rs.run(randstr)==randstr
+        for run in validators(processor):
+            assert run(randstr)==randstr
 
-    def test_executes_runners_in_fifo(s, tags):
+    def test_executes_runners_in_fifo(s, tags, validators):
         # tags are : bold, italic, and underline in that order
-        processors = ((t, None) for t in tags)
-        rs = RunnerStack(None, *processors)
+        processors = tuple((t, None) for t in tags)
         post_process = '<u><i><b>'+'some contents'+'</b></i></u>'
-        assert rs.run('some contents')==post_process
+        for run in validators(*processors):
+            assert run('some contents')==post_process
 
-    def test_interrupts_validation_if_interrupt_flag_set_on_error(s, mocker):
+    def test_interrupts_validation_if_interrupt_flag_set_on_error(
+        s, mocker, validators):
         def failing_processor(value, context):
             e = err.ValidationError(
                 "I'll fail you, no matter what", interrupt_validation=True)
@@ -465,13 +488,13 @@ class TestRunnerStack:
         #mk = mocker.MagicMock() # probably better to declare some specs 
         mk = mocker.MagicMock(spec=['run'])
         processors = tuple((t, None) for t in (failing_processor, mk))
-        rs = RunnerStack(None, *processors)
-        try:
-            value = rs.run('some contents')
-        except err.ValidationErrorStack as e:
-            assert not mk.run.called
+        for run in validators(*processors):
+            with pytest.raises(err.ValidationErrorStack):
+                run('some contents')
+        assert not mk.run.called
 
-    def test_calls_next_runner_if_interrupt_flag_not_set_on_error(s, mocker):
+    def test_calls_next_runner_if_interrupt_flag_not_set_on_error(
+        s, mocker, validators):
         def failing_processor(value, context):
             e = err.ValidationError(
                 "I'll fail you, no matter what", interrupt_validation=False)
@@ -482,13 +505,14 @@ class TestRunnerStack:
         mk = mocker.MagicMock(spec=['run', 'vino_init']) 
         mk.vino_init.return_value = mk
         processors = tuple((t, None) for t in [failing_processor, mk])
-        rs = RunnerStack(None, *processors)
-        try:
-            value = rs.run('some contents')
-        except err.ValidationErrorStack as e:
+        for run in validators(*processors):
+            mk.run.reset_mock()
+            with pytest.raises(err.ValidationErrorStack):
+                run('some contents')
             assert mk.run.called
 
-    def test_run_assigns_failing_value_to_error_after_validation(s, tags):
+    def test_run_assigns_failing_value_to_error_after_validation(
+        s, tags, validators):
         # tags are : bold, italic, and underline in that order
         def failing_processor(value, context):
             e = err.ValidationError("I'll fail you, no matter what", 
@@ -496,13 +520,13 @@ class TestRunnerStack:
             raise e
         processors = list((t, None) for t in tags)
         processors[1:1] = [(failing_processor, None)] # inserting at position 1
-        rs = RunnerStack(None, *processors)
-        try:
-            value = rs.run('some contents')
-        except err.ValidationErrorStack as e:
-            assert e[0].data=='<b>'+'some contents'+'</b>'
+        for run in validators(*processors):
+            with pytest.raises(err.ValidationErrorStack) as e:
+                run('some contents')
+            assert e.value[0].data=='<b>'+'some contents'+'</b>'
 
-    def test_error_stack_given_last_value_before_interruption(s, tags):
+    def test_error_stack_given_last_value_before_interruption(
+        s, tags, validators):
         # tags are : bold, italic, and underline in that order
         def failing_processor(value, context):
             e = err.ValidationError("I'll fail you, no matter what", 
@@ -510,12 +534,13 @@ class TestRunnerStack:
             raise e
         processors = list((t, None) for t in tags)
         processors[1:1] = [[failing_processor, None]] # inserting at position 1
-        rs = RunnerStack(None, *processors)
-        with pytest.raises(err.ValidationErrorStack) as e: 
-            value = rs.run('some contents')
-        assert e.value.data=='<b>'+'some contents'+'</b>'
+        for run in validators(*processors):
+            with pytest.raises(err.ValidationErrorStack) as e: 
+                run('some contents')
+            assert e.value.data=='<b>'+'some contents'+'</b>'
 
-    def test_error_stack_given_final_value_if_no_interruption(s, tags):
+    def test_error_stack_given_final_value_if_no_interruption(
+        s, tags, validators):
         # tags are : bold, italic, and underline in that order
         def failing_processor(value, context):
             e = err.ValidationError("I'll fail you, no matter what", 
@@ -523,10 +548,10 @@ class TestRunnerStack:
             raise e
         processors = list((t, None) for t in tags)
         processors[1:1] = [[failing_processor, None]] # inserting at position 1
-        rs = RunnerStack(None, *processors)
-        with pytest.raises(err.ValidationErrorStack) as e: 
-            value = rs.run('some contents')
-        assert e.value.data=='<u><i><b>'+'some contents'+'</b></i></u>'
+        for run in validators(*processors):
+            with pytest.raises(err.ValidationErrorStack) as e: 
+                run('some contents')
+            assert e.value.data=='<u><i><b>'+'some contents'+'</b></i></u>'
 
     def test_copy_returns_different_runner_stack(s):
         rs = RunnerStack(None)
@@ -1,5 +1,8 @@
+import array
 import pytest
+from concurrent import futures
 from vino import schema as shm
+from vino import vectorized as vec
 from vino.processors import validating as  vld
 from vino import errors as err
 
@@ -16,6 +19,14 @@ def arr():
 def obj():
     return shm.ObjectTypeSchema()
 
+@pytest.fixture(params=['numpy', 'no numpy'])
+def numpy(request, monkeypatch):
+    """ Runs a test with NumPy, if it's installed, and without it """
+    if request.param=='numpy':
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setattr(vec, 'np', None)
+
 # TODO: parametrize the tests to change the class
 class TestSchema:
 
@@ -90,6 +101,57 @@ class TestArrayTypeSchema:
     def test_adds_array_type_processor_after_required(s, arr):
         assert arr.runners[1]['runner']._raw_processor is vld.is_array_type
 
+    def test_typed_output(s, engine):
+        import array
+        schema = shm.arr(shm.prim(vld.is_int).apply_to('*'), typecode='l')
+        rv = engine(schema).validate([1, 2, 3])
+        assert rv==array.array('l', [1, 2, 3])
+        # kept by derived schemas
+        assert engine(schema.add(lambda d, s: d[:2])).validate([1, 2, 3])==(
+            array.array('l', [1, 2]))
+        with pytest.raises(err.ValidationErrorStack) as e:
+            engine(schema).validate([1, 2**70])
+        assert e.value[0].index==1
+        assert e.value.data==[1, 2**70]
+
+    def test_typed_output_with_numpy(s, engine):
+        np = pytest.importorskip('numpy')
+        schema = shm.arr(shm.prim().apply_to('*'), dtype='float32')
+        rv = engine(schema).validate([1, 2.5])
+        assert rv.dtype==np.float32 and rv.tolist()==[1.0, 2.5]
+        with pytest.raises(err.ValidationErrorStack):
+            engine(schema).validate([1, 1e39])
+
+    @pytest.mark.parametrize('qualifier', ['*', 0, lambda i, d: True])
+    @pytest.mark.parametrize('data', [
+        array.array('l', range(300)),
+        memoryview(array.array('H', range(300))),
+    ])
+    def test_buffers_come_out_as_lists(s, engine, numpy, qualifier, data):
+        schema = shm.arr(shm.prim(vld.is_int).apply_to(qualifier))
+        for validator in (engine(schema), engine(schema.chunked(
+                futures.ThreadPoolExecutor(2), chunk_size=50))):
+            rv = validator.validate(data)
+            assert type(rv) is list and rv==list(range(300))
+        assert engine(shm.arr()).validate(data)==list(range(300))
+
+    def test_bytes_are_not_arrays(s, engine):
+        schema = engine(shm.arr(shm.prim().apply_to('*')))
+        for data in (b'abc', bytearray(b'abc')):
+            with pytest.raises(err.ValidationErrorStack):
+                schema.validate(data)
+
+    def test_empty_buffers(s, engine, numpy):
+        schema = engine(shm.arr(shm.prim(vld.is_int).apply_to('*'),
+                                vld.not_allowempty))
+        with pytest.raises(err.ValidationError) as e:
+            schema.validate(array.array('l'))
+        assert 'must not be empty' in str(e.value)
+
+    def test_unexpected_arguments(s):
+        with pytest.raises(TypeError):
+            shm.arr(typecodes='l')
+
 
 class TestObjectTypeSchema:
 
@@ -97,9 +159,96 @@ class TestObjectTypeSchema:
         o = shm.obj(shm.prim().apply_to('field_1'))
         assert o.runners[1]['runner']._raw_processor is vld.is_object_type
 
-    def test_should_not_allow_prim(s):
-        o = shm.obj(shm.prim().apply_to('field_1'))
+    def test_should_not_allow_prim(s, engine):
+        o = engine(shm.obj(shm.prim().apply_to('field_1')))
         with pytest.raises(err.ValidationErrorStack) as e:
             o.validate('some string')
         assert 'Wrong data type' in str(e.value[0])
 
+
+
+class TestMapTypeSchema:
+
+    def test_adds_object_type_and_entries_processors_after_required(s):
+        m = shm.dictof(shm.prim(vld.is_int))
+        assert m.runners[1]['runner']._raw_processor is vld.is_object_type
+        assert isinstance(m.runners[2]['runner']._raw_processor,
+                          shm.MapEntriesProcessor)
+
+    def test_validates_every_value(s, engine):
+        double = lambda data, state: data*2
+        m = engine(shm.dictof(shm.prim(vld.is_int, double)))
+        assert m.validate({'a': 1, 'b': 2})=={'a': 2, 'b': 4}
+        with pytest.raises(err.ValidationErrorStack) as e:
+            m.validate({'a': 1, 'b': 'x'})
+        assert 'Wrong data type' in str(e.value[0][0])
+
+    def test_validates_keys(s, engine):
+        upper = lambda data, state: data.upper()
+        m = engine(shm.dictof(shm.prim(), keys=shm.prim(vld.is_str, upper)))
+        assert m.validate({'a': 1, 'b': 2})=={'A': 1, 'B': 2}
+
+    def test_drops_missing_entries(s, engine):
+        drop = lambda data, state: data if data>0 else shm.uls._undef
+        m = engine(shm.dictof(shm.prim(vld.is_int, drop)))
+        assert m.validate({'a': 1, 'b': 0})=={'a': 1}
+
+    def test_does_not_mutate_input(s, engine):
+        m = engine(shm.dictof(shm.prim(lambda data, state: data+1)))
+        data = {'a': 1}
+        assert m.validate(data)=={'a': 2}
+        assert data=={'a': 1}
+
+    def test_should_not_allow_prim(s, engine):
+        m = engine(shm.dictof(shm.prim()))
+        with pytest.raises(err.ValidationErrorStack) as e:
+            m.validate('some string')
+        assert 'Wrong data type' in str(e.value[0])
+
+    def test_allows_null(s, engine):
+        m = engine(shm.dictof(shm.prim(vld.is_int), vld.allownull))
+        assert m.validate(None) is None
+        assert m.validate({'a': 1})=={'a': 1}
+
+
+class TestThreadSafety:
+
+    def test_schema_is_shared_between_threads(s, engine):
+        import sys
+        from concurrent.futures import ThreadPoolExecutor
+        from vino import qualifiers as qls
+        user = shm.obj(
+            shm.prim(vld.is_str).apply_to('name', qls.prefix('x_')),
+            shm.prim(vld.is_int).apply_to('age'),
+            shm.arr(shm.prim(vld.is_str).apply_to(0, lambda i, d: i%2)
+                    ).apply_to('tags'),
+            shm.dictof(shm.prim(vld.is_int)).apply_to('scores'),
+        ).cache_shapes(maxsize=4)
+        schema = engine(user)
+        documents = [{'name': 'n', 'age': i, 'tags': ['a', 'b', 'c'],
+                      'scores': {'a': i}, 'x_{}'.format(i%7): 'x'}
+                     for i in range(300)]
+        documents[150]['age'] = 'x'
+        def validate(data):
+            try:
+                return schema.validate(data)
+            except err.ValidationError as e:
+                return str(e)
+        expected = [validate(d) for d in documents]
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            with ThreadPoolExecutor(8) as executor:
+                rv = list(executor.map(validate, documents))
+        finally:
+            sys.setswitchinterval(interval)
+        assert rv==expected
+        assert isinstance(rv[150], str)
+
+    def test_stacks_are_set_up_eagerly(s):
+        from vino import qualifiers as qls
+        schema = shm.arr()
+        assert '_runners' in vars(schema)
+        assert {'_runners', '_plan'} <= set(vars(schema.runners))
+        assert '_qualifiers' in vars(qls.ItemQualifierStack())
+        assert '_qualifiers' in vars(qls.MemberQualifierStack())
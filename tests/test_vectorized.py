@@ -0,0 +1,114 @@
+import array
+import decimal
+import pytest
+from vino import vectorized as vec
+from vino import errors as err
+from vino import schema as shm
+from vino.processors import validating as vld
+from vino.processors import marshalling as msh
+
+from .conftest import outcome
+
+np = pytest.importorskip('numpy')
+
+
+def regular(schema, data, monkeypatch):
+    with monkeypatch.context() as m:
+        m.setattr(vec, 'min_length', float('inf'))
+        return outcome(schema.validate, data)
+
+def item_runner(schema):
+    schema = getattr(schema, 'context', schema)
+    for entry in schema.runners.runners:
+        if entry['qualifiers']:
+            return entry['runner']
+
+def items(*processors):
+    return shm.arr(shm.prim(*processors).apply_to('*'))
+
+ints = list(range(-500, 500))
+strs = ['item{}'.format(i) for i in range(1000)]
+
+
+class TestVectorized:
+
+    @pytest.mark.parametrize('processors, data, failing', [
+        ((vld.is_int,), ints, None),
+        ((vld.is_int,), ints[:700] + [1.5] + ints[700:], 700),
+        ((vld.is_int,), ints[:10] + [True] + ints[10:], 10),
+        ((vld.is_int, vld.allownull), ints + [None], None),
+        ((vld.is_int, vld.not_allownull), ints[:300] + [None] + ints[300:],
+         300),
+        ((vld.isnot_int,), strs, None),
+        ((vld.is_str,), strs, None),
+        ((vld.is_str,), strs + [''], 1000),
+        ((vld.is_str, vld.allowempty), strs + [''], None),
+        ((vld.is_str,), strs[:5] + [5] + strs[5:], 5),
+        ((vld.between(-500, 499),), ints, None),
+        ((vld.between(-499.5),), ints, 0),
+        ((vld.between(maximum=498.5),), ints, 999),
+        ((vld.between(0, 1),), [0.5, 1, True, 0.0] * 100, None),
+        ((vld.between(0, 1),), [0.5] * 300 + [float('inf')], 300),
+        ((vld.between(0, 1),), [0.5] * 300 + ['1'], 300),
+        ((vld.one_of(*ints[:-1]),), ints, 999),
+        ((vld.one_of('a', 'b'),), ['a', 'b', 'c'] * 100, 2),
+        ((vld.is_str, msh.maxlength(5)), strs, None),
+        ((vld.is_str, msh.maxlength(4), vld.one_of('item')), strs, None),
+        ((vld.is_str, msh.maxlength(0)), strs, 0),
+    ])
+    def test_same_outcome_as_items_one_by_one(s, engine, monkeypatch,
+                                              processors, data, failing):
+        schema = engine(items(*processors))
+        expected = regular(schema, data, monkeypatch)
+        assert vec.plan(item_runner(schema)) is not None
+        assert outcome(schema.validate, data)==expected
+        assert expected[-1]==failing
+
+    @pytest.mark.parametrize('data', [
+        # not a supported type
+        ints[:300] + [decimal.Decimal(1)],
+        # beyond 64 bits
+        ints[:300] + [2**70],
+        # too short to be worth it
+        ints[:10],
+    ])
+    def test_falls_back_on_unsupported_data(s, engine, mocker, data):
+        run = mocker.spy(vld.Between, 'run')
+        schema = engine(items(vld.between(-1000)))
+        assert outcome(schema.validate, data)==('ok', data, None)
+        assert run.call_count==len(data)
+
+    @pytest.mark.parametrize('item', [
+        shm.prim(vld.is_int, lambda d, s: d),
+        shm.prim(vld.is_int(failsafe=lambda data, state: 0)),
+        shm.prim(vld.between(2**60)),
+        shm.obj(),
+    ])
+    def test_falls_back_on_other_processors(s, item):
+        schema = shm.arr(item.apply_to('*'))
+        assert vec.plan(item_runner(schema)) is None
+
+    def test_items_are_not_run(s, engine, mocker):
+        run = mocker.spy(vld.Between, 'run')
+        schema = engine(items(vld.is_int, vld.between(0)))
+        assert schema.validate(list(range(1000)))==list(range(1000))
+        assert run.call_count==0
+
+
+class TestBuffers:
+
+    def test_numpy_arrays(s, engine):
+        data = np.arange(1000, dtype=np.int32)
+        schema = engine(items(vld.is_int, vld.between(0, 999)))
+        rv = schema.validate(data)
+        assert type(rv) is list and rv==list(range(1000))
+        assert set(map(type, rv))=={int}
+        data[400] = 1000
+        assert outcome(schema.validate, data)[-1]==400
+
+    def test_unsigned_integers_beyond_int64(s, engine):
+        data = array.array('Q', [1, 2**64 - 1] * 200)
+        schema = engine(items(vld.between(0, 2)))
+        # validated the regular way
+        assert outcome(schema.validate, data)[2]==outcome(
+            schema.validate, list(data))[2]
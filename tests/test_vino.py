@@ -4,65 +4,65 @@ from vino import schema as shm
 from vino.processors import validating as vld
 
 class TestVino:
-    def test_validate_primitive(s):
-        s = shm.prim()
+    def test_validate_primitive(s, engine):
+        s = engine(shm.prim())
         s.validate(None)
         #for v in ['abc', 33, None, True, False]:
         #    assert v == s.validate(v) 
 
-    def test_accepts_int(s):
-        s = shm.prim(vld.is_int)
+    def test_accepts_int(s, engine):
+        s = engine(shm.prim(vld.is_int))
         for v in [33, 29, 0]:
             assert v==s.validate(v)
 
-    def test_rejects_non_int(s):
-        s = shm.prim(vld.is_int)
+    def test_rejects_non_int(s, engine):
+        s = engine(shm.prim(vld.is_int))
         for v in [33.2, 29.1, 0.3]:
             with pytest.raises(err.ValidationErrorStack) as e:
                 v==s.validate(v)
             assert 'wrong data type. expected: "int"' in str(e.value[0]).lower()
 
-    def test_rejects_int(s):
-        s = shm.prim(~vld.is_int)
+    def test_rejects_int(s, engine):
+        s = engine(shm.prim(~vld.is_int))
         for v in [33, 29, 0]:
             with pytest.raises(err.ValidationErrorStack) as e:
                 v==s.validate(v)
             assert 'wrong data type. not expected: "int"' in str(e.value[0]).lower()
 
-    def test_accepts_non_int(s):
-        s = shm.prim(~vld.is_int)
+    def test_accepts_non_int(s, engine):
+        s = engine(shm.prim(~vld.is_int))
         for v in [33.2, 29.1, 0.3, None, False, 'abc']:
             assert v==s.validate(v)
 
-    def test_obj(s):
+    def test_obj(s, engine):
         data = {'a': 'b', 'c': 33}
-        v = shm.obj(
+        v = engine(shm.obj(
             shm.prim(~vld.is_int).apply_to('a'), 
             shm.prim(vld.is_int).apply_to('c'), 
             shm.prim(~vld.required).apply_to('e'), 
-        )
+        ))
         result = v.validate(data)
         assert data == result
 
-    def test_required_default(s, logger):
+    def test_required_default(s, logger, engine):
         from vino.utils import _undef
         set_def = lambda *a, **kw: 'b' 
         req = vld.required(default=set_def)
-        v = shm.prim(req, ~vld.is_int)
+        v = engine(shm.prim(req, ~vld.is_int))
         logger.info(v.validate())
 
-    def test_obj_required_undef_default(s, logger):
+    def test_obj_required_undef_default(s, logger, engine):
         data = {'c': 33}
         set_def = lambda *a, **kw: 'b' 
         req = vld.required(default=set_def)
-        v = shm.obj(
+        v = engine(shm.obj(
             shm.prim(req, ~vld.is_int).apply_to('a'),
             shm.prim(vld.is_int).apply_to('c'), 
-        )
+        ))
         result = v.validate(data)
         assert {'a':'b', 'c':33} == result
 
-    def test_nested(s):
+    def test_nested(s, engine):
         data = {'a': 'b', 'c': 33, 'u': {'name': 'michael', 'age':44}}
         user_schm = shm.obj(
             shm.prim(~vld.is_int).apply_to('name'),
@@ -73,7 +73,7 @@ class TestVino:
             shm.prim(vld.is_int).apply_to('c'),
             user_schm.apply_to('u'),
         )
-        rv = data_schm.validate(data)
+        rv = engine(data_schm).validate(data)
         assert rv == data
 
 
@@ -1,6 +1,10 @@
 from .utils import _undef
 from .errors import VinoError, ValidationError, ValidationErrorStack
-from .schema import prim, arr, obj
+from .errors import ValidationTimeout, ValidationCancelled
+from .schema import prim, arr, obj, dictof, stream
+from .qualifiers import keyonly, regex, prefix, suffix, glob
+from .aio import offload, batched
+from .deadlines import CancelToken, budget
 # see __all__ declarations
 from .processors.marshalling import *
 from .processors.validating import *
@@ -0,0 +1,362 @@
+import os
+import sys
+import gzip
+import json
+import mmap
+import time
+import argparse
+import collections
+from concurrent import futures
+from . import aio
+from . import errors as err
+from . import parallel as par
+from . import jsonstream as jss
+
+"""
+Bulk validation of NDJSON files (one JSON document per line).
+
+    $ python -m vino myapp.schemas:user users.ndjson -o valid.ndjson \\
+    >     -e errors.ndjson --workers 8 --checkpoint users.offset
+
+The schema is imported from `module:attribute` (or `module.attribute`). The
+input file is memory-mapped and split on line boundaries into chunks that are
+validated on a pool of processes, each of which imports the schema once.
+Valid records are written to the output (stdout by default), invalid ones to
+the errors output (`INPUT.errors` by default) as `{"offset": ..., "errors":
+[...], "record": ...}` objects. Gzipped inputs are decompressed on the fly.
+
+With `--checkpoint`, the offset of the input up to which the outputs are
+complete is recorded after each chunk, along with the sizes of the outputs.
+`--resume` starts over from that offset, appending to the outputs once what
+was written past the checkpoint is truncated.
+"""
+
+CHUNK_SIZE = 4 << 20
+
+
+# the state of a worker process, see `init_worker()`
+_worker = {}
+
+def init_worker(schema_path, compiled=False):
+    schema = par.load_schema(schema_path)
+    if compiled:
+        schema = schema.compile()
+    _worker.clear()
+    _worker.update(schema=schema, path=None, map=None,
+                   batched=aio.has_batches(getattr(schema, 'context', schema)))
+
+
+def _mapped(path):
+    # each worker maps the input once
+    if _worker['path']!=path:
+        with open(path, 'rb') as fp:
+            _worker['map'] = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        _worker['path'] = path
+    return _worker['map']
+
+
+def validate_chunk(path, start, end, data=None):
+    """
+    Validate the lines of the input between offsets `start` and `end`. The
+    lines are read from the mapped file at `path`, unless `data` is given.
+    Returns the valid and error outputs, and the count of records of each.
+    """
+    if data is None:
+        data = _mapped(path)[start:end]
+    offsets, records = [], []
+    offset = start
+    for line in data.splitlines(True):
+        record = line.strip()
+        if record:
+            offsets.append(offset)
+            records.append(record)
+        offset += len(line)
+    valid, invalid = [], []
+    for offset, record, (rv, e) in zip(
+            offsets, records, validate_records(records)):
+        if e is None:
+            valid.append(jss.encoder((',', ':')).encode(rv))
+        else:
+            invalid.append(json.dumps({
+                'offset': offset,
+                'errors': messages(e),
+                'record': record.decode('utf-8', 'replace'),
+            }))
+    return (end, _lines(valid), _lines(invalid), len(valid), len(invalid))
+
+
+def messages(error):
+    """ The messages of what a record raised. Errors other than validation
+    and decoding errors are reported with their type.
+    """
+    if isinstance(error, (err.ValidationError, ValueError)):
+        return par.messages(error)
+    return ['{}: {}'.format(type(error).__name__, error)]
+
+
+def validate_records(records):
+    """ `(value, error)` of each of the raw JSON `records`. Whatever a record
+    raises is its error, the others are still validated.
+    """
+    schema = _worker['schema']
+    rv = []
+    if _worker['batched']:
+        # the records are validated together, so that the values bound for
+        # a `batched()` processor are looked up at once
+        documents = []
+        for record in records:
+            try:
+                documents.append(json.loads(record))
+                rv.append(None)
+            except ValueError as e:
+                rv.append((None, e))
+        try:
+            result = schema.validate_many(documents)
+        except Exception:
+            # a document raised more than a validation error, the records
+            # are validated one at a time to tell which
+            return validate_each(schema, records)
+        values = iter(result.values)
+        decoded = [i for i, outcome in enumerate(rv) if outcome is None]
+        for n, i in enumerate(decoded):
+            e = result.errors.get(n)
+            rv[i] = (None, e) if e is not None else (next(values), None)
+        return rv
+    return validate_each(schema, records)
+
+
+def validate_each(schema, records):
+    rv = []
+    loads = getattr(schema, 'loads', None)
+    for record in records:
+        try:
+            if loads is None:
+                rv.append((schema.validate(json.loads(record)), None))
+            else:
+                rv.append((loads(record), None))
+        except Exception as e:
+            rv.append((None, e))
+    return rv
+
+
+def _lines(records):
+    if not records:
+        return b''
+    return ('\n'.join(records) + '\n').encode('utf-8')
+
+
+def is_gzip(path):
+    with open(path, 'rb') as fp:
+        return fp.read(2)==b'\x1f\x8b'
+
+
+def mapped_chunks(path, start, chunk_size):
+    """ `(start, end, None)` tasks over the input, ending on line boundaries
+    """
+    with open(path, 'rb') as fp:
+        size = os.fstat(fp.fileno()).st_size
+        if not size:
+            return
+        with mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            while start<size:
+                end = data.find(b'\n', min(start + chunk_size, size) - 1)
+                end = size if end<0 else end + 1
+                yield start, end, None
+                start = end
+
+
+def gzip_chunks(path, start, chunk_size):
+    """ `(start, end, data)` tasks over the decompressed input, whose offsets
+    are those of the decompressed stream.
+    """
+    with gzip.open(path, 'rb') as fp:
+        skipped = 0
+        while skipped<start:
+            # resuming, the stream has to be decompressed up to the offset
+            block = fp.read(min(chunk_size, start - skipped))
+            if not block:
+                return
+            skipped += len(block)
+        pending = b''
+        while True:
+            block = fp.read(chunk_size)
+            if not block:
+                break
+            block = pending + block
+            cut = block.rfind(b'\n') + 1
+            if not cut:
+                pending = block
+                continue
+            pending = block[cut:]
+            yield start, start + cut, block[:cut]
+            start += cut
+        if pending:
+            yield start, start + len(pending), pending
+
+
+class Progress:
+    """ Throughput reports, on stderr """
+
+    def __init__(self, stream, interval=1.0):
+        self.stream = stream
+        self.interval = interval
+        self.started = self.reported = time.monotonic()
+        self.records = self.invalid = self.size = 0
+
+    def update(self, records, invalid, size):
+        self.records += records
+        self.invalid += invalid
+        self.size += size
+        now = time.monotonic()
+        if self.stream and now - self.reported>=self.interval:
+            self.reported = now
+            self.report(final=False)
+
+    def report(self, final=True):
+        if not self.stream:
+            return
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        self.stream.write(
+            '\r{} records ({} invalid), {:.0f} records/s, {:.1f} MB/s{}'.format(
+                self.records, self.invalid, self.records / elapsed,
+                self.size / elapsed / 1e6, '\n' if final else ''))
+        self.stream.flush()
+
+
+# the offset of the input reached, and the sizes of the outputs then, or None
+# for streams
+Checkpoint = collections.namedtuple('Checkpoint', 'offset output errors')
+
+def read_checkpoint(path):
+    try:
+        with open(path) as fp:
+            fields = [int(f) for f in fp.read().split()]
+    except FileNotFoundError:
+        fields = []
+    # checkpoints that only have the offset leave the outputs as they are
+    fields += [0, -1, -1][len(fields):]
+    offset, output, errors = fields[:3]
+    return Checkpoint(offset, None if output<0 else output,
+                      None if errors<0 else errors)
+
+
+def write_checkpoint(path, offset, output, errors):
+    # written aside then moved, so that a crash never leaves a partial file
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as fp:
+        fp.write('{} {} {}'.format(
+            offset, output_size(output), output_size(errors)))
+    os.replace(tmp, path)
+
+
+def output_size(stream):
+    if stream in (sys.stdout.buffer, sys.stderr.buffer):
+        return -1
+    return stream.tell()
+
+
+def open_output(path, append, default, size=None):
+    if path=='-':
+        return default
+    rv = open(path, 'ab' if append else 'wb')
+    if append and size is not None and rv.tell()>size:
+        # written after the checkpoint, the chunks are validated again
+        rv.truncate(size)
+    return rv
+
+
+def run(tasks, workers, schema_path, compiled):
+    """ Validated chunks, in the order of the input. The number of chunks
+    in flight is bounded so that memory does not grow with the input.
+    """
+    if workers<=1:
+        init_worker(schema_path, compiled)
+        for task in tasks:
+            yield validate_chunk(*task)
+        return
+    with futures.ProcessPoolExecutor(
+            workers, initializer=init_worker,
+            initargs=(schema_path, compiled)) as executor:
+        pending = collections.deque()
+        for path, task in tasks:
+            pending.append(executor.submit(validate_chunk, path, *task))
+            if len(pending)>=workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m vino',
+        description='Validate an NDJSON file with a vino schema.')
+    parser.add_argument('schema', help='module:attribute of the schema')
+    parser.add_argument('input', help='NDJSON file, possibly gzipped')
+    parser.add_argument('-o', '--output', default='-',
+                        help='valid records (default: stdout)')
+    parser.add_argument('-e', '--errors',
+                        help='invalid records, - for stderr '
+                             '(default: INPUT.errors)')
+    parser.add_argument('-w', '--workers', type=int, default=os.cpu_count(),
+                        help='worker processes (default: number of CPUs)')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE,
+                        help='bytes per chunk (default: %(default)s)')
+    parser.add_argument('--compiled', action='store_true',
+                        help='compile the schema (see vino.compiler)')
+    parser.add_argument('--checkpoint',
+                        help='file recording the offset reached')
+    parser.add_argument('--resume', action='store_true',
+                        help='resume from the offset of --checkpoint')
+    parser.add_argument('-q', '--quiet', action='store_true',
+                        help='do not report throughput')
+    args = parser.parse_args(argv)
+    if args.resume and not args.checkpoint:
+        parser.error('--resume requires --checkpoint')
+    if args.errors is None:
+        args.errors = args.input + '.errors'
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    checkpoint = Checkpoint(0, None, None)
+    if args.resume:
+        checkpoint = read_checkpoint(args.checkpoint)
+    start = checkpoint.offset
+    chunks = gzip_chunks if is_gzip(args.input) else mapped_chunks
+    tasks = chunks(args.input, start, args.chunk_size)
+    if args.workers>1:
+        tasks = ((args.input, task) for task in tasks)
+    else:
+        tasks = ((args.input,) + task for task in tasks)
+    output = open_output(args.output, args.resume, sys.stdout.buffer,
+                         checkpoint.output)
+    errors = open_output(args.errors, args.resume, sys.stderr.buffer,
+                         checkpoint.errors)
+    # reports would be mixed up with errors written on stderr
+    quiet = args.quiet or errors is sys.stderr.buffer
+    progress = Progress(None if quiet else sys.stderr)
+    previous = start
+    try:
+        for end, valid, invalid, n_valid, n_invalid in run(
+                tasks, args.workers, args.schema, args.compiled):
+            output.write(valid)
+            errors.write(invalid)
+            if args.checkpoint:
+                output.flush()
+                errors.flush()
+                write_checkpoint(args.checkpoint, end, output, errors)
+            progress.update(n_valid + n_invalid, n_invalid, end - previous)
+            previous = end
+    finally:
+        for stream in (output, errors):
+            if stream not in (sys.stdout.buffer, sys.stderr.buffer):
+                stream.close()
+            else:
+                stream.flush()
+    progress.report()
+    return 1 if progress.invalid else 0
+
+
+if __name__=='__main__':
+    sys.exit(main())
@@ -0,0 +1,763 @@
+import time
+import copy
+import itertools
+import asyncio
+import inspect
+import functools
+import threading
+from concurrent import futures
+from . import contexts as ctx
+from . import qualifiers as qls
+from . import schema as shm
+from . import columnar as col
+from . import utils as uls
+from . import errors as err
+from . import deadlines as dls
+from .processors import runners as rnr
+
+"""
+Validation with coroutine processors, for checks that have to await a
+database or a remote service.
+
+    >>> async def unique_email(data, state):
+    ...     if await db.users.exists(email=data):
+    ...         raise ValidationError('Email already registered')
+    ...     return data
+    >>> user = obj(
+    ...     prim(is_str, unique_email).apply_to('email'),
+    ...     prim(is_str, existing_team).apply_to('team'),
+    ... )
+    >>> data = await user.validate_async(payload, limit=10)
+
+Processors, as well as their `default`, `override` and `failsafe` callbacks,
+can be coroutine functions. The members of an object are validated
+concurrently, each going through its runners in order, and so are the items
+of an array. `limit` caps the number of coroutines awaited at once.
+
+The result and the errors are those `validate()` would produce, the first
+failing member or item in order being the one reported. Unlike `validate()`
+though, members and items that follow a failing one are still validated.
+
+Parts of a schema that don't involve any coroutine are run by the regular
+engine, a schema without any coroutine costs what `validate()` does.
+
+Blocking processors that release the GIL (hashing, compression, sqlite...)
+can be wrapped in `offload()`. The engine then runs them on a shared pool of
+threads, concurrently for independent members and items, like coroutines.
+`validate_offloaded()` does so for callers outside an event loop.
+
+    >>> user = obj(
+    ...     prim(is_str, offload(saltyhash)).apply_to('password'),
+    ...     prim(is_str, offload(saltyhash)).apply_to('secret'),
+    ... )
+    >>> data = user.validate_offloaded(payload)
+
+Large documents can also be validated cooperatively, giving the event loop
+back every `yield_every` items or members, or every `yield_interval`
+seconds, whichever comes first. Nested containers are then traversed by the
+engine, one item or member at a time, so that the validation can be resumed
+from where it paused. Containers of primitives of up to `flat_length` items
+or members are validated in one go.
+
+    >>> rows = await readings.validate_async(payload, yield_every=1000)
+
+Lookups that can be made for many values at once are declared with
+`batched()`. The engine collects the values bound for the processor until
+every pending validation is waiting on a batch, then calls it once with
+all of them, across the items of an array or the documents of
+`validate_many_async()`, or of `validate_many()` which then runs the engine
+on a loop of its own. The documents are taken from their iterable
+`window_size` at a time, and the lookups batched within a window.
+`validate_windows()` yields their outcomes as each window is done.
+
+    >>> def existing_users(ids):
+    ...     found = {r[0] for r in db.execute(select_ids(ids))}
+    ...     return [i if i in found else ValidationError('Unknown user')
+    ...             for i in ids]
+    >>> team = obj(arr(prim(is_int, batched(existing_users)).apply_to('*')
+    ...                ).apply_to('members'))
+"""
+
+
+class Offloaded:
+    """
+    Wraps a blocking processor to be run on the pool of `get_executor()` by
+    the asynchronous engine. `validate()` still runs it inline.
+    """
+
+    def __init__(self, processor):
+        proxy = rnr.Runner(processor).processor
+        self.processor = proxy.raw_processor
+        self.name = getattr(self.processor, 'name', None)
+        self.run = proxy.run
+        self.default = proxy.default
+        self.override = proxy.override
+        self.failsafe = proxy.failsafe
+
+offload = Offloaded
+
+
+class BatchProcessor:
+    """
+    Wraps `fnc(values)`, that returns a list with the result of each value,
+    or the `ValidationError` to raise for it. `fnc` may be a coroutine
+    function. The asynchronous engine calls it with up to `max_size` values
+    at once, as does `validate_many()`, `validate()` with one value at a
+    time. Within a validation, a value is only looked up once.
+    """
+
+    def __init__(self, fnc, max_size=None):
+        self.fnc = fnc
+        self.max_size = max_size
+        self.name = getattr(fnc, '__name__', None)
+
+    def run(self, data, state=None):
+        if inspect.iscoroutinefunction(self.fnc):
+            raise err.VinoError(
+                '{} can only be run by validate_async()'.format(self.name))
+        return self.result(self.fnc([data])[0])
+
+    @staticmethod
+    def result(rv):
+        if isinstance(rv, err.ValidationError):
+            # the result can be shared by several values
+            raise copy.copy(rv)
+        return rv
+
+batched = BatchProcessor
+
+
+class BatchLoader:
+    """ The values waiting for a `BatchProcessor`, in one validation """
+
+    def __init__(self, processor):
+        self.processor = processor
+        self.pending = []
+        # (type, value) -> future of its result
+        self.futures = {}
+
+    def get(self, data):
+        # values that are equal but of different types (1, 1.0, True) are
+        # looked up separately
+        key = type(data), data
+        try:
+            return self.futures[key]
+        except KeyError:
+            pass
+        except TypeError:
+            # unhashable, looked up every time
+            future = asyncio.get_running_loop().create_future()
+            self.pending.append((data, future))
+            return future
+        future = self.futures[key] = (
+            asyncio.get_running_loop().create_future())
+        self.pending.append((data, future))
+        return future
+
+    def dispatch(self):
+        pending, self.pending = self.pending, []
+        size = self.processor.max_size or len(pending)
+        for start in range(0, len(pending), size):
+            self.call(pending[start:start + size])
+
+    def call(self, batch):
+        try:
+            rv = self.processor.fnc([value for value, future in batch])
+        except Exception as e:
+            self.resolve(batch, error=e)
+            return
+        if inspect.isawaitable(rv):
+            asyncio.ensure_future(rv).add_done_callback(
+                functools.partial(self.resolved, batch))
+        else:
+            self.resolve(batch, rv)
+
+    def resolved(self, batch, task):
+        if task.cancelled():
+            self.resolve(batch, error=asyncio.CancelledError())
+        elif task.exception() is not None:
+            self.resolve(batch, error=task.exception())
+        else:
+            self.resolve(batch, task.result())
+
+    def resolve(self, batch, results=None, error=None):
+        if error is None and len(results)!=len(batch):
+            error = err.VinoError(
+                '{} returned {} results for {} values'.format(
+                    self.processor.name, len(results), len(batch)))
+        for i, (value, future) in enumerate(batch):
+            if future.cancelled():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(results[i])
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def get_executor():
+    """ The pool offloaded processors run on, created on first use """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = futures.ThreadPoolExecutor(
+                thread_name_prefix='vino-offload')
+        return _executor
+
+def set_executor(executor):
+    """ Run offloaded processors on `executor` from now on """
+    global _executor
+    with _executor_lock:
+        _executor = executor
+
+
+def nested_runners(processor):
+    """ The runners the processor delegates to """
+    if (isinstance(processor, ctx.Context)
+        and type(processor).run is ctx.Context.run):
+        return [r['runner'] for r in processor.runners]
+    if isinstance(processor, shm.MapEntriesProcessor):
+        return [r for r in (processor.values, processor.keys) if r]
+    return []
+
+
+def is_async(runner):
+    """ Does the runner, or any runner nested in its processor, involve a
+    coroutine function?
+    """
+    return runner.is_async
+
+@rnr.describes('is_async')
+def _is_async(runner):
+    processor = runner.processor
+    callbacks = [processor.run]
+    for fncs in (processor.override, processor.default, processor.failsafe):
+        try:
+            callbacks.extend(fncs or ())
+        except TypeError:
+            # not callbacks that `Runner.run()` could run either
+            pass
+    return (isinstance(runner._raw_processor, (Offloaded, BatchProcessor))
+            or any(inspect.iscoroutinefunction(f) for f in callbacks)
+            or any(is_async(r) for r in nested_runners(
+                runner._raw_processor)))
+
+
+def has_batches(context):
+    """ Does the context involve a `batched()` processor? """
+    return any(is_batched(r['runner']) for r in context.runners)
+
+def is_batched(runner):
+    return runner.is_batched
+
+@rnr.describes('is_batched')
+def _is_batched(runner):
+    raw = runner._raw_processor
+    return isinstance(raw, BatchProcessor) or any(
+        is_batched(r) for r in nested_runners(raw))
+
+
+def has_containers(runner):
+    """ Does the runner validate an array or an object, or nest one? """
+    return runner.has_containers
+
+@rnr.describes('has_containers')
+def _has_containers(runner):
+    raw = runner._raw_processor
+    return (isinstance(raw, shm.MapEntriesProcessor)
+            or getattr(raw, 'qualifier_stack_cls', None) is not None
+            or any(has_containers(r) for r in nested_runners(raw)))
+
+
+def is_async_context(context):
+    return any(is_async(r['runner']) for r in context.runners)
+
+
+async def validate(context, data=uls._undef, limit=None, yield_every=None,
+                   yield_interval=None):
+    """ See `SchemaBase.validate_async()` """
+    if yield_every is None is yield_interval and not is_async_context(context):
+        return context.validate(data)
+    return await AsyncEngine(limit, yield_every, yield_interval).run_context(
+        context, data)
+
+
+# containers of primitives up to that length are validated in one go
+# between two pauses of a cooperative validation, see
+# `AsyncEngine.in_one_go()`
+flat_length = 256
+
+# documents validated together by `validate_many()`
+window_size = 256
+
+
+async def validate_windows(context, documents, limit=None, window=None):
+    """
+    Validate the `documents` concurrently, `window` (`window_size` by
+    default) at a time, and yield the `(index, value, error)` of each of them, error
+    being None for valid documents, once its window is done. The iterable is
+    only consumed as windows are needed.
+
+        >>> async for i, value, e in validate_windows(user, stream):
+        ...     pass
+    """
+    window = window or window_size
+    documents = iter(documents)
+    offset = 0
+    while True:
+        chunk = list(itertools.islice(documents, window))
+        if not chunk:
+            return
+        # an engine per window, so that the values it looked up don't
+        # pile up
+        engine = AsyncEngine(limit)
+        async def document(data):
+            try:
+                return await engine.run_context(context, data), None
+            except err.ValidationError as e:
+                return None, e
+        outcomes = await engine.gather(document(data) for data in chunk)
+        for i, (value, e) in enumerate(outcomes, offset):
+            yield i, value, e
+        offset += len(chunk)
+
+
+async def validate_many(context, documents, limit=None, window=None):
+    """ See `SchemaBase.validate_many_async()` """
+    values = []
+    failed = {}
+    count = 0
+    async for i, value, e in validate_windows(context, documents, limit,
+                                              window):
+        if e is None:
+            values.append(value)
+        else:
+            failed[i] = e
+        count += 1
+    return ctx.BatchResult(values, failed, count)
+
+
+def validate_many_batched(context, documents, gc_threshold=None):
+    """
+    `Context.validate_many()` of a context that involves `batched()`
+    processors (see `has_batches()`). The documents are validated by the
+    asynchronous engine on a loop of its own, a window at a time, so that
+    the values bound for a processor are looked up together. From within a
+    running event loop, the documents are validated one at a time instead.
+    """
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        with uls.gc_tuned(gc_threshold):
+            return run_sync(validate_many(context, documents))
+    return ctx.validate_many(context.validate, documents, gc_threshold)
+
+
+def validate_offloaded(context, data=uls._undef, limit=None):
+    """ See `SchemaBase.validate_offloaded()` """
+    if not is_async_context(context):
+        return context.validate(data)
+    return run_sync(AsyncEngine(limit).run_context(context, data))
+
+
+def run_sync(coroutine):
+    # a loop of its own, closed once the validation is done
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+class AsyncEngine:
+    """
+    The coroutine counterpart of `RunnerStack.run`, `Runner.run` and of the
+    qualifier stacks, for one validation.
+    """
+
+    def __init__(self, limit=None, yield_every=None, yield_interval=None):
+        self.semaphore = None if limit is None else asyncio.Semaphore(limit)
+        self.yield_every = yield_every
+        self.yield_interval = yield_interval
+        self.cooperative = not (yield_every is None is yield_interval)
+        self.steps = 0
+        if yield_interval is not None:
+            self.deadline = time.perf_counter() + yield_interval
+        self.flat_length = flat_length
+        if yield_every is not None:
+            self.flat_length = min(yield_every, flat_length)
+        # runner -> (involves coroutines, run by the engine, validates a
+        # container of primitives), a plain dict being much faster than the
+        # weak mappings
+        self.runners = {}
+        # BatchProcessor -> BatchLoader. Batches are dispatched once none of
+        # the `active` validations can go any further without them.
+        self.loaders = {}
+        self.active = 1
+
+    def lookup(self, runner):
+        try:
+            return self.runners[runner]
+        except KeyError:
+            concurrent = is_async(runner)
+            container = self.cooperative and has_containers(runner)
+            rv = self.runners[runner] = (
+                concurrent, concurrent or container,
+                container and not concurrent and not any(
+                    has_containers(r)
+                    for r in nested_runners(runner._raw_processor)))
+            return rv
+
+    def concurrent(self, runner):
+        """ Are the items or members of the runner validated concurrently? """
+        return self.lookup(runner)[0]
+
+    def descends(self, runner):
+        """ Is the runner run by the engine, rather than by `Runner.run`? """
+        return self.lookup(runner)[1]
+
+    def in_one_go(self, runner, data):
+        """ Is the runner a container of primitives, with `data` small
+        enough to be validated by `Runner.run` between two pauses? Its items
+        or members then count as steps.
+        """
+        if not self.lookup(runner)[2]:
+            return False
+        try:
+            length = len(data)
+        except TypeError:
+            length = 0
+        if length>self.flat_length:
+            return False
+        self.steps += length
+        return True
+
+    def due(self):
+        # one more item or member, time to give the event loop back?
+        self.steps += 1
+        return ((self.yield_every is not None and self.steps>=self.yield_every)
+                or (self.yield_interval is not None
+                    and time.perf_counter()>=self.deadline))
+
+    async def pause(self):
+        self.steps = 0
+        await asyncio.sleep(0)
+        if self.yield_interval is not None:
+            self.deadline = time.perf_counter() + self.yield_interval
+
+    async def each(self, fnc, arguments, concurrent):
+        """ `fnc(*args)` for each of the `arguments`, either concurrently or
+        one after the other, pausing if the engine is cooperative.
+        """
+        if concurrent:
+            return await self.gather(fnc(*args) for args in arguments)
+        rv = []
+        for args in arguments:
+            rv.append(await fnc(*args))
+            if self.cooperative and self.due():
+                await self.pause()
+        return rv
+
+    async def call(self, fnc, *args, **kwargs):
+        rv = fnc(*args, **kwargs)
+        if inspect.isawaitable(rv):
+            if self.semaphore is None:
+                return await rv
+            async with self.semaphore:
+                return await rv
+        return rv
+
+    async def gather(self, coroutines):
+        # every coroutine is awaited, the first error in order is raised
+        coroutines = [self.unit(c) for c in coroutines]
+        self.active += len(coroutines)
+        self.idle()
+        try:
+            results = await asyncio.gather(*coroutines, return_exceptions=True)
+        finally:
+            self.active += 1
+        for rv in results:
+            if isinstance(rv, BaseException):
+                raise rv
+        return results
+
+    async def unit(self, coroutine):
+        try:
+            return await coroutine
+        finally:
+            self.idle()
+
+    def idle(self):
+        # a validation finished, or waits for others or for a batch
+        self.active -= 1
+        if not self.active and any(l.pending for l in self.loaders.values()):
+            asyncio.get_running_loop().call_soon(self.flush)
+
+    def flush(self):
+        if self.active:
+            return
+        for loader in self.loaders.values():
+            if loader.pending:
+                loader.dispatch()
+
+    async def load(self, processor, data):
+        try:
+            loader = self.loaders[processor]
+        except KeyError:
+            loader = self.loaders[processor] = BatchLoader(processor)
+        future = loader.get(data)
+        self.idle()
+        try:
+            # shared with the other validations of the value
+            rv = await asyncio.shield(future)
+        finally:
+            self.active += 1
+        return processor.result(rv)
+
+    async def run_context(self, context, data):
+        # Context.run()
+        state = context.make_state()
+        return context.finalize(
+            await self.run_stack(context.runners, data, state))
+
+    async def run_stack(self, stack, data, state):
+        # RunnerStack.run(), without the grouping of member runners, see
+        # `apply_members()`
+        e_stack = None
+        budget = dls.current.get()
+        for index, runners, runs in stack.plan:
+            if budget is not None:
+                budget.tick()
+            if index is not None:
+                saved = index.save_matches(state)
+                done = {}
+                try:
+                    if self.cooperative or any(
+                            self.descends(r['runner']) for r in runners):
+                        data = await self.apply_members(index, runners, data,
+                                                        state, done)
+                    else:
+                        data = index.apply(data, runs, state, done)
+                    continue
+                except err.ValidationError:
+                    index.restore_matches(state, saved)
+            for pos, runner in enumerate(runners):
+                r,q = runner['runner'],runner['qualifiers']
+                try:
+                    if index is not None:
+                        data = await self.replay_members(index, pos, r, data,
+                                                         state, done)
+                    elif not (self.descends(r) or q and self.cooperative):
+                        data = q.apply(data, r, state) if q else r.run(
+                            data, state)
+                    elif isinstance(q, qls.ItemQualifierStack):
+                        data = await self.apply_items(q, data, r, state)
+                    elif isinstance(q, qls.MemberQualifierStack):
+                        data = await self.apply_members(
+                            q.index_cls([q]), (runner,), data, state)
+                    elif q:
+                        data = q.apply(data, r, state)
+                    else:
+                        data = await self.run_runner(r, data, state)
+                    if data is uls._undef:
+                        break
+                except err.ValidationError as e:
+                    stack._copy_data_in_err(e, data)
+                    if e_stack is None:
+                        e_stack = err.ValidationErrorStack('Validation Errors')
+                    e_stack.append(e)
+                    if e.interrupt_validation:
+                        break
+            else:
+                continue
+            break
+        if e_stack is None:
+            return data
+        stack._copy_data_in_err(e_stack, data)
+        raise e_stack
+
+    async def run_runner(self, runner, data, state):
+        # Runner.run()
+        if not self.descends(runner) or self.in_one_go(runner, data):
+            return runner.run(data, state)
+        processor = runner.processor
+        for fnc in processor.override or ():
+            data = await self.call(fnc, data=data, state=state)
+        if data is uls._undef and processor.default:
+            for fnc in processor.default:
+                data = await self.call(fnc, data=data, state=state)
+        try:
+            data = await self.run_processor(runner, data, state)
+        except err.ValidationError as error:
+            if not processor.failsafe:
+                raise error
+            try:
+                for fnc in processor.failsafe:
+                    data = await self.call(fnc, data=data, state=state)
+            except err.ValidationError:
+                raise error
+        return data
+
+    async def run_processor(self, runner, data, state):
+        raw = runner._raw_processor
+        if (isinstance(raw, ctx.Context)
+            and type(raw).run is ctx.Context.run):
+            return await self.run_context(raw, data)
+        if isinstance(raw, shm.MapEntriesProcessor):
+            return await self.run_entries(raw, data, state)
+        if isinstance(raw, Offloaded):
+            return await self.call(self.offload, raw.run, data, state)
+        if isinstance(raw, BatchProcessor):
+            return await self.load(raw, data)
+        return await self.call(runner.processor.run, data, state)
+
+    def offload(self, fnc, *args):
+        return asyncio.get_running_loop().run_in_executor(
+            get_executor(), functools.partial(fnc, *args))
+
+    async def run_entries(self, processor, data, state):
+        # MapEntriesProcessor.run()
+        if data is None:
+            return data
+        async def entry(k, v):
+            if processor.keys is not None:
+                k = await self.run_runner(processor.keys, k, state)
+                if k is uls._undef:
+                    return k, k
+            return k, await self.run_runner(processor.values, v, state)
+        concurrent = self.concurrent(processor.values) or (
+            processor.keys is not None and self.concurrent(processor.keys))
+        entries = await self.each(entry, data.items(), concurrent)
+        return {k:v for k,v in entries
+                if k is not uls._undef and v is not uls._undef}
+
+    async def apply_items(self, q, data, runner, state):
+        # ItemQualifierStack.apply(), with the qualified items validated
+        # concurrently when they involve coroutines, and transposed for
+        # columnar stacks asked for columns. The error of a failing item is
+        # given its index.
+        rv = list(data)
+        if q.qualifiers['all']:
+            qualified = range(len(rv))
+        else:
+            matches = q._get_matches(state)
+            length = len(rv)
+            qualified = []
+            for i,d in enumerate(rv):
+                if q.index_match(i, length):
+                    matches['by_index'].add(i)
+                    qualified.append(i)
+                elif q.call_match(i, d):
+                    matches['by_call'].add(i)
+                    qualified.append(i)
+        async def item(i):
+            try:
+                return await self.run_runner(runner, rv[i], state)
+            except err.ValidationError as e:
+                # see `ItemQualifierStack.apply()`
+                e.index = i
+                raise
+        results = await self.each(
+            item, ((i,) for i in qualified), self.concurrent(runner))
+        for i, value in zip(qualified, results):
+            rv[i] = value
+        if isinstance(q, qls.ColumnarItemQualifierStack) and q.as_columns:
+            return col.transpose(rv, q.item_runner)
+        return rv
+
+    async def apply_members(self, index, runners, data, state, done=None):
+        # MemberQualifierIndex.apply(), with each key going through its
+        # runners concurrently to the others
+        if done is None:
+            done = {}
+        matches = index.stacks[0]._get_matches(state)
+        by_key, by_call = matches['by_key'], matches['by_call']
+        runners = [r['runner'] for r in runners]
+        async def member(k, value):
+            hits = index.pattern_positions(k) if index.patterns else ()
+            for pos, matched_by_key in index.index.get(k, index.fallback):
+                if matched_by_key:
+                    by_key.add(k)
+                elif pos in hits or index.stacks[pos].callable_match(k, value):
+                    by_call.add(k)
+                else:
+                    continue
+                value = await self.record(runners[pos], pos, k, value, state,
+                                          done)
+            return value
+        keys = list(data)
+        values = await self.each(member, data.items(),
+                                 any(self.concurrent(r) for r in runners))
+        rv = dict(zip(keys, values))
+        # MemberQualifierIndex._process_missing_keys()
+        for pos, keys in enumerate(index.keys):
+            unmatched = keys.difference(by_key)
+            if not unmatched:
+                continue
+            default = await self.record(runners[pos], pos, uls._undef,
+                                        uls._undef, state, done)
+            if default is uls._undef:
+                continue
+            for k in unmatched:
+                value = default
+                by_key.add(k)
+                for later, matched_by_key in index.index[k]:
+                    if later<=pos:
+                        continue
+                    if matched_by_key:
+                        by_key.add(k)
+                    elif (later in index.pattern_positions(k)
+                          or index.stacks[later].callable_match(k, value)):
+                        by_call.add(k)
+                    else:
+                        continue
+                    value = await self.record(runners[later], later, k, value,
+                                              state, done)
+                rv[k] = value
+        return rv
+
+    async def record(self, runner, pos, k, value, state, done):
+        # MemberQualifierIndex._record()
+        try:
+            rv = await self.run_runner(runner, value, state)
+        except err.ValidationError as e:
+            done[pos, k] = value, None, e
+            raise
+        done[pos, k] = value, rv, None
+        return rv
+
+    async def replay_members(self, index, pos, runner, data, state, done):
+        # MemberQualifierIndex.replay()
+        q = index.stacks[pos]
+        matches = q._get_matches(state)
+        rv = {}
+        for k,value in data.items():
+            if q.keys_match(k):
+                matches['by_key'].add(k)
+            elif q.call_match(k, value):
+                matches['by_call'].add(k)
+            else:
+                rv[k] = value
+                continue
+            rv[k] = await self.rerun(runner, pos, k, value, state, done)
+            if self.cooperative and self.due():
+                await self.pause()
+        unmatched = index.keys[pos].difference(matches['by_key'])
+        if unmatched:
+            default = await self.rerun(runner, pos, uls._undef, uls._undef,
+                                       state, done)
+            if default is not uls._undef:
+                for k in unmatched:
+                    rv[k] = default
+                    matches['by_key'].add(k)
+        return rv
+
+    async def rerun(self, runner, pos, k, value, state, done):
+        # MemberQualifierIndex.rerun()
+        previous = done.get((pos, k))
+        if previous is None or previous[0] is not value:
+            return await self.run_runner(runner, value, state)
+        if previous[2] is not None:
+            raise previous[2]
+        return previous[1]
@@ -0,0 +1,172 @@
+from collections import namedtuple
+from . import contexts as ctx
+from . import qualifiers as qls
+from . import schema as shm
+from . import vectorized as vec
+from . import utils as uls
+from . import errors as err
+from .processors import runners as rnr
+from .processors import validating as vld
+from .processors import marshalling as msh
+
+"""
+Columnar validation of arrays of flat objects, see
+`ArrayTypeSchema.columnar()`.
+
+The objects are transposed into one column of values per declared property,
+and each column goes through the runner of its property in a single loop,
+or through the checks of `vino.vectorized` when they apply. The objects are
+then put back together, unless the array is asked for as a dict of columns.
+
+    >>> events = arr(obj(
+    ...     prim(is_int, between(0)).apply_to('ts'),
+    ...     prim(is_str, one_of('click', 'view')).apply_to('kind'),
+    ...     unmatched_properties('remove'),
+    ... ).apply_to('*')).columnar(as_columns=True)
+    >>> events.validate(rows)
+    {'ts': [1700000000, ...], 'kind': ['click', ...]}
+
+The object schema can only consist of properties qualified by their keys,
+each key in a single declaration, followed by `allowempty`, `allownull` and
+`unmatched_properties()` clauses. Other schemas, and arrays with items that
+are not dicts, are validated one object at a time. The runners of the
+properties are given a state shared by the whole column.
+
+When an object fails, it is validated again by its schema to raise the error
+the regular path would have raised (see `ItemQualifierStack.apply()`).
+"""
+
+Plan = namedtuple('Plan', 'context fields keys not_empty unmatched')
+
+
+def plan(runner):
+    """ How the objects validated by `runner` are validated by columns: a
+    `Plan` of the `(key, runner)` fields, whether empty objects fail and the
+    `unmatched_properties()` action, if any, or None if its objects can't be
+    validated by columns.
+    """
+    return getattr(runner, 'columnar_plan', None)
+
+@rnr.describes('columnar_plan')
+def _plan(runner):
+    context = getattr(runner, '_raw_processor', None)
+    if (not isinstance(context, shm.ObjectTypeSchema)
+        or vec.has_callbacks(runner)
+        or type(context).run is not ctx.Context.run
+        or type(context).finalize is not shm.ObjectTypeSchema.finalize
+        or type(context.runners).run is not rnr.RunnerStack.run):
+        return None
+    entries = context.runners.runners
+    head = [e['runner']._raw_processor for e in entries[:2]]
+    if (len(head)<2 or type(head[0]) is not vld.Required
+        or head[1] is not vld.is_object_type):
+        return None
+    fields, keys, tail = [], set(), False
+    not_empty, unmatched = False, None
+    for entry in entries[2:]:
+        r, q = entry['runner'], entry['qualifiers']
+        if vec.has_callbacks(r):
+            return None
+        if q:
+            if (tail or type(q) is not qls.MemberQualifierStack
+                or q.qualifiers['callables'] or q.qualifiers['patterns']
+                or keys & q.qualifiers['keys']):
+                return None
+            keys.update(q.qualifiers['keys'])
+            fields.extend(
+                (k, r) for k in sorted(q.qualifiers['keys'], key=repr))
+            continue
+        # the clauses that follow the properties
+        tail = True
+        processor = r._raw_processor
+        if type(processor) is vld.NotAllowEmpty:
+            not_empty = not_empty or processor.flag
+        elif type(processor) is msh.UnmatchedProperties and unmatched is None:
+            unmatched = processor.action
+        elif type(processor) is not vld.NotAllowNull:
+            return None
+    return Plan(context, tuple(fields), frozenset(keys), not_empty, unmatched)
+
+
+def run_column(values, runner, state):
+    """ The `values` validated by `runner`, and the index of the first one
+    that fails or None.
+    """
+    rv = vec.vectorize(values, runner)
+    if rv is not None:
+        return rv
+    run = runner.run
+    validated = []
+    append = validated.append
+    try:
+        for value in values:
+            append(run(value, state))
+    except err.ValidationError:
+        return validated, len(validated)
+    return validated, None
+
+
+def apply(data, runner, state, as_columns=False):
+    """
+    Return `[runner.run(d, state) for d in data]` validated by columns, or
+    as a dict of columns, and the index of the first failing object or None,
+    or None if `runner` or `data` can't be validated by columns. Failing
+    objects are not validated again.
+    """
+    layout = plan(runner)
+    if layout is None or not all(type(d) is dict for d in data):
+        return None
+    _undef = uls._undef
+    # the first failing object, if any
+    failed = length = len(data)
+    records = data
+    column_state = layout.context.make_state()
+    columns = []
+    for key, r in layout.fields:
+        values, index = run_column(
+            [d.get(key, _undef) for d in records], r, column_state)
+        if index is not None:
+            failed = index
+            # the objects that follow don't matter anymore
+            records = records[:index]
+        columns.append((key, values))
+    for i, d in enumerate(records):
+        if layout.unmatched=='raise' and d.keys() - layout.keys:
+            failed = i
+            break
+        if layout.not_empty and not d and all(
+                values[i] is _undef for key, values in columns):
+            failed = i
+            break
+    if failed<length:
+        return None, failed
+    if as_columns:
+        return {key: [None if v is _undef else v for v in values]
+                for key, values in columns}, None
+    rv = [dict(d) for d in data]
+    for key, values in columns:
+        for d, value in zip(rv, values):
+            if value is _undef:
+                d.pop(key, None)
+            else:
+                d[key] = value
+    if layout.unmatched=='remove':
+        for d in rv:
+            for key in d.keys() - layout.keys:
+                del d[key]
+    return rv, None
+
+
+def transpose(rows, runner):
+    """ The validated objects `rows` as a dict of columns: those of the
+    declared properties, or of all the keys found if `runner` can't be
+    validated by columns.
+    """
+    layout = plan(runner)
+    if layout is not None:
+        keys = [key for key, r in layout.fields]
+    else:
+        keys = list(dict.fromkeys(
+            k for row in rows if row is not None for k in row))
+    return {key: [None if row is None else row.get(key) for row in rows]
+            for key in keys}
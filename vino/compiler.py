@@ -0,0 +1,419 @@
+import itertools
+from . import contexts as ctx
+from . import qualifiers as qls
+from . import utils as uls
+from . import errors as err
+from . import jsonstream as jss
+from . import aio
+from . import deadlines as dls
+from . import vectorized as vec
+from .processors import runners as rnr
+
+"""
+The compiler turns a schema into specialized Python source code that is then
+built with `exec`. The interpreted engine walks from `RunnerStack.run` to the
+qualifier stacks, to the `Runners`, to their `ProcProxy`, before reaching a
+processor. The compiled function instead unrolls the runner stack of each
+Context, only emits the override, default and failsafe branches that a
+processor actually declares, inlines key and index dispatch of the qualifier
+stacks and calls nested Contexts directly. Runners that the `RunnerStack`
+groups under a single index are handed the generated runner functions.
+
+    >>> from vino import obj, prim, is_str
+    >>> user = obj(prim(is_str).apply_to('firstname', 'lastname'))
+    >>> compiled = user.compile()
+    >>> compiled.validate({'firstname': 'Peter', 'lastname': 'Parker'})
+    {'firstname': 'Peter', 'lastname': 'Parker'}
+
+The compiled schema produces the same results and raises the same errors as
+the schema it was compiled from. It takes a snapshot of the schema though, so
+it should be compiled once the schema is fully declared.
+"""
+
+class CompiledSchema:
+
+    def __init__(self, context, function, source):
+        self.context = context
+        self.function = function
+        self.source = source
+        # the compiled schema is a snapshot, the filter of `loads()` is too
+        self._key_filter = jss.key_filter(context)
+
+    def validate(self, data=uls._undef, *, deadline=None, cancel=None):
+        if deadline is None is cancel and dls.current.get() is None:
+            return self.function(data)
+        # the compiled code doesn't keep track of budgets, the schema it was
+        # compiled from does.
+        return self.context.validate(data, deadline=deadline, cancel=cancel)
+
+    def run(self, data, context):
+        """ A compiled schema can itself be nested as a processor """
+        return self.function(data)
+
+    def validate_many(self, documents, gc_threshold=None):
+        """ See `SchemaBase.validate_many` """
+        if aio.has_batches(self.context):
+            return aio.validate_many_batched(self.context, documents,
+                                             gc_threshold)
+        validate = self.function
+        if dls.current.get() is not None:
+            validate = self.validate
+        return ctx.validate_many(validate, documents, gc_threshold)
+
+    async def validate_async(self, data=uls._undef, limit=None,
+                             yield_every=None, yield_interval=None):
+        """ See `SchemaBase.validate_async`. The compiled function can't
+        await, a schema with coroutines, or validated cooperatively, is run
+        from its source schema.
+        """
+        engine = aio.AsyncEngine(limit, yield_every, yield_interval)
+        if engine.cooperative or aio.is_async_context(self.context):
+            return await engine.run_context(self.context, data)
+        return self.function(data)
+
+    async def validate_many_async(self, documents, limit=None, window=None):
+        """ See `SchemaBase.validate_many_async` """
+        if aio.is_async_context(self.context):
+            return await aio.validate_many(self.context, documents, limit,
+                                           window)
+        return self.validate_many(documents)
+
+    def validate_offloaded(self, data=uls._undef, limit=None):
+        """ See `SchemaBase.validate_offloaded` """
+        if aio.is_async_context(self.context):
+            return aio.run_sync(
+                aio.AsyncEngine(limit).run_context(self.context, data))
+        return self.function(data)
+
+    def loads(self, text, **kwargs):
+        """ See `jsonstream.loads` """
+        return jss.loads(text, self, retained=self._key_filter, **kwargs)
+
+    def validate_dumps(self, data=uls._undef, separators=None):
+        return jss.validate_dumps(self, data, separators)
+
+    def validate_dump(self, data, fp, separators=None):
+        return jss.validate_dump(self, data, fp, separators)
+
+
+class CompiledRunner:
+    """ Quacks like a `Runner` for qualifier stacks that are not inlined.
+    The checks of `vectorized` are those of the `runner` it stands for.
+    """
+
+    def __init__(self, run, runner=None):
+        self.run = run
+        self.vectorized_plan = vec.plan(runner)
+
+
+class SchemaCompiler:
+
+    def __init__(self):
+        self.namespace = {
+            '_undef': uls._undef,
+            'ValidationError': err.ValidationError,
+            'ValidationErrorStack': err.ValidationErrorStack,
+        }
+        self.blocks = []
+        # id(context) -> name of its generated function
+        self.functions = {}
+        self._counter = itertools.count()
+        self._pending = []
+        # module level statements that follow the generated functions
+        self.tail = []
+
+    def compile(self, context):
+        if not self.is_compilable(context):
+            raise err.VinoError(
+                'Cannot compile {}'.format(context.__class__.__name__))
+        name = self.context_function(context)
+        blocks = self.blocks + [self.tail]
+        source = '\n\n'.join('\n'.join(block) for block in blocks)
+        code = compile(source, '<vino compiled schema>', 'exec')
+        exec(code, self.namespace)
+        for compiled_runner, function in self._pending:
+            compiled_runner.run = self.namespace[function]
+        return CompiledSchema(context, self.namespace[name], source)
+
+    @classmethod
+    def is_compilable(cls, context):
+        # Contexts and RunnerStacks that override the way they run cannot be
+        # reproduced reliably, they're kept as opaque processors.
+        return (isinstance(context, ctx.Context)
+                and type(context).run is ctx.Context.run
+                and type(context.runners).run is rnr.RunnerStack.run)
+
+    def bind(self, prefix, value):
+        """ Make `value` available to the generated code and return its name.
+        """
+        name = '{}_{}'.format(prefix, next(self._counter))
+        self.namespace[name] = value
+        return name
+
+    def context_function(self, context):
+        key = id(context)
+        if key in self.functions:
+            return self.functions[key]
+        name = self.bind('context', None)
+        self.functions[key] = name
+        # keep a reference so that the id remains valid while compiling
+        context_name = self.bind('ctx', context)
+        stack = context.runners
+        copy_name = self.bind('copy_data_in_err', stack._copy_data_in_err)
+
+        lines = ['def {}(data):'.format(name), '    e_stack = None']
+        lines.append('    state = {}'.format(
+            self._state_expression(context, context_name)))
+        lines.append('    while True:')
+        for index, runners, runs in stack.plan:
+            if index is None:
+                lines.extend(self._indent(
+                    self._runner_block(runners[0], copy_name), 8))
+                continue
+            # grouped runners, see `RunnerStack.plan`
+            functions = [self.runner_function(r['runner']) for r in runners]
+            index_name = self.bind('index', index)
+            runs_name = self.bind('runs', None)
+            self.tail.append('{} = ({},)'.format(
+                runs_name, ', '.join(functions)))
+            lines.extend([
+                '        saved = {}.save_matches(state)'.format(index_name),
+                '        done = {}',
+                '        try:',
+                '            data = {}.apply(data, {}, state, done)'.format(
+                    index_name, runs_name),
+                '            retrace = False',
+                '        except ValidationError:',
+                '            {}.restore_matches(state, saved)'.format(
+                    index_name),
+                '            retrace = True',
+                '        if retrace:',
+            ])
+            for pos, runner in enumerate(runners):
+                step = ['data = {0}.replay({1}, data, {2}[{1}], state, '
+                        'done)'.format(index_name, pos, runs_name)]
+                lines.extend(self._indent(
+                    self._runner_block(runner, copy_name, step=step), 12))
+        lines.append('        break')
+        lines.append('    if e_stack is None:')
+        if type(context).finalize is ctx.Context.finalize:
+            lines.append('        return data')
+        else:
+            lines.append('        return {}(data)'.format(
+                self.bind('finalize', context.finalize)))
+        lines.append('    {}(e_stack, data)'.format(copy_name))
+        lines.append('    raise e_stack')
+        self.blocks.append(lines)
+        return name
+
+    def _runner_block(self, runner, copy_name, function=None, step=None):
+        # the equivalent of one iteration of `RunnerStack.run()`
+        if step is None:
+            step = self._step_lines(runner, function)
+        lines = ['try:']
+        lines.extend(self._indent(step, 4))
+        lines.extend([
+            '    if data is _undef:',
+            '        break',
+            'except ValidationError as e:',
+            '    {}(e, data)'.format(copy_name),
+            '    if e_stack is None:',
+            "        e_stack = ValidationErrorStack('Validation Errors')",
+            '    e_stack.append(e)',
+            '    if e.interrupt_validation:',
+            '        break',
+        ])
+        return lines
+
+    def _state_expression(self, context, context_name):
+        if (type(context).make_state is not ctx.Context.make_state
+            or type(context).init_matches is not ctx.Context.init_matches):
+            return '{}.make_state()'.format(context_name)
+        matches = {
+            None: 'None',
+            qls.MemberQualifierStack: "{'by_key': set(), 'by_call': set()}",
+            qls.ItemQualifierStack: "{'by_index': set(), 'by_call': set()}",
+        }.get(context.qualifier_stack_cls)
+        if matches is None:
+            matches = '{}.init_matches()'.format(context_name)
+        return "{{'matches': {}, 'context': {}}}".format(matches, context_name)
+
+    def _step_lines(self, runner, function=None):
+        # lines that apply one entry of the runner stack to `data`
+        r, q = runner['runner'], runner['qualifiers']
+        if not q:
+            return self._runner_lines(r)
+        if function is None:
+            function = self.runner_function(r)
+        q_name = self.bind('qualifiers', q)
+        if type(q) is qls.MemberQualifierStack:
+            return self._member_dispatch_lines(q, q_name, function)
+        # like `ItemQualifierStack.apply()`, the error of a failing item is
+        # given the index of the item
+        if (type(q) is qls.ItemQualifierStack and q.qualifiers['all']
+            and (vec.np is None or vec.plan(r) is None)):
+            return self._item_loop_lines(function)
+        if (type(q) is qls.ItemQualifierStack and not q.qualifiers['all']
+            and not q.qualifiers['sequences']):
+            return self._item_dispatch_lines(q, q_name, function)
+        # other qualifier stacks, and vectorized arrays, are handed a Runner
+        # lookalike, whose run function only exists once the source has been
+        # executed.
+        compiled_runner = CompiledRunner(None, r)
+        self._pending.append((compiled_runner, function))
+        return ['data = {}.apply(data, {}, state)'.format(
+            q_name, self.bind('runner', compiled_runner))]
+
+    def runner_function(self, runner):
+        """ Generate a function that behaves like `runner.run()` """
+        name = self.bind('run_runner', None)
+        lines = ['def {}(data, state):'.format(name)]
+        lines.extend(self._indent(self._runner_lines(runner), 4))
+        lines.append('    return data')
+        self.blocks.append(lines)
+        return name
+
+    def _runner_lines(self, runner):
+        processor = runner.processor
+        lines = []
+        for fnc in processor.override or ():
+            lines.append('data = {}(data=data, state=state)'.format(
+                self.bind('override', fnc)))
+        if processor.default:
+            lines.append('if data is _undef:')
+            for fnc in processor.default:
+                lines.append('    data = {}(data=data, state=state)'.format(
+                    self.bind('default', fnc)))
+        call = self._call_expression(runner)
+        if not processor.failsafe:
+            lines.append('data = {}'.format(call))
+            return lines
+        lines.append('try:')
+        lines.append('    data = {}'.format(call))
+        lines.append('except ValidationError as error:')
+        lines.append('    try:')
+        for fnc in processor.failsafe:
+            lines.append('        data = {}(data=data, state=state)'.format(
+                self.bind('failsafe', fnc)))
+        lines.append('    except ValidationError:')
+        lines.append('        raise error')
+        return lines
+
+    def _call_expression(self, runner):
+        raw = runner._raw_processor
+        if self.is_compilable(raw):
+            return '{}(data)'.format(self.context_function(raw))
+        if isinstance(raw, CompiledSchema):
+            return '{}(data)'.format(self.bind('compiled', raw.function))
+        return '{}(data, state)'.format(
+            self.bind('run', runner.processor.run))
+
+    def _calls_expression(self, callables, *args):
+        return ' or '.join(
+            '{}({})'.format(self.bind('qualify', c), ', '.join(args))
+            for c in callables)
+
+    def _member_dispatch_lines(self, q, q_name, function):
+        keys = q.qualifiers['keys']
+        # same order as `MemberQualifierStack.call_match()`
+        callables = q.qualifiers['callables'] + q.qualifiers['patterns']
+        # the live set is bound (rather than a copy) so that iterating over
+        # missing keys follows the same order as `MemberQualifierStack`.
+        keys_name = self.bind('keys', keys)
+        lines = [
+            'matches = {}._get_matches(state)'.format(q_name),
+            "by_key = matches['by_key']",
+            'rv = {}',
+            'for key, value in data.items():',
+        ]
+        branch = 'if'
+        if keys:
+            lines.extend([
+                '    if key in {}:'.format(keys_name),
+                '        by_key.add(key)',
+                '        rv[key] = {}(value, state)'.format(function),
+            ])
+            branch = 'elif'
+        if callables:
+            lines.extend([
+                '    {} {}:'.format(branch, self._calls_expression(
+                    callables, 'key', 'value')),
+                "        matches['by_call'].add(key)",
+                '        rv[key] = {}(value, state)'.format(function),
+            ])
+            branch = 'elif'
+        if branch=='if':
+            lines.append('    rv[key] = value')
+        else:
+            lines.extend(['    else:', '        rv[key] = value'])
+        if keys:
+            lines.extend([
+                'unmatched = {}.difference(by_key)'.format(keys_name),
+                'if unmatched:',
+                '    default = {}(_undef, state)'.format(function),
+                '    if not default is _undef:',
+                '        for key in unmatched:',
+                '            rv[key] = default',
+                '            by_key.add(key)',
+            ])
+        lines.append('data = rv')
+        return lines
+
+    def _item_loop_lines(self, function):
+        return [
+            'rv = []',
+            'try:',
+            '    for d in data:',
+            '        rv.append({}(d, state))'.format(function),
+            'except ValidationError as error:',
+            '    error.index = len(rv)',
+            '    raise',
+            'data = rv',
+        ]
+
+    def _item_dispatch_lines(self, q, q_name, function):
+        indices = q.qualifiers['indices']
+        callables = q.qualifiers['callables']
+        loop = ['for i, d in enumerate(data):']
+        branch = 'if'
+        if indices:
+            loop.extend([
+                '    if i in {}:'.format(self.bind('indices', indices)),
+                "        matches['by_index'].add(i)",
+                '        rv.append({}(d, state))'.format(function),
+            ])
+            branch = 'elif'
+        if callables:
+            loop.extend([
+                '    {} {}:'.format(branch, self._calls_expression(
+                    callables, 'i', 'd')),
+                "        matches['by_call'].add(i)",
+                '        rv.append({}(d, state))'.format(function),
+            ])
+            branch = 'elif'
+        if branch=='if':
+            loop.append('    rv.append(d)')
+        else:
+            loop.extend(['    else:', '        rv.append(d)'])
+        lines = [
+            'matches = {}._get_matches(state)'.format(q_name),
+            'rv = []',
+            'i = 0',
+            'try:',
+        ]
+        lines.extend(self._indent(loop, 4))
+        lines.extend([
+            'except ValidationError as error:',
+            '    error.index = i',
+            '    raise',
+            'data = rv',
+        ])
+        return lines
+
+    def _indent(self, lines, width):
+        pad = ' ' * width
+        return [pad + line for line in lines]
+
+
+def compile_schema(context):
+    return SchemaCompiler().compile(context)
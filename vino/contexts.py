@@ -1,6 +1,7 @@
 from . import utils as uls 
-from .processors.runners import RunnerStack
+from .processors.runners import RunnerStack, Runner
 from . import errors 
+from . import deadlines as dls
 
 class Context:
     ''' The `Context` represent the scope of influence of the processors in a
@@ -36,6 +37,7 @@ class Context:
         self.runner_stack_cls = kwargs.pop(
             'runner_stack_cls', Context._default_runner_stack_cls)
         self.qualifier_stack_cls = kwargs.pop('qualifier_stack_cls', None)
+        self._runners = self.runner_stack_cls(self)
         self.expand(*processors)
 
     def _tuplefy(self, processor):
@@ -58,8 +60,8 @@ class Context:
 
     @property
     def runners(self):
-        if not hasattr(self, '_runners'):
-            self._runners = self.runner_stack_cls(self)
+        # set up in `__init__()` (or `spawn()`), never lazily: a built Context
+        # is not written to while it runs, and can be shared between threads.
         return self._runners
 
     @runners.setter
@@ -85,19 +87,44 @@ class Context:
         # logic is added to it in the future.
         return self._tuplefy(tpl)
 
-    def validate(self, data=uls._undef):
+    def validate(self, data=uls._undef, *, deadline=None, cancel=None):
         """ This method is typically called as an entry point for a root
         Context object. When a Context is a subset part of another Context, its
         `run()` method is called instead by a Runner, receiving all necessary
         data and metadata to apply its processes on the relevant part of the 
         data.
+
+        The validation can be given a `deadline` (a `time.monotonic()`
+        timestamp) and a `CancelToken`, see `vino.deadlines`.
         """
-        return self.run(data, self)
+        if deadline is None is cancel:
+            return self.run(data, self)
+        with dls.budget(deadline, cancel):
+            return self.run(data, self)
+
+    def validate_many(self, documents, gc_threshold=None):
+        """ Validate each of the `documents` and return a `BatchResult`.
+        `gc_threshold` temporarily tunes the garbage collector for the
+        duration of the batch (see `utils.gc_tuned`), e.g. 0 disables
+        automatic collection.
+
+            >>> rv = user.validate_many(records, gc_threshold=0)
+            >>> rv.values  # the valid documents, in order
+            >>> rv.errors  # {index: ValidationErrorStack}
+        """
+        return validate_many(self.validate, documents, gc_threshold)
 
     def run(self, data, context):
         """ Let's quack like a Processor, i.e. Context treated as Processor """
         # default behaviour is to simply return a copy of the data
-        return self.runners.run(data)
+        return self.finalize(self.runners.run(data))
+
+    def finalize(self, data):
+        """ Hook to post-process the data returned by the runner stack. The
+        compiler relies on it to reproduce a Context's behaviour without
+        calling its `run()` method.
+        """
+        return data
 
     def make_state(self):
         return {
@@ -111,5 +138,97 @@ class Context:
         if self.qualifier_stack_cls:
             return self.qualifier_stack_cls.init_matches()
 
-class StreamContext: pass
+class BatchResult:
+    """ The outcome of validating a batch of documents: the validated
+    documents in the order they came in, and the errors of the others by
+    index in the batch.
+    """
+
+    def __init__(self, values, errors, count):
+        self.values = values
+        self.errors = errors
+        self.count = count
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def items(self):
+        """ `(index, value)` pairs of the valid documents """
+        errors = self.errors
+        indices = (i for i in range(self.count) if i not in errors)
+        return zip(indices, self.values)
+
+    def __len__(self):
+        return self.count
+
+
+def validate_many(validate, documents, gc_threshold=None):
+    """ Run `validate` over the documents and collect a `BatchResult` """
+    values = []
+    failed = {}
+    append = values.append
+    index = -1
+    with uls.gc_tuned(gc_threshold):
+        for index, data in enumerate(documents):
+            try:
+                append(validate(data))
+            except errors.ValidationError as e:
+                failed[index] = e
+    return BatchResult(values, failed, index + 1)
+
+
+class StreamContext:
+    ''' Validates the items of any iterable (lists, generators, database
+    cursors, etc) lazily. Instead of a list, validation returns a generator
+    that pulls one item at a time from the iterable, runs it through the item
+    processor (typically a schema) and yields the result. Memory use is then
+    bounded by the size of a single item.
+
+        >>> from vino import prim, is_int
+        >>> numbers = StreamContext(prim(is_int))
+        >>> for n in numbers.validate(cursor):
+        ...     store(n)
+
+    A failing item raises its error, with the item's position set in its
+    `index` attribute. Alternatively, an `on_error(index, error)` callback can
+    be given, in which case failing items are handed to it and skipped.
+    Items that come out as missing (`_undef`) are skipped as well.
+    '''
+
+    def __init__(self, item, on_error=None):
+        self.item = Runner(item)
+        self.on_error = on_error
+
+    def validate(self, data=uls._undef):
+        return self.run(data, self)
+
+    def run(self, data, context):
+        """ Quacks like a Processor. The data itself is checked right away,
+        its items are only validated as they are consumed.
+        """
+        if data is None:
+            return None
+        if (data is uls._undef or not uls.is_iterable(data, exclude_set=True)):
+            # TODO more descriptive message
+            raise errors.ValidationError(
+                'Wrong data type. Expected: Iterable. Got "{}"'.format(
+                type(data).__name__))
+        return self._iterate(iter(data))
+
+    def _iterate(self, items):
+        run = self.item.run
+        state = {'matches': None, 'context': self}
+        for index, item in enumerate(items):
+            try:
+                item = run(item, state)
+            except errors.ValidationError as e:
+                e.index = index
+                if self.on_error is None:
+                    raise
+                self.on_error(index, e)
+                continue
+            if item is not uls._undef:
+                yield item
+
 class UnspecifiedContext: pass
@@ -0,0 +1,84 @@
+import time
+import contextlib
+import contextvars
+from . import errors as err
+
+"""
+Deadlines and cancellation of validations. The budget of the current
+validation is kept in a context variable, that `RunnerStack.run` looks up
+once per call and checks every `check_every` runners.
+
+    >>> token = CancelToken()
+    >>> data = user.validate(payload, deadline=time.monotonic() + 0.05,
+    ...                      cancel=token)
+
+Running out of time raises a `ValidationTimeout`, a cancelled token a
+`ValidationCancelled`. Neither is a `ValidationError`: they are not stacked
+with the errors of the data, they interrupt the whole validation. Both
+report how far it went in their `elapsed` and `steps` attributes.
+
+A budget can also cover several calls, or calls that don't take a deadline
+themselves.
+
+    >>> with budget(deadline=time.monotonic() + 1):
+    ...     rv = user.validate_many(records)
+"""
+
+current = contextvars.ContextVar('budget', default=None)
+
+
+class CancelToken:
+    """ Cancels the validations it's given to, from any thread """
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Budget:
+
+    # runners run between two checks
+    check_every = 64
+
+    def __init__(self, deadline=None, cancel=None, check_every=None):
+        self.deadline = deadline
+        self.cancel = cancel
+        if check_every is not None:
+            self.check_every = check_every
+        self.started = time.monotonic()
+        self.steps = 0
+        self.next_check = 0
+
+    def tick(self):
+        self.steps += 1
+        if self.steps>=self.next_check:
+            self.next_check = self.steps + self.check_every
+            self.check()
+
+    def check(self):
+        if self.cancel is not None and self.cancel.cancelled:
+            raise self.interrupted(err.ValidationCancelled,
+                                   'Validation cancelled')
+        if self.deadline is not None and time.monotonic()>=self.deadline:
+            raise self.interrupted(err.ValidationTimeout,
+                                   'Validation timed out')
+
+    def interrupted(self, error_cls, message):
+        elapsed = time.monotonic() - self.started
+        return error_cls(
+            '{} after {:.6f}s and {} steps'.format(message, elapsed, self.steps),
+            elapsed=elapsed, steps=self.steps)
+
+
+@contextlib.contextmanager
+def budget(deadline=None, cancel=None, check_every=None):
+    """ Validations run within the block are given a `deadline`, a
+    `time.monotonic()` timestamp, and can be cancelled with a `CancelToken`.
+    """
+    token = current.set(Budget(deadline, cancel, check_every))
+    try:
+        yield
+    finally:
+        current.reset(token)
@@ -42,5 +42,23 @@ class ValidationErrorStack(ValidationError):
         return "\n".join(rv)
 
 
+class ValidationInterrupted(VinoError):
+    """ The validation was stopped before its end, see `vino.deadlines`.
+    `elapsed` is the time it ran for, `steps` the number of runners it ran.
+    """
+    def __init__(self, msg, elapsed=None, steps=None):
+        self.elapsed = elapsed
+        self.steps = steps
+        super(ValidationInterrupted, self).__init__(msg)
 
+class ValidationTimeout(ValidationInterrupted): pass
 
+class ValidationCancelled(ValidationInterrupted): pass
+
+
+class JSONDecodeError(VinoError, ValueError):
+    """ Raised by `vino.jsonstream` when a document is not valid JSON """
+    def __init__(self, msg, pos):
+        self.pos = pos
+        super(JSONDecodeError, self).__init__(
+            '{} at position {}'.format(msg, pos))
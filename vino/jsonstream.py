@@ -0,0 +1,528 @@
+import re
+import json
+import array
+import codecs
+from json import decoder as jsd
+from . import contexts as ctx
+from . import schema as shm
+from . import compiler as cpl
+from . import qualifiers as qls
+from . import utils as uls
+from . import errors as err
+from .processors import processors as prc
+from .processors import validating as vld
+from .processors import marshalling as msh
+
+"""
+An incremental JSON parser that feeds documents to vino schemas without
+loading them whole in memory first.
+
+The `Tokenizer` receives a document in chunks of bytes (or str) of any size
+and turns them into parse events:
+
+    ('start_map', None), ('key', 'name'), ('value', 'Peter'), ('end_map', None)
+    ('start_array', None), ('value', 1), ('end_array', None)
+
+`load()` builds the document from these events, guided by the schema that will
+validate it. Object properties that the schema would remove (see
+`unmatched_properties`) are never built, nor are containers the schema would
+reject because of their type. Peak memory is then bounded by the retained data
+rather than by the size of the document.
+
+    >>> from vino import obj, prim, is_str, unmatched_properties
+    >>> user = obj(prim(is_str).apply_to('name'), unmatched_properties('remove'))
+    >>> with open('user.json', 'rb') as fp:
+    ...     load(fp, user)
+    {'name': 'Peter'}
+
+`iterload()` validates the items of an array (typically a huge top-level array)
+one at a time, see `contexts.StreamContext`.
+
+Documents that fit in memory are better served by `loads()`, which relies on
+the C decoder of the `json` module.
+"""
+
+CHUNK_SIZE = 1 << 16
+
+_whitespace = re.compile(r'[ \t\n\r]*')
+# a complete string body, i.e. up to the closing quote
+_string_end = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*"', re.S)
+_number = re.compile(r'(-?(?:0|[1-9]\d*))(\.\d+)?([eE][-+]?\d+)?')
+# what may still turn out to be a number once more data comes in
+_number_tail = re.compile(r'[-+.eE0-9]*\Z')
+_literals = (('true', True), ('false', False), ('null', None))
+
+# parser states
+VALUE, VALUE_OR_END, KEY, KEY_OR_END, COLON, NEXT, DONE = range(7)
+
+
+class Tokenizer:
+    """
+    Incremental JSON tokenizer. Chunks are handed to `feed()`, which returns
+    the events that could be parsed so far. Tokens that are cut by the end of
+    a chunk are kept until the next one. `close()` signals the end of the
+    document.
+    """
+
+    def __init__(self):
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        # number of characters consumed, for error reporting
+        self.offset = 0
+        self.stack = []
+        self.state = VALUE
+
+    def feed(self, chunk):
+        if not uls.is_str(chunk):
+            chunk = self.decoder.decode(chunk)
+        self.buffer += chunk
+        return self._parse(final=False)
+
+    def close(self):
+        self.buffer += self.decoder.decode(b'', final=True)
+        rv = self._parse(final=True)
+        if self.state!=DONE:
+            self.error('Unexpected end of document', len(self.buffer))
+        return rv
+
+    def error(self, msg, pos):
+        raise err.JSONDecodeError(msg, self.offset + pos)
+
+    def _parse(self, final):
+        buf = self.buffer
+        length = len(buf)
+        pos = 0
+        events = []
+        while True:
+            pos = _whitespace.match(buf, pos).end()
+            if pos==length:
+                break
+            char = buf[pos]
+            if char=='"':
+                if _string_end.match(buf, pos+1) is None:
+                    if final:
+                        self.error('Unterminated string', pos)
+                    break
+                try:
+                    value, end = jsd.scanstring(buf, pos+1, True)
+                except ValueError as e:
+                    self.error(e.msg, e.pos)
+                self._token('"', value, events, pos)
+            elif char in '{}[],:':
+                end = pos+1
+                self._token(char, None, events, pos)
+            else:
+                match = _number.match(buf, pos)
+                if not final and _number_tail.match(
+                        buf, match.end() if match else pos):
+                    # the number may go on in the next chunk
+                    break
+                if match:
+                    end = match.end()
+                    integer, frac, exp = match.groups()
+                    if frac or exp:
+                        value = float(match.group())
+                    else:
+                        value = int(integer)
+                else:
+                    for literal, value in _literals:
+                        if buf.startswith(literal, pos):
+                            end = pos + len(literal)
+                            break
+                        if (not final and length-pos<len(literal)
+                            and literal.startswith(buf[pos:])):
+                            # e.g. 'tr' at the end of the chunk
+                            end = None
+                            break
+                    else:
+                        self.error('Unexpected character', pos)
+                    if end is None:
+                        break
+                self._token('', value, events, pos)
+            pos = end
+        self.buffer = buf[pos:]
+        self.offset += pos
+        return events
+
+    def _token(self, token, value, events, pos):
+        state = self.state
+        if token=='"' and state in (KEY, KEY_OR_END):
+            events.append(('key', value))
+            self.state = COLON
+        elif token==':' and state==COLON:
+            self.state = VALUE
+        elif token==',' and state==NEXT:
+            self.state = KEY if self.stack[-1]=='map' else VALUE
+        elif token=='}' and (state==KEY_OR_END
+                             or state==NEXT and self.stack[-1]=='map'):
+            self.stack.pop()
+            events.append(('end_map', None))
+            self.state = NEXT if self.stack else DONE
+        elif token==']' and (state==VALUE_OR_END
+                             or state==NEXT and self.stack[-1]=='array'):
+            self.stack.pop()
+            events.append(('end_array', None))
+            self.state = NEXT if self.stack else DONE
+        elif state in (VALUE, VALUE_OR_END) and token in ('', '"', '{', '['):
+            if token=='{':
+                self.stack.append('map')
+                events.append(('start_map', None))
+                self.state = KEY_OR_END
+            elif token=='[':
+                self.stack.append('array')
+                events.append(('start_array', None))
+                self.state = VALUE_OR_END
+            else:
+                events.append(('value', value))
+                self.state = NEXT if self.stack else DONE
+        else:
+            self.error('Unexpected token', pos)
+
+
+def events(fp, chunk_size=CHUNK_SIZE):
+    """ Parse events of the document read from `fp`, a binary or text file """
+    tokenizer = Tokenizer()
+    while True:
+        chunk = fp.read(chunk_size)
+        if not chunk:
+            break
+        yield from tokenizer.feed(chunk)
+    yield from tokenizer.close()
+
+
+# the built value of a property that the schema removes
+PRUNED = uls._undef
+
+
+class BuildPlan:
+    """
+    What a schema needs to be built out of a document. The plan is inferred
+    conservatively from the schema's declaration: whenever a processor could
+    observe a part of the data, that part is built.
+    """
+
+    def __init__(self, schema):
+        self.schema = schema
+        # container type the schema accepts, when it rejects the others
+        # without looking at them
+        self.container = None
+        # properties that no qualifier matches are removed (or rejected)
+        self.prune = False
+        # ... and removed rather than rejected
+        self.removes = False
+        # (qualifier stack, plan of the runner, matched before removal)
+        self.members = []
+        self.items = None
+        self.values = None
+        runners = schema.runners.runners
+        if not (isinstance(schema, (shm.SchemaBase, ctx.Context))
+                and type(schema).run is ctx.Context.run
+                and len(runners)>1 and self._is_inert(runners[0])
+                and self._is_inert(runners[1])):
+            return
+        check = runners[1]['runner']._raw_processor
+        self.container = {
+            vld.is_object_type: 'map',
+            vld.is_array_type: 'array',
+            vld.is_primitive_type: 'primitive',
+        }.get(check)
+        if isinstance(schema, shm.MapTypeSchema):
+            entries = runners[2]['runner']._raw_processor
+            self.values = plan_for(entries.values._raw_processor)
+        elif isinstance(schema, shm.ObjectTypeSchema):
+            self._plan_members(runners)
+        elif isinstance(schema, shm.ArrayTypeSchema):
+            self._plan_items(runners)
+
+    def _is_inert(self, runner):
+        # a runner that does not look at the values of its data
+        processor = runner['runner'].processor
+        raw = runner['runner']._raw_processor
+        return (not runner['qualifiers']
+                and not (processor.override or processor.default
+                         or processor.failsafe)
+                and (isinstance(raw, (prc.MandatoryClause,
+                                      msh.UnmatchedProperties))
+                     or raw in (vld.is_object_type, vld.is_array_type,
+                                vld.is_primitive_type)))
+
+    def _observed(self, runners, until):
+        # can the raw data be seen by other processors than the qualified
+        # ones before the runner at position `until`?
+        return not all(self._is_inert(r) for r in runners[:until]
+                       if not r['qualifiers'])
+
+    def _plan_members(self, runners):
+        removal = None
+        for i, runner in enumerate(runners):
+            raw = runner['runner']._raw_processor
+            if (isinstance(raw, msh.UnmatchedProperties)
+                and raw.action in ('remove', 'raise')):
+                removal = i
+                break
+        qualified = [i for i, r in enumerate(runners) if r['qualifiers']]
+        if self._observed(runners, max(qualified + [removal or 0]) + 1):
+            return
+        for i in qualified:
+            q = runners[i]['qualifiers']
+            if q.qualifiers['callables'] and not all(
+                isinstance(c, qls.KeyQualifier)
+                for c in q.qualifiers['callables']):
+                # which members are matched depends on their values
+                self.members = []
+                return
+            before = removal is not None and i<removal
+            self.members.append(
+                (q, plan_for(runners[i]['runner']._raw_processor), before))
+        self.prune = removal is not None
+        self.removes = self.prune and runners[removal][
+            'runner']._raw_processor.action=='remove'
+
+    def _plan_items(self, runners):
+        qualified = [i for i, r in enumerate(runners) if r['qualifiers']]
+        if len(qualified)!=1 or self._observed(runners, qualified[0]):
+            return
+        runner = runners[qualified[0]]
+        if runner['qualifiers'].qualifiers['all']:
+            self.items = plan_for(runner['runner']._raw_processor)
+
+    def member(self, key):
+        """ The plan of a property, or `PRUNED` if it need not be built """
+        if self.values is not None:
+            return self.values
+        plans = []
+        removed = self.prune
+        for q, plan, before in self.members:
+            if q.keys_match(key) or q.key_only_match(key):
+                plans.append(plan)
+                removed = removed and not before
+        if removed:
+            return PRUNED
+        return plans[0] if len(plans)==1 else None
+
+    def rejects(self, kind):
+        # the types of containers that will fail the type check
+        return (self.container is not None and self.container!=kind)
+
+
+def plan_for(processor):
+    try:
+        return BuildPlan(processor)
+    except AttributeError:
+        # not a Context
+        return None
+
+
+def _skip(kind, events):
+    if kind not in ('start_map', 'start_array'):
+        return
+    depth = 1
+    for kind, _ in events:
+        if kind in ('start_map', 'start_array'):
+            depth += 1
+        elif kind in ('end_map', 'end_array'):
+            depth -= 1
+            if not depth:
+                return
+
+
+def build(kind, value, events, plan=None):
+    """ Build the value that starts with the event `(kind, value)` """
+    if kind=='value':
+        return value
+    if plan is not None and plan.rejects(kind[6:]):
+        # an empty container fails the type check the same way
+        _skip(kind, events)
+        return {} if kind=='start_map' else []
+    if kind=='start_map':
+        rv = {}
+        for kind, key in events:
+            if kind=='end_map':
+                return rv
+            member = None if plan is None else plan.member(key)
+            kind, value = next(events)
+            if member is PRUNED:
+                _skip(kind, events)
+                rv[key] = PRUNED
+            else:
+                rv[key] = build(kind, value, events, member)
+    rv = []
+    items = None if plan is None else plan.items
+    for kind, value in events:
+        if kind=='end_array':
+            return rv
+        rv.append(build(kind, value, events, items))
+
+
+def load(fp, schema, chunk_size=CHUNK_SIZE):
+    """ Parse the JSON document in `fp` and validate it with `schema` """
+    stream = events(fp, chunk_size)
+    kind, value = next(stream)
+    data = build(kind, value, stream, plan_for(schema))
+    for _ in stream:
+        # a valid document has nothing left, this raises otherwise
+        pass
+    return schema.validate(data)
+
+
+def iterload(fp, item, path=(), on_error=None, chunk_size=CHUNK_SIZE):
+    """
+    Validate the items of the array found at `path` in the document one at
+    a time, and return them through a generator. `path` is a sequence of
+    property names and array indices leading to the array, the default is
+    the top-level value. See `contexts.StreamContext` for `on_error`.
+    """
+    items = _iteritems(events(fp, chunk_size), path, plan_for(item))
+    return ctx.StreamContext(item, on_error=on_error).validate(items)
+
+
+def _iteritems(stream, path, plan):
+    kind, value = next(stream)
+    for step in path:
+        kind, value = _descend(kind, step, stream)
+    if kind!='start_array':
+        # TODO more descriptive message
+        raise err.ValidationError('Wrong data type. Expected: Array.')
+    for kind, value in stream:
+        if kind=='end_array':
+            break
+        yield build(kind, value, stream, plan)
+    for _ in stream:
+        pass
+
+
+def _descend(kind, step, stream):
+    # move to the value found at `step` in the container starting with `kind`
+    if kind=='start_map' and uls.is_str(step):
+        for kind, key in stream:
+            if kind=='end_map':
+                break
+            kind, value = next(stream)
+            if key==step:
+                return kind, value
+            _skip(kind, stream)
+    elif kind=='start_array' and uls.is_intlike(step):
+        for i, (kind, value) in enumerate(stream):
+            if kind=='end_array':
+                break
+            if i==step:
+                return kind, value
+            _skip(kind, stream)
+    # TODO more descriptive message
+    raise err.ValidationError('Nothing found at {!r}'.format(step))
+
+
+def key_filter(schema):
+    """
+    A predicate telling whether a property may be retained anywhere in the
+    documents validated by `schema`. This is only known when every object of
+    the documents is handled by an `ObjectTypeSchema` that removes unmatched
+    properties based on their names. Otherwise `None` is returned.
+    """
+    if isinstance(schema, cpl.CompiledSchema):
+        schema = schema.context
+    stacks = []
+    if not _closed(plan_for(schema), stacks):
+        return None
+    keys = set()
+    callables = []
+    for q in stacks:
+        keys.update(q.qualifiers['keys'])
+        if q.qualifiers['callables'] or q.qualifiers['patterns']:
+            callables.append(q.key_only_match)
+    if not callables:
+        return keys.__contains__
+    def retained(key):
+        return key in keys or any(match(key) for match in callables)
+    return retained
+
+
+def _closed(plan, stacks):
+    # can any object reach the data without going through a schema that
+    # removes its unmatched properties?
+    if plan is None or plan.container is None:
+        return False
+    if plan.container=='primitive':
+        # objects are rejected without being looked at
+        return True
+    if plan.container=='array':
+        return _closed(plan.items, stacks)
+    if plan.values is not None or not plan.removes:
+        return False
+    for q, child, before in plan.members:
+        stacks.append(q)
+        if not _closed(child, stacks):
+            return False
+    return True
+
+
+def loads(text, schema, retained=uls._undef, **kwargs):
+    """
+    Decode the JSON document `text` and validate it with `schema`. When the
+    schema removes unmatched properties throughout the document (see
+    `key_filter()`), unknown properties are dropped by the decoder before
+    they are ever put in a dict, and the objects it builds aren't copied
+    defensively by `is_object_type`, since nothing else holds them.
+
+        >>> user.loads('{"name": "Peter", "unknown": {"a": 1}}')
+        {'name': 'Peter'}
+
+    Otherwise this is the same as `schema.validate(json.loads(text))`. Other
+    keyword arguments are passed to `json.loads`.
+    """
+    if retained is uls._undef:
+        retained = key_filter(schema)
+    if retained is None:
+        # a hook would cost more than the copies it saves
+        return schema.validate(json.loads(text, **kwargs))
+    owned = {}
+    def object_pairs_hook(pairs):
+        rv = {k: v for k, v in pairs if retained(k)}
+        if pairs and not rv:
+            # the properties would be removed after `not_allowempty` ran on
+            # the object, it must not find it empty.
+            rv[pairs[0][0]] = uls._undef
+        owned[id(rv)] = rv
+        return rv
+    data = json.loads(text, object_pairs_hook=object_pairs_hook, **kwargs)
+    token = vld.owned_objects.set(owned)
+    try:
+        return schema.validate(data)
+    finally:
+        vld.owned_objects.reset(token)
+
+
+# encoders by separators, `json.dumps` builds one per call otherwise
+_encoders = {}
+
+def default(value):
+    """ Serialize the typed arrays of `arr(..., typecode=...)` and
+    `arr(..., dtype=...)` as JSON arrays.
+    """
+    if isinstance(value, array.array) or (
+            type(value).__module__=='numpy' and hasattr(value, 'tolist')):
+        return value.tolist()
+    raise TypeError('Object of type {} is not JSON serializable'.format(
+        type(value).__name__))
+
+def encoder(separators=None):
+    if separators is not None:
+        separators = tuple(separators)
+    try:
+        return _encoders[separators]
+    except KeyError:
+        # threads racing here all end up with the same encoder
+        return _encoders.setdefault(
+            separators, json.JSONEncoder(separators=separators, default=default))
+
+
+def validate_dumps(schema, data=uls._undef, separators=None):
+    """ Validate `data` with `schema` and return it serialized as JSON """
+    return encoder(separators).encode(schema.validate(data))
+
+
+def validate_dump(schema, data, fp, separators=None):
+    """ Validate `data` with `schema` and write it as JSON to the text file
+    `fp`, chunk by chunk rather than as a whole string.
+    """
+    fp.writelines(encoder(separators).iterencode(schema.validate(data)))
@@ -0,0 +1,188 @@
+import gc
+import sys
+import time
+import pickle
+import marshal
+import importlib
+import itertools
+import collections
+import multiprocessing
+from concurrent import futures
+from . import contexts as ctx
+from . import errors as err
+
+"""
+Validation of batches of documents on a pool of processes.
+
+    >>> with ParallelValidator(user, workers=16) as validator:
+    ...     rv = validator.validate_many(records)
+    >>> rv.values  # the valid documents, in order
+    >>> rv.errors  # {index: ValidationErrorStack}
+
+Workers are forked with the schema already loaded, no pickling of the schema
+is involved (lambdas and closures are fine). Objects of the parent are frozen
+(see `gc.freeze`) while the workers are forked, so that their garbage
+collector does not write to the memory pages they share with the parent.
+Where fork isn't available the schema can be given as an import path,
+`'module:attribute'`, imported by each worker instead.
+
+Documents are sent in batches whose size is adapted to the measured cost of
+validating a document, so that a batch takes about `batch_time` seconds.
+Batches and results travel `marshal`ed when their content allows it, errors
+as their messages only.
+"""
+
+
+def load_schema(path):
+    module, sep, attr = path.partition(':')
+    if not sep:
+        module, _, attr = path.rpartition('.')
+    if not (module and attr):
+        raise err.VinoError(
+            'Schema should be given as module:attribute, got {}'.format(path))
+    if '' not in sys.path:
+        # like `python -m`, modules of the working directory are importable
+        sys.path.insert(0, '')
+    return getattr(importlib.import_module(module), attr)
+
+
+def messages(error):
+    """ The messages of a validation error, one per error of a stack """
+    if isinstance(error, err.ValidationErrorStack):
+        return [str(e) for e in error]
+    return [str(error)]
+
+
+def rebuild_error(messages):
+    rv = err.ValidationErrorStack('Validation Errors')
+    for message in messages:
+        rv.append(err.ValidationError(message))
+    return rv
+
+
+def pack(obj):
+    # marshal is faster and more compact than pickle for builtin types
+    try:
+        return b'm' + marshal.dumps(obj)
+    except ValueError:
+        return b'p' + pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+
+
+def unpack(payload):
+    if payload[:1]==b'm':
+        return marshal.loads(payload[1:])
+    return pickle.loads(payload[1:])
+
+
+# the schema of a worker process, see `init_worker()`
+_worker = {}
+
+def init_worker(schema):
+    if isinstance(schema, str):
+        schema = load_schema(schema)
+    _worker['schema'] = schema
+
+
+def validate_batch(payload):
+    """ Validate a packed batch of documents. Returns the packed valid
+    documents and `(position, messages)` of the others, with the time it
+    took.
+    """
+    started = time.perf_counter()
+    # the values of the batch bound for a `batched()` processor are looked
+    # up together
+    rv = _worker['schema'].validate_many(unpack(payload))
+    failed = [(i, messages(e)) for i, e in sorted(rv.errors.items())]
+    return pack((rv.values, failed)), time.perf_counter() - started
+
+
+class ParallelValidator:
+
+    def __init__(self, schema, workers=None, batch_time=0.05, batch_size=32,
+                 max_batch_size=10000):
+        self.schema = schema
+        self.workers = workers or multiprocessing.cpu_count()
+        # targeted duration of a batch, in seconds
+        self.batch_time = batch_time
+        self.batch_size = batch_size
+        self.max_batch_size = max_batch_size
+        self.executor = None
+
+    def start(self):
+        if self.executor is not None:
+            return self
+        if isinstance(self.schema, str):
+            context = multiprocessing.get_context()
+        elif 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+        else:
+            raise err.VinoError(
+                'Workers cannot be forked on this platform, the schema should '
+                'be given as an import path (module:attribute).')
+        self.executor = futures.ProcessPoolExecutor(
+            self.workers, mp_context=context, initializer=init_worker,
+            initargs=(self.schema,))
+        gc.freeze()
+        try:
+            # workers are started on the first submission
+            self.executor.submit(int).result()
+        finally:
+            gc.unfreeze()
+        return self
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def adapt(self, size, elapsed):
+        """ Aim the next batches at `batch_time` from the measured cost """
+        if not size:
+            return
+        per_document = max(elapsed / size, 1e-7)
+        target = int(self.batch_time / per_document)
+        # smoothed, since workers are measured one batch at a time
+        target = (self.batch_size + target) // 2
+        self.batch_size = min(max(target, 1), self.max_batch_size)
+
+    def batches(self, documents):
+        documents = iter(documents)
+        while True:
+            batch = list(itertools.islice(documents, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def validate_many(self, documents):
+        """ Validate the documents on the workers, see `Context.validate_many`
+        """
+        self.start()
+        values = []
+        failed = {}
+        pending = collections.deque()
+        offset = 0
+
+        def collect():
+            start, size, future = pending.popleft()
+            payload, elapsed = future.result()
+            self.adapt(size, elapsed)
+            valid, invalid = unpack(payload)
+            values.extend(valid)
+            for i, msgs in invalid:
+                failed[start + i] = rebuild_error(msgs)
+
+        for batch in self.batches(documents):
+            pending.append((offset, len(batch), self.executor.submit(
+                validate_batch, pack(batch))))
+            offset += len(batch)
+            while len(pending)>=self.workers * 2:
+                collect()
+        while pending:
+            collect()
+        return ctx.BatchResult(values, failed, offset)
@@ -1,3 +1,4 @@
+import array
 from .. import utils as uls
 from ..processors import processors as prc
 from .. import errors as err
@@ -67,26 +68,160 @@ class UnmatchedProperties(prc.Processor):
 unmatched_properties = UnmatchedProperties
 
 class MaxLength(prc.Processor):
-    # TODO: Test
     """
     This processor limits array-like or string-like data to the specified
-    maximum.  
+    maximum. Data that is short enough is returned as is, and NumPy arrays
+    and memoryviews are cut as views. With `truncate=False`, longer data
+    fails the validation instead of being cut, and is never copied. Data
+    without a length (e.g. numbers) fails the validation.
+
+        >>> prim(is_str, maxlength(64, truncate=False)).apply_to('name')
     """
-    def __init__(self, maxlength=-1):
+    def __init__(self, maxlength=-1, truncate=True):
         if not uls.is_intlike(maxlength):
             raise err.VinoError('MaxLength expects positive integer')
         self.maxlength = maxlength
+        self.truncate = truncate
 
     def run(self, data, state):
+        if data is None or data is uls._undef or self.maxlength<0:
+            # leave special cases to other specialized processors
+            return data
         try:
-            if self.maxlength<0:
+            if len(data)<=self.maxlength:
                 return data
-            #if len(data) > self.maxlength:
-            return data[:self.maxlength]
+            if self.truncate:
+                return data[:self.maxlength]
         except TypeError:
             #TODO better message
-            err.ValidationError('wrong data type')
+            raise err.ValidationError('wrong data type')
+        raise err.ValidationError(
+            'data must not be longer than {}'.format(self.maxlength))
 
 maxlength = MaxLength
 
-__all__ = ['maxlength', 'unmatched_properties']
+class TypedArray(prc.Processor):
+    """
+    Packs arrays of numbers in an `array.array` of `typecode`, or in a NumPy
+    array of `dtype`, rather than in a list of Python numbers. Items that
+    aren't numbers, floats in integer arrays, integers out of range and
+    integers that can't be represented exactly as floats of the given size
+    fail the validation. Floats are rounded, unless they overflow.
+
+        >>> series = typed_array('l')
+        >>> series.run([1, 2, 3], None)
+        array('l', [1, 2, 3])
+
+    Arrays are given one with `arr(..., typecode='l')` or
+    `arr(..., dtype='float32')`.
+    """
+    # exactly representable integers and largest value, by size of float
+    float_limits = {
+        2: (2**11, 65504.0),
+        4: (2**24, 3.4028234663852886e+38),
+        8: (2**53, 1.7976931348623157e+308),
+    }
+
+    def __init__(self, typecode=None, dtype=None):
+        if (typecode is None) is (dtype is None):
+            raise err.VinoError('TypedArray expects a typecode or a dtype')
+        self.typecode = typecode
+        self.dtype = None
+        if typecode is not None:
+            if typecode not in array.typecodes or typecode in 'uw':
+                raise err.VinoError(
+                    'Unsupported typecode: {}'.format(typecode))
+            self.name = "array('{}')".format(typecode)
+            itemsize = array.array(typecode).itemsize
+            kind = 'f' if typecode in 'fd' else (
+                'i' if typecode.islower() else 'u')
+        else:
+            try:
+                import numpy
+            except ImportError:
+                raise err.VinoError('A dtype requires NumPy')
+            self.dtype = numpy.dtype(dtype)
+            self.name = str(self.dtype)
+            itemsize, kind = self.dtype.itemsize, self.dtype.kind
+            if kind not in 'iuf' or (
+                    kind=='f' and itemsize not in self.float_limits):
+                raise err.VinoError('Unsupported dtype: {}'.format(dtype))
+        self.floats = kind=='f'
+        if self.floats:
+            self.exact, self.largest = self.float_limits[itemsize]
+        elif kind=='i':
+            self.minimum = -2**(itemsize * 8 - 1)
+            self.maximum = 2**(itemsize * 8 - 1) - 1
+        else:
+            self.minimum, self.maximum = 0, 2**(itemsize * 8) - 1
+
+    def run(self, data, state=None):
+        if data is None or data is uls._undef:
+            return data
+        if self.packed(data):
+            return data
+        if uls.is_list(data):
+            values = data
+        elif uls.is_buffer(data):
+            with memoryview(data) as view:
+                values = view.tolist()
+        else:
+            values = list(data)
+        types = set(map(type, values))
+        if not types<={int, float, bool}:
+            self.fail(values, lambda v: type(v) not in (int, float, bool),
+                      'not a number')
+        if not self.floats:
+            if float in types:
+                self.fail(values, lambda v: type(v) is float,
+                          'not an integer')
+            if values and (min(values)<self.minimum
+                           or max(values)>self.maximum):
+                self.fail(values,
+                          lambda v: not self.minimum<=v<=self.maximum,
+                          'out of range')
+            return self.pack(values)
+        # floats beyond the largest value become infinite and integers
+        # beyond `exact` may be rounded, these are looked at once packed.
+        # (NaN compares as suspect)
+        suspect = values and not max(map(abs, values))<=self.exact
+        rv = self.pack(values)
+        if suspect:
+            for i, (value, packed) in enumerate(zip(values, rv.tolist())):
+                if type(value) is not float:
+                    if packed!=value:
+                        self.fail(values, i, 'not exactly representable')
+                elif packed - packed!=0 and value - value==0:
+                    self.fail(values, i, 'out of range')
+        return rv
+
+    def packed(self, data):
+        """ Is `data` already packed the way it should? """
+        if self.dtype is None:
+            return (isinstance(data, array.array)
+                    and data.typecode==self.typecode)
+        import numpy
+        return (isinstance(data, numpy.ndarray) and data.ndim==1
+                and data.dtype==self.dtype)
+
+    def pack(self, values):
+        if self.dtype is None:
+            return array.array(self.typecode, values)
+        import numpy
+        with numpy.errstate(over='ignore'):
+            # overflows are reported by `run()`
+            return numpy.array(values, dtype=self.dtype)
+
+    def fail(self, values, which, reason):
+        """ Raise the error of the first of `values` that matches `which`,
+        or of the item at index `which`. """
+        if callable(which):
+            which = next(i for i, v in enumerate(values) if which(v))
+        error = err.ValidationError('item {} does not fit in {}: {}'.format(
+            which, self.name, reason))
+        error.index = which
+        raise error
+
+typed_array = TypedArray
+
+__all__ = ['maxlength', 'unmatched_properties', 'typed_array']
@@ -1,11 +1,14 @@
 from collections import namedtuple
 from .. utils import _undef
 from .. import errors as err
+from .. import deadlines as dls
 
 class Runner:
 
     ProcProxy = namedtuple(
         'ProcProxy', 'run default override failsafe raw_processor')
+    # attribute -> function describing the runner, see `describes()`
+    traits = {}
 
     def __init__(self, processor):
         """ 
@@ -39,6 +42,8 @@ class Runner:
         self.name = getattr(processor, 'name', None)
         self._raw_processor = processor
         self.processor = self.get_processor_proxy(processor)
+        for name, describe in self.traits.items():
+            setattr(self, name, describe(self))
 
     @classmethod
     def get_processor_proxy(cls, processor):
@@ -107,26 +112,83 @@ class Runner:
         return data
 
 
+def describes(name):
+    """ Register a function that describes a Runner once it's built. What
+    it returns is kept as the `name` attribute of the runner, so that the
+    engines don't look into its processor again while validating. Runners
+    are built after the processors they nest, whose runners are already
+    described.
+    """
+    def decorator(fnc):
+        Runner.traits[name] = fnc
+        return fnc
+    return decorator
+
+
 class RunnerStack:
     """ A stack of Runners.
     
     TODO: some processors should be excluded from some contexts.
     """
+    # see `MemberQualifierIndex`
+    shape_cache_size = None
+
     def __init__(self, context, *processors):
         self.context = context
+        self._runners = []
         # the stack consists in a list of
         # {'runner':Runner, 'qualifiers': qualifiers) objects
         self.add(*processors)
 
     @property
     def runners(self):
-        if not hasattr(self, '_runners'):
-            self._runners = []
         return self._runners
 
     @runners.setter
     def runners(self, _runners):
         self._runners = _runners
+        self.build_plan()
+
+    @property
+    def plan(self):
+        """
+        The runners, as they are actually executed. Each step of the plan is
+        an `(index, runners, runs)` tuple. Most steps consist of a single
+        runner entry and no index. Consecutive runners whose qualifier stacks can be
+        indexed together (see `MemberQualifierIndex`) are grouped in a single
+        step, so that the data is traversed once for the whole group.
+        """
+        return self._plan
+
+    def build_plan(self):
+        plan = []
+        group = []
+        def close_group():
+            # a single runner is only indexed to benefit from the cache, or
+            # from the combined patterns and their cache
+            if len(group)>1 or (group and (
+                    self.shape_cache_size is not None
+                    or group[0]['qualifiers'].qualifiers.get('patterns'))):
+                index_cls = group[0]['qualifiers'].index_cls
+                index = index_cls([r['qualifiers'] for r in group],
+                                  shape_cache_size=self.shape_cache_size)
+                runs = tuple(r['runner'].run for r in group)
+                plan.append((index, tuple(group), runs))
+            else:
+                plan.extend((None, (r,), None) for r in group)
+            del group[:]
+
+        for runner in self.runners:
+            index_cls = getattr(runner['qualifiers'], 'index_cls', None)
+            if index_cls is None:
+                close_group()
+                plan.append((None, (runner,), None))
+                continue
+            if group and group[0]['qualifiers'].index_cls is not index_cls:
+                close_group()
+            group.append(runner)
+        close_group()
+        self._plan = plan
 
     def add(self, *processors):
         # processors should be a list of tuples with each item having the 
@@ -152,6 +214,7 @@ class RunnerStack:
                 self.runners.append({'runner': runner, 'qualifiers': None})
                 if len(qualifiers)>1 or qualifiers[0] is not None:
                     self.add_qualifiers(*qualifiers)
+        self.build_plan()
 
     def add_qualifiers(self, *qualifiers):
         if not self.runners:
@@ -177,27 +240,50 @@ class RunnerStack:
         # merge with previous qualifiers
         runner['qualifiers'].add(*qualifiers)
 
-    def run(self, data, **kw):
-        e_stack = err.ValidationErrorStack('Validation Errors')
-        #if self.context:
-        state = self.context.make_state() if self.context else None
+    def run(self, data, state=None, **kw):
+        # the error stack is only created when a first error comes up
+        e_stack = None
+        if state is None and self.context:
+            state = self.context.make_state()
         #state = {'matches':self.context.init_matches(), 'context': self.context}
-        for runner in self.runners:
-            r,q = runner['runner'],runner['qualifiers']
-            try:
-                if q: 
-                    data = q.apply(data, r, state)
-                else:
-                    data = r.run(data, state)
-                # if data set or left to undef interrupt processing for it
-                if data is _undef:
-                    break
-            except err.ValidationError as e:
-                self._copy_data_in_err(e, data)
-                e_stack.append(e)
-                if e.interrupt_validation:
-                    break
-        if e_stack.empty:
+        budget = dls.current.get()
+        for index, runners, runs in self.plan:
+            if budget is not None:
+                budget.tick()
+            if index is not None:
+                saved = index.save_matches(state)
+                done = {}
+                try:
+                    data = index.apply(data, runs, state, done)
+                    continue
+                except err.ValidationError:
+                    # Retrace the group one runner at a time, so that errors
+                    # are reported exactly as if it had never been grouped.
+                    # What the single pass ran is not run again.
+                    index.restore_matches(state, saved)
+            for pos, runner in enumerate(runners):
+                r,q = runner['runner'],runner['qualifiers']
+                try:
+                    if index is not None:
+                        data = index.replay(pos, data, runs[pos], state, done)
+                    elif q: 
+                        data = q.apply(data, r, state)
+                    else:
+                        data = r.run(data, state)
+                    # if data set or left to undef interrupt processing for it
+                    if data is _undef:
+                        break
+                except err.ValidationError as e:
+                    self._copy_data_in_err(e, data)
+                    if e_stack is None:
+                        e_stack = err.ValidationErrorStack('Validation Errors')
+                    e_stack.append(e)
+                    if e.interrupt_validation:
+                        break
+            else:
+                continue
+            break
+        if e_stack is None:
             return data
         self._copy_data_in_err(e_stack, data)
         raise e_stack
@@ -213,6 +299,7 @@ class RunnerStack:
 
         constructor = self.__class__
         rv = constructor(context)
+        rv.shape_cache_size = self.shape_cache_size
         rv.runners = self.runners[:]
         return rv
 
@@ -1,7 +1,12 @@
+import contextvars
 from .. import utils as uls
 from ..processors import processors as prc
 from .. import errors as err
 
+# Objects that vino decoded itself (see `jsonstream.loads`), by id. Nothing
+# else holds them, so `is_object_type` hands them over without a copy, once.
+owned_objects = contextvars.ContextVar('owned_objects', default=None)
+
 class PrimitiveTypeProcessor(prc.Processor):
     def run(self, data, state):
         return is_primitive_type(data, state)
@@ -15,9 +20,8 @@ class ObjectTypeProcessor(prc.Processor):
         return is_object_type(data, state)
 
 def is_primitive_type(data, state):
-    # TODO: handle bytes somehow
     if (data is uls._undef or uls.is_str(data) or uls.is_numberlike(data)
-        or uls.is_boolean(data) or data is None):
+        or uls.is_boolean(data) or data is None or uls.is_bytes(data)):
         return data
     # TODO more descriptive message
     raise err.ValidationError(
@@ -31,6 +35,16 @@ def is_array_type(data, state):
     # then attempts to convert it to a list
     if data is None:
         return None
+    if uls.is_buffer(data) and not uls.is_bytes(data):
+        # array.array, NumPy arrays and memoryviews are unpacked to Python
+        # numbers at once, so that whatever path their items take, they
+        # come out the same
+        with memoryview(data) as view:
+            try:
+                return view.tolist()
+            except NotImplementedError:
+                # formats memoryview can't unpack
+                pass
     if uls.is_iterable(data, exclude_set=True, 
                             exclude_generator=True):
         return list(data)
@@ -42,6 +56,9 @@ def is_array_type(data, state):
 def is_object_type(data, state):
     if data is None:
         return None
+    owned = owned_objects.get()
+    if owned is not None and owned.pop(id(data), None) is data:
+        return data
     try:
         if uls.is_dict(data):
             return dict(data)
@@ -114,7 +131,7 @@ class NotAllowEmpty(prc.BooleanProcessor, prc.MandatoryClause):
     __inverse__ = AllowEmpty
 
     def run(self, data=uls._undef, state=None):
-        if self.flag and data in ((), {}, '', set(), []):
+        if self.flag and uls.is_empty(data):
                 raise err.ValidationError('data must not be empty')
         return data
 
@@ -165,7 +182,59 @@ class is_str(prc.BooleanProcessor):
                     'Wrong data type. Not expected: "str"')
         return data
 
+class Between(prc.Processor):
+    """
+    Checks that numbers are within `minimum` and `maximum`, inclusive. Either
+    bound can be left out.
+
+        >>> prim(is_int, between(0, 100)).apply_to('score')
+    """
+
+    def __init__(self, minimum=None, maximum=None, **kwargs):
+        super(Between, self).__init__(**kwargs)
+        self.minimum = minimum
+        self.maximum = maximum
+
+    def run(self, data=uls._undef, state=None):
+        if data is None or data is uls._undef:
+            return data
+        if not uls.is_numberlike(data):
+            raise err.ValidationError('Wrong data type. Expected: number')
+        if self.minimum is not None and data<self.minimum:
+            raise err.ValidationError(
+                'data must be at least {}'.format(self.minimum))
+        if self.maximum is not None and data>self.maximum:
+            raise err.ValidationError(
+                'data must be at most {}'.format(self.maximum))
+        return data
+
+class OneOf(prc.Processor):
+    """
+    Checks that data is one of the given values.
+
+        >>> prim(is_str, one_of('draft', 'published')).apply_to('status')
+    """
+
+    def __init__(self, *values, **kwargs):
+        super(OneOf, self).__init__(**kwargs)
+        self.values = frozenset(values)
+
+    def run(self, data=uls._undef, state=None):
+        if data is None or data is uls._undef:
+            return data
+        try:
+            if data in self.values:
+                return data
+        except TypeError:
+            pass
+        raise err.ValidationError('data must be one of {}'.format(
+            ', '.join(sorted(repr(v) for v in self.values))))
+
+between = Between
+one_of = OneOf
+
 
 __all__ = [
     'required', 'optional', 'allownull', 'allowempty', 'is_int', 'is_str',
+    'between', 'one_of',
 ]
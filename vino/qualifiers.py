@@ -1,5 +1,17 @@
+import re
+import heapq
+import bisect
+import fnmatch
+import functools
+import weakref
+import itertools
+import contextvars
+from collections import namedtuple
+from concurrent import futures
 from . import utils as uls
 from . import errors 
+from . import vectorized as vec
+from . import columnar as col
 
 """
 Qualifiers specify to which items or properties a declaration should apply.  
@@ -22,13 +34,87 @@ In the above declaration, the qualifiers are "first_name", "last_name",
 class Qualifier:
     def qualify(self, item, index=None): pass
 
+class KeyQualifier(Qualifier):
+    """
+    Wraps a predicate that only looks at the key (or the index) to qualify,
+    never at the value. This allows its result to be cached, see
+    `ObjectTypeSchema.cache_shapes()`.
+
+        >>> user = obj(
+        ...     prim(is_str).apply_to(keyonly(lambda k: k.endswith('name')))
+        ... )
+    """
+
+    def __init__(self, fnc):
+        self.fnc = fnc
+
+    def qualify(self, item, index=None):
+        return self.fnc(item)
+
+    def __call__(self, key, data=None):
+        return self.fnc(key)
+
+keyonly = KeyQualifier
+
+class PatternQualifier(KeyQualifier):
+    """
+    Qualifies the keys in which the regular expression can be found. Unlike
+    other callables, patterns are declarative. A `MemberQualifierIndex`
+    combines the patterns of all its runners into a single regular expression
+    and remembers the result for each key it has seen.
+
+        >>> telemetry = obj(
+        ...     prim(is_int).apply_to(prefix('metric_'), suffix('_count')),
+        ...     prim(is_str).apply_to(glob('tag_*'), regex('^label[0-9]+$')),
+        ... )
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.regex = re.compile(pattern)
+        super(PatternQualifier, self).__init__(self.search)
+
+    def search(self, key):
+        return uls.is_str(key) and self.regex.search(key) is not None
+
+class PrefixQualifier(PatternQualifier):
+    def __init__(self, prefix):
+        super(PrefixQualifier, self).__init__(r'\A' + re.escape(prefix))
+
+class SuffixQualifier(PatternQualifier):
+    def __init__(self, suffix):
+        super(SuffixQualifier, self).__init__(re.escape(suffix) + r'\Z')
+
+class GlobQualifier(PatternQualifier):
+    def __init__(self, pattern):
+        super(GlobQualifier, self).__init__(
+            r'\A' + fnmatch.translate(pattern))
+
+regex = PatternQualifier
+prefix = PrefixQualifier
+suffix = SuffixQualifier
+glob = GlobQualifier
+
+CacheInfo = namedtuple('CacheInfo', 'hits misses maxsize currsize')
+
+# qualifies every item of an array, e.g. `prim(is_int).apply_to('*')`
+ALL = '*'
+
 class ItemQualifierStack:
     """
     In JSON, this would conceptually be the stack of qualified indices that drives the
     processing of an Array.
     """
+    # see `RunnerStack.plan`
+    index_cls = None
 
     def __init__(self, *qualifiers):
+        self._qualifiers = {
+            'all': False,
+            'indices': set(),
+            'sequences': [],
+            'callables': [],
+        }
         self.add(*qualifiers)
 
     @property
@@ -43,22 +129,27 @@ class ItemQualifierStack:
         processors and isolate the relevant indices with different qualifiers.
 
         """
-        if not hasattr(self, '_qualifiers'):
-            self._qualifiers = {
-                'indices': set(),
-                'callables': [],
-            }
         return self._qualifiers
 
     def empty(self):
-        return not (self.qualifiers['indices'] or self.qualifiers['callables'])
+        return not (self.qualifiers['indices'] or self.qualifiers['callables']
+                    or self.qualifiers['sequences'] or self.qualifiers['all'])
 
 
     def add(self, *qualifiers):
         for qualifier in qualifiers:
-            if uls.is_intlike(qualifier):
+            if uls.is_str(qualifier) and qualifier==ALL:
+                # every item qualifies, see `apply()`
+                self.qualifiers['all'] = True
+            elif uls.is_intlike(qualifier):
                 self.qualifiers['indices'].add(qualifier)
                 # when qualifier is integer add to stack of 'indices'
+            elif isinstance(qualifier, SequenceQualifier):
+                self.qualifiers['sequences'].append(qualifier)
+            elif uls.is_rangelike(qualifier):
+                # ranges and slices are kept lazy, rather than expanded
+                self.qualifiers['sequences'].append(
+                    SequenceQualifier(qualifier))
             elif uls.is_iterable(qualifier):
                 # when qualifier is iterable add to stack of 'indices' as well
                 self.qualifiers['indices'].update(i for i in qualifier)
@@ -66,14 +157,51 @@ class ItemQualifierStack:
                 # when qualifier is callable add to 'callables'
                 self.qualifiers['callables'].append(qualifier)
             else:
-                # array structures' qualifiers are limited to 'indices' and
-                # 'callables', anything else is an error.
+                # array structures' qualifiers are limited to 'indices',
+                # 'sequences' and 'callables', anything else is an error.
                 # TODO: more descriptive error
                 raise errors.VinoError('Invalid Qualifier')
+        indices = self.qualifiers['indices']
+        self._sorted_indices = sorted(i for i in indices if uls.is_intlike(i))
+        self._sparse = not (
+            self.qualifiers['callables']
+            or len(self._sorted_indices)!=len(indices)
+            or any(s.inverted for s in self.qualifiers['sequences']))
+
+    def index_match(self, idx, length=None):
+        # is the provided index present in the 'indices' stack, or in one of
+        # the sequences? The length of the array is needed by sequences with
+        # negative values or that are inverted.
+        if idx in self.qualifiers['indices']:
+            return True
+        for seq in self.qualifiers['sequences']:
+            if seq.match(idx, length):
+                return True
+        return False
 
-    def index_match(self, idx):
-        # is the provided index present in the 'indices' stack?
-        return idx in self.qualifiers['indices']
+    def is_sparse(self):
+        """ Can the qualified indices be visited without looking at every
+        item of the array?
+        """
+        return self._sparse
+
+    def matched_indices(self, length):
+        """ The qualified indices of a sparse stack, in ascending order """
+        stop = bisect.bisect_left(self._sorted_indices, length)
+        sources = [s.indices(length) for s in self.qualifiers['sequences']]
+        if stop:
+            start = bisect.bisect_left(self._sorted_indices, 0)
+            sources.append(itertools.islice(self._sorted_indices, start, stop))
+        if len(sources)==1:
+            return iter(sources[0])
+        return self._unique(heapq.merge(*sources))
+
+    def _unique(self, indices):
+        previous = None
+        for i in indices:
+            if i!=previous:
+                yield i
+            previous = i
 
     def call_match(self, idx, data):
         # if any of the 'callables' stack qualifiers returns True for the provided  
@@ -110,21 +238,254 @@ class ItemQualifierStack:
         return state['matches']
 
     def apply(self, data, runner, state):
-        # TODO: Test
+        """
+        Run `runner` on the qualified items of `data`. The error of the first
+        failing item is raised with the position of the item in the array as
+        its `index` attribute, whichever way the items were visited.
+        """
+        rv, failed = self.apply_items(data, runner, state)
+        if failed is None:
+            return rv
+        index, error = failed
+        error.index = index
+        raise error
+
+    def apply_items(self, data, runner, state):
+        """ The items of `data` as validated by `runner`, and the `(index,
+        error)` of the first failing one, if any.
+        """
+        if self.qualifiers['all']:
+            # homogeneous arrays skip matching altogether, and arrays of
+            # primitives may not even go through their items, see
+            # `vectorized`.
+            rv = vec.vectorize(data, runner)
+            if rv is not None:
+                values, index = rv
+                if index is None:
+                    return values, None
+                failed = self.run_item(data, index, runner, state)
+                if failed is not None:
+                    return None, failed
+                # the masks don't agree with the processors, leave it to them
+            run = runner.run
+            rv = []
+            append = rv.append
+            try:
+                for d in data:
+                    append(run(d, state))
+            except errors.ValidationError as e:
+                return None, (len(rv), e)
+            return rv, None
         matches = self._get_matches(state)
+        if self.is_sparse():
+            return self._apply_sparse(data, runner, state, matches)
         rv = []
-        for i,d in enumerate(data): 
-            if self.index_match(i):
-                matches['by_index'].add(i)
-                rv.append(runner.run(d, state))
-            elif self.call_match(i, d):
-                matches['by_call'].add(i)
-                rv.append(runner.run(d, state))
-            else:
-                #matches['not_matched'].add(i)
-                rv.append(d)
+        length = len(data) if self.qualifiers['sequences'] else None
+        i = 0
+        try:
+            for i,d in enumerate(data): 
+                if self.index_match(i, length):
+                    matches['by_index'].add(i)
+                    rv.append(runner.run(d, state))
+                elif self.call_match(i, d):
+                    matches['by_call'].add(i)
+                    rv.append(runner.run(d, state))
+                else:
+                    #matches['not_matched'].add(i)
+                    rv.append(d)
+        except errors.ValidationError as e:
+            return None, (i, e)
+        return rv, None
+
+    def _apply_sparse(self, data, runner, state, matches):
+        # only the qualified items are visited, the others are copied over
+        rv = list(data)
+        by_index = matches['by_index']
+        i = 0
+        try:
+            for i in self.matched_indices(len(rv)):
+                by_index.add(i)
+                rv[i] = runner.run(rv[i], state)
+        except errors.ValidationError as e:
+            return None, (i, e)
+        return rv, None
+
+    @staticmethod
+    def run_item(data, index, runner, state):
+        """ The `(index, error)` of the item at `index`, if it fails """
+        try:
+            runner.run(data[index], state)
+        except errors.ValidationError as e:
+            return index, e
+
+class ChunkedItemQualifierStack(ItemQualifierStack):
+    """
+    Splits arrays of at least `2 * chunk_size` items into ranges of indices
+    that are applied on an `executor` (see `concurrent.futures`), and stitches
+    the results back in order. Qualifiers still see the absolute indices of
+    the items. See `ArrayTypeSchema.chunked()`.
+
+    The error of the first failing item is raised, as it would be without
+    chunking, with the absolute index of that item as its `index` attribute.
+    The chunks run in a copy of the caller's `contextvars` context, so that
+    the budget of a validation (see `vino.deadlines`) covers them, except on
+    a process pool.
+
+    The stack is registered under a token, by which the processes of a
+    process pool find it, along with the `runner` and the `context` it was
+    declared with (see `apply_chunk()`).
+    """
+
+    def __init__(self, *qualifiers, **kwargs):
+        self.executor = kwargs.pop('executor', None)
+        self.chunk_size = kwargs.pop('chunk_size', 100000)
+        self.runner = kwargs.pop('runner', None)
+        self.context = kwargs.pop('context', None)
+        super(ChunkedItemQualifierStack, self).__init__(*qualifiers)
+        self.token = next(_chunked_tokens)
+        _chunked_stacks[self.token] = self
+
+    @classmethod
+    def from_stack(cls, stack, executor, chunk_size, runner=None,
+                   context=None):
+        rv = cls(executor=executor, chunk_size=chunk_size, runner=runner,
+                 context=context)
+        qualifiers = stack.qualifiers
+        rv.add(*qualifiers['indices'])
+        rv.add(*qualifiers['sequences'])
+        rv.add(*qualifiers['callables'])
+        if qualifiers['all']:
+            rv.add(ALL)
         return rv
 
+    def apply_items(self, data, runner, state):
+        length = len(data)
+        if (self.executor is None or length<2*self.chunk_size
+            or (self.is_sparse() and not self.qualifiers['all'])):
+            return super(ChunkedItemQualifierStack, self).apply_items(
+                data, runner, state)
+        if isinstance(self.executor, futures.ProcessPoolExecutor):
+            # neither the runner nor the state are sent to the workers
+            def submit(*args):
+                return self.executor.submit(apply_chunk, *args)
+        else:
+            def submit(*args):
+                # a copy per chunk, a context can't be entered by two
+                # threads at once
+                return self.executor.submit(
+                    contextvars.copy_context().run, apply_chunk,
+                    *(args + (runner, state)))
+        # each chunk collects its own matches, merged once they're done
+        pending = [
+            submit(self.token, data[start:start + self.chunk_size], start,
+                   length)
+            for start in range(0, length, self.chunk_size)]
+        rv = []
+        matches = None if self.qualifiers['all'] else self._get_matches(state)
+        for future in pending:
+            try:
+                items, found, failed = future.result()
+            except BaseException:
+                # out of time, cancelled...
+                for future in pending:
+                    future.cancel()
+                raise
+            if matches is not None:
+                matches['by_index'].update(found['by_index'])
+                matches['by_call'].update(found['by_call'])
+            if failed is not None:
+                for future in pending:
+                    future.cancel()
+                return None, failed
+            rv.extend(items)
+        return rv, None
+
+    def _apply_chunk(self, chunk, offset, length, runner, state):
+        # the items of `chunk` start at index `offset` of the array
+        found = self.init_matches()
+        rv = []
+        i = offset
+        run = runner.run
+        try:
+            if self.qualifiers['all']:
+                for i, d in enumerate(chunk, offset):
+                    rv.append(run(d, state))
+                return rv, found, None
+            length = length if self.qualifiers['sequences'] else None
+            for i, d in enumerate(chunk, offset):
+                if self.index_match(i, length):
+                    found['by_index'].add(i)
+                    rv.append(run(d, state))
+                elif self.call_match(i, d):
+                    found['by_call'].add(i)
+                    rv.append(run(d, state))
+                else:
+                    rv.append(d)
+        except errors.ValidationError as e:
+            return rv, found, (i, e)
+        return rv, found, None
+
+# token -> ChunkedItemQualifierStack. Forked worker processes inherit the
+# stacks built before they were started.
+_chunked_stacks = weakref.WeakValueDictionary()
+_chunked_tokens = itertools.count()
+
+def apply_chunk(token, chunk, offset, length, runner=None, state=None):
+    """
+    Apply the chunked stack registered as `token` to the items of `chunk`.
+    Without a `runner`, as in the processes of a process pool, the items are
+    validated by the runner the stack was declared with, and a state of
+    their own.
+    """
+    stack = _chunked_stacks.get(token)
+    if stack is None:
+        raise errors.VinoError(
+            'The chunked schema is unknown to this process. The workers of '
+            'a process pool must be forked after the schema is built.')
+    if runner is None:
+        runner, state = stack.runner, stack.context.make_state()
+    return stack._apply_chunk(chunk, offset, length, runner, state)
+
+class ColumnarItemQualifierStack(ItemQualifierStack):
+    """
+    Validates arrays of flat objects one property at a time, with the schema
+    of the objects run by `item_runner`, and optionally returns them as a
+    dict of columns. See `ArrayTypeSchema.columnar()` and `vino.columnar`.
+    """
+
+    def __init__(self, *qualifiers, **kwargs):
+        self.item_runner = kwargs.pop('item_runner', None)
+        self.as_columns = kwargs.pop('as_columns', False)
+        super(ColumnarItemQualifierStack, self).__init__(*qualifiers)
+
+    @classmethod
+    def from_stack(cls, stack, item_runner, as_columns=False):
+        rv = cls(item_runner=item_runner, as_columns=as_columns)
+        qualifiers = stack.qualifiers
+        rv.add(*qualifiers['indices'])
+        rv.add(*qualifiers['sequences'])
+        rv.add(*qualifiers['callables'])
+        if qualifiers['all']:
+            rv.add(ALL)
+        return rv
+
+    def apply_items(self, data, runner, state):
+        if self.qualifiers['all'] and self.item_runner is not None:
+            rv = col.apply(data, self.item_runner, state, self.as_columns)
+            if rv is not None:
+                values, index = rv
+                if index is None:
+                    return values, None
+                failed = self.run_item(data, index, runner, state)
+                if failed is not None:
+                    return None, failed
+                # the columns don't agree with the runner, leave it to it
+        rv, failed = super(ColumnarItemQualifierStack, self).apply_items(
+            data, runner, state)
+        if failed is None and self.as_columns:
+            rv = col.transpose(rv, self.item_runner)
+        return rv, failed
+
 class MemberQualifierStack:
     """
     In JSON, this would conceptually be the stack of qualifiers that drives the
@@ -135,6 +496,11 @@ class MemberQualifierStack:
     """
 
     def __init__(self, *qualifiers):
+        self._qualifiers = {
+            'keys': set(),
+            'callables': [],
+            'patterns': [],
+        }
         self.add(*qualifiers)
 
     @property
@@ -146,11 +512,6 @@ class MemberQualifierStack:
         if such control is needed, simply declare processors one after
         the other during Context creation.
         """
-        if not hasattr(self, '_qualifiers'):
-            self._qualifiers = {
-                'keys': set(),
-                'callables': [],
-            }
         return self._qualifiers
 
     def add(self, *qualifiers):
@@ -158,6 +519,8 @@ class MemberQualifierStack:
             if uls.is_str(qualifier):
                 # if the qualifier is a string add it to the 'keys' stack.
                 self.qualifiers['keys'].add(qualifier)
+            elif isinstance(qualifier, PatternQualifier):
+                self.qualifiers['patterns'].append(qualifier)
             elif uls.is_iterable(qualifier):
                 [self.qualifiers['keys'].add(i) for i in qualifier]
             elif callable(qualifier):
@@ -170,10 +533,29 @@ class MemberQualifierStack:
         return key in self.qualifiers['keys']
 
     def call_match(self, key, data):
+        return self.callable_match(key, data) or self.pattern_match(key)
+
+    def callable_match(self, key, data):
         for call in self.qualifiers['callables']:
             if call(key, data):
                 return True
 
+    def pattern_match(self, key):
+        for pattern in self.qualifiers['patterns']:
+            if pattern(key):
+                return True
+
+    def key_only_match(self, key):
+        for call in self.qualifiers['callables']:
+            if isinstance(call, KeyQualifier) and call(key):
+                return True
+        return self.pattern_match(key)
+
+    def value_match(self, key, data):
+        for call in self.qualifiers['callables']:
+            if not isinstance(call, KeyQualifier) and call(key, data):
+                return True
+
     def _get_matches(self, state):
         # TODO: When the state is part of its own class, it should be passed
         # to the qualifier.
@@ -228,47 +610,310 @@ class MemberQualifierStack:
                     data[k] = default
                     matched_keys.add(k)
 
+class MemberQualifierIndex:
+    """
+    Indexes the keys of consecutive `MemberQualifierStacks` of a `RunnerStack`
+    so that an object is validated in a single pass over its keys, rather
+    than in one pass per runner. Each key is mapped to the positions of the
+    runners that qualify it, in the order of their declaration, which is the
+    order in which `MemberQualifierStack.apply` would otherwise be called.
+
+    Runners with callable qualifiers are candidates for every key, their
+    callables are only called with the value as it comes out of the previous
+    runners.
+
+    When `shape_cache_size` is given, the plan resolved for the set of keys of
+    an object is kept in an LRU cache of that size, keyed on the frozen set of
+    keys. The `KeyQualifier` predicates are then only called once per shape.
+
+    The `PatternQualifiers` of all the runners are combined into one regular
+    expression that rules out most keys with a single search, and the runners
+    whose patterns match a key are remembered for the last
+    `pattern_cache_size` keys.
+    """
+    # how a runner matched a key in a resolved shape
+    BY_KEY, BY_CALL, BY_VALUE = 'by_key', 'by_call', 'by_value'
+    pattern_cache_size = 4096
+
+    def __init__(self, stacks, shape_cache_size=None):
+        self.stacks = tuple(stacks)
+        self.shape_cache_size = shape_cache_size
+        if shape_cache_size is not None:
+            self.resolve_shape = functools.lru_cache(shape_cache_size)(
+                self._resolve_shape)
+        # the live sets of keys, see `_process_missing_keys()`
+        self.keys = tuple(q.qualifiers['keys'] for q in self.stacks)
+        # (position, matched_by_key) of the runners to try for unknown keys
+        self.fallback = tuple(
+            (pos, False) for pos, q in enumerate(self.stacks)
+            if q.qualifiers['callables'] or q.qualifiers['patterns'])
+        self._combine_patterns()
+        positions = {}
+        for pos, keys in enumerate(self.keys):
+            for k in keys:
+                positions.setdefault(k, set()).add(pos)
+        self.index = {}
+        for k, by_key in positions.items():
+            candidates = [(pos, True) for pos in by_key]
+            candidates.extend(c for c in self.fallback if c[0] not in by_key)
+            self.index[k] = tuple(sorted(candidates))
+
+    def _combine_patterns(self):
+        self.patterns = tuple(
+            (pos, p) for pos, q in enumerate(self.stacks)
+            for p in q.qualifiers['patterns'])
+        # patterns with groups could hold backreferences that would no longer
+        # point to the right group once combined, they're searched separately
+        combinable = [p.pattern for pos, p in self.patterns
+                      if p.regex.groups==0]
+        self.all_combined = len(combinable)==len(self.patterns)
+        self.combined = None
+        if combinable:
+            try:
+                self.combined = re.compile('|'.join(
+                    '(?:{})'.format(p) for p in combinable))
+            except re.error:
+                # e.g. global flags that are not at the start of the pattern
+                self.all_combined = False
+        self.pattern_positions = functools.lru_cache(self.pattern_cache_size)(
+            self._pattern_positions)
+
+    def _pattern_positions(self, key):
+        """ The positions of the runners whose patterns match the key """
+        if not (self.patterns and uls.is_str(key)):
+            return frozenset()
+        if self.all_combined and not self.combined.search(key):
+            return frozenset()
+        return frozenset(pos for pos, p in self.patterns if p(key))
+
+    def _resolve_shape(self, shape):
+        rv = {}
+        for k in shape:
+            plan = []
+            for pos, matched_by_key in self.index.get(k, self.fallback):
+                q = self.stacks[pos]
+                if matched_by_key:
+                    plan.append((pos, self.BY_KEY))
+                elif pos in self.pattern_positions(k) or q.key_only_match(k):
+                    plan.append((pos, self.BY_CALL))
+                elif any(not isinstance(c, KeyQualifier)
+                         for c in q.qualifiers['callables']):
+                    plan.append((pos, self.BY_VALUE))
+            rv[k] = tuple(plan)
+        return rv
+
+    def shape_cache_info(self):
+        if self.shape_cache_size is None:
+            return None
+        return self.resolve_shape.cache_info()
+
+    def save_matches(self, state):
+        matches = self.stacks[0]._get_matches(state)
+        if matches['by_key'] or matches['by_call']:
+            return set(matches['by_key']), set(matches['by_call'])
+
+    def restore_matches(self, state, saved):
+        by_key, by_call = saved or ((), ())
+        matches = state['matches']
+        matches['by_key'].clear()
+        matches['by_key'].update(by_key)
+        matches['by_call'].clear()
+        matches['by_call'].update(by_call)
+
+    def apply(self, data, runs, state, done=None):
+        """
+        `runs` are the `run` callables of the indexed runners. What each of
+        them returns or raises for a key is kept in `done`, see `replay()`.
+        """
+        if done is None:
+            done = {}
+        matches = self.stacks[0]._get_matches(state)
+        by_key, by_call = matches['by_key'], matches['by_call']
+        if self.shape_cache_size is not None:
+            rv = self._apply_shape(data, runs, state, by_key, by_call, done)
+            self._process_missing_keys(rv, runs, state, by_key, by_call, done)
+            return rv
+        index, fallback = self.index, self.fallback
+        stacks = self.stacks
+        pattern_positions = self.pattern_positions if self.patterns else None
+        rv = {}
+        try:
+            for k,value in data.items():
+                hits = pattern_positions(k) if pattern_positions else ()
+                for pos, matched_by_key in index.get(k, fallback):
+                    if matched_by_key:
+                        by_key.add(k)
+                    elif pos in hits or stacks[pos].callable_match(k, value):
+                        by_call.add(k)
+                    else:
+                        continue
+                    result = runs[pos](value, state)
+                    done[pos, k] = value, result, None
+                    value = result
+                rv[k] = value
+        except errors.ValidationError as e:
+            done[pos, k] = value, None, e
+            raise
+        self._process_missing_keys(rv, runs, state, by_key, by_call, done)
+        return rv
+
+    def _apply_shape(self, data, runs, state, by_key, by_call, done):
+        items = data.items()
+        plan = self.resolve_shape(frozenset(data))
+        stacks = self.stacks
+        BY_KEY, BY_CALL = self.BY_KEY, self.BY_CALL
+        rv = {}
+        try:
+            for k,value in items:
+                for pos, how in plan[k]:
+                    if how is BY_KEY:
+                        by_key.add(k)
+                    elif how is BY_CALL or stacks[pos].value_match(k, value):
+                        by_call.add(k)
+                    else:
+                        continue
+                    result = runs[pos](value, state)
+                    done[pos, k] = value, result, None
+                    value = result
+                rv[k] = value
+        except errors.ValidationError as e:
+            done[pos, k] = value, None, e
+            raise
+        return rv
+
+    def _run(self, pos, matched_by_key, k, value, runs, state, by_key,
+             by_call, done):
+        if matched_by_key:
+            by_key.add(k)
+        elif (pos in self.pattern_positions(k)
+              or self.stacks[pos].callable_match(k, value)):
+            by_call.add(k)
+        else:
+            return value
+        return self._record(runs[pos], pos, k, value, state, done)
+
+    @staticmethod
+    def _record(run, pos, k, value, state, done):
+        try:
+            rv = run(value, state)
+        except errors.ValidationError as e:
+            done[pos, k] = value, None, e
+            raise
+        done[pos, k] = value, rv, None
+        return rv
+
+    def _process_missing_keys(self, data, runs, state, by_key, by_call, done):
+        # Same as `MemberQualifierStack._process_missing_keys()`, with the
+        # default values also going through the runners that follow. The
+        # default of a runner is kept in `done` under the `_undef` key.
+        for pos, keys in enumerate(self.keys):
+            unmatched = keys.difference(by_key)
+            if not unmatched:
+                continue
+            default = self._record(runs[pos], pos, uls._undef, uls._undef,
+                                   state, done)
+            if default is uls._undef:
+                continue
+            for k in unmatched:
+                value = default
+                by_key.add(k)
+                for later, matched_by_key in self.index[k]:
+                    if later>pos:
+                        value = self._run(later, matched_by_key, k, value,
+                                          runs, state, by_key, by_call, done)
+                data[k] = value
+
+    def replay(self, pos, data, run, state, done):
+        """
+        `MemberQualifierStack.apply()` of the runner at `pos` alone, as the
+        runner stack retraces a group that failed (see `RunnerStack.run`).
+        What `apply()` got from a runner for the same key and the same value
+        is taken from `done` rather than run again.
+        """
+        q = self.stacks[pos]
+        matches = q._get_matches(state)
+        rv = {}
+        for k,value in data.items():
+            if q.keys_match(k):
+                matches['by_key'].add(k)
+            elif q.call_match(k, value):
+                matches['by_call'].add(k)
+            else:
+                rv[k] = value
+                continue
+            rv[k] = self.rerun(run, pos, k, value, state, done)
+        unmatched = self.keys[pos].difference(matches['by_key'])
+        if unmatched:
+            default = self.rerun(run, pos, uls._undef, uls._undef, state, done)
+            if default is not uls._undef:
+                for k in unmatched:
+                    rv[k] = default
+                    matches['by_key'].add(k)
+        return rv
+
+    @staticmethod
+    def rerun(run, pos, k, value, state, done):
+        """ `run(value, state)`, unless it's already in `done` """
+        previous = done.get((pos, k))
+        if previous is None or previous[0] is not value:
+            return run(value, state)
+        if previous[2] is not None:
+            raise previous[2]
+        return previous[1]
+
+MemberQualifierStack.index_cls = MemberQualifierIndex
+
 class SequenceQualifier(Qualifier):
+    """
+    Qualifies a range of indices the way a slice would, without expanding it
+    into a set of integers. Negative values count from the end of the array,
+    and the qualifier can be inverted to qualify every index but its own.
+
+        >>> arr(
+        ...     prim(is_str).apply_to(seq(0, 3)),        # data[0:3]
+        ...     prim(is_int).apply_to(seq(-2)),          # data[-2:]
+        ...     prim(allownull).apply_to(~seq(0, None, 2)), # odd indices
+        ... )
+
+    `range` and `slice` objects given to `apply_to()` are turned into
+    sequences.
+    """
 
-    def __init__(self, start=0, step=None, stop=None):
+    def __init__(self, start=0, stop=None, step=None):
         """ specifies a range of items to qualify """
-        self. items = self.set_sequence(start, step, stop)
+        self.slice = self.set_sequence(start, stop, step)
+        self.inverted = False
 
-    def set_sequence(self, start, step, stop):
-        if is_rangelike(start):
+    def set_sequence(self, start, stop, step):
+        if uls.is_rangelike(start):
             if not (stop is None is step):
-                raise err.VinoError(
+                raise errors.VinoError(
                     'Cannot mix range object with additional arguments in '
                     'sequence call.')
             start, stop, step = start.start, start.stop, start.step
-        elif is_listlike(start): # we don't want no generators!
-            rv = self._list_to_range(start, step)
-            
-        for n,s in dict(start=start, stop=stop, step=step):
-            try:
-                s = abs(s)-1 if n=='step' else s
-                if not is_intlike(s, positive=True):
-                    raise TypeError()
-            except TypeError:
-                raise err.VinoError(
+        for n,s in (('start', start), ('stop', stop), ('step', step)):
+            if s is not None and not uls.is_intlike(s):
+                raise errors.VinoError(
                     'Invalid {} value given for sequence: {}'.format(n,s))
+        if step==0:
+            raise errors.VinoError('Sequence step cannot be zero')
+        return slice(start, stop, step)
 
-        return range(start, stop, step)
+    def indices(self, length):
+        """ The qualified indices of an array of `length` items, in ascending
+        order. Inverted sequences have no such range, see `match()`.
+        """
+        rv = range(length)[self.slice]
+        return rv[::-1] if rv.step<0 else rv
+
+    def match(self, index, length):
+        return (index in self.indices(length)) is not self.inverted
 
     def __invert__(self):
         """ switch between qualifier and disqualifier """
-        _current = self._qualifier_fnc
-        self._qualifier_fnc = {
-            self._qualify: self._disqualify,
-            self._disqualify:self._qualify}[_current]
-        return self
-
-    def _qualify(self, *a, **kw):
-        pass
-
-    _qualifier_fnc = _qualify
-
-    def _disqualify(self, *a, **kw):
-        pass
+        rv = self.__class__.__new__(self.__class__)
+        rv.slice = self.slice
+        rv.inverted = not self.inverted
+        return rv
 
 seq = sequence = SequenceQualifier
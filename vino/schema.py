@@ -1,5 +1,8 @@
 from . import contexts as ctx
 from . import qualifiers as qls
+from . import compiler as cpl
+from . import jsonstream as jss
+from . import aio
 from . import utils as uls
 from . import errors as err
 from .processors import runners as rnr
@@ -72,6 +75,69 @@ class SchemaBase:
             required = vld.required
         return (required,) + tuple(rv)
 
+    def compile(self):
+        """
+        Return a `CompiledSchema` whose `validate()` method produces the same
+        results as the schema's, without going through the interpreted engine.
+        See `vino.compiler`.
+        """
+        return cpl.compile_schema(self)
+
+    def loads(self, text, **kwargs):
+        """
+        Decode and validate the JSON document `text`, dropping unknown
+        properties as they're decoded. See `jsonstream.loads`.
+        """
+        return jss.loads(text, self, **kwargs)
+
+    def validate_dumps(self, data=uls._undef, separators=None):
+        """ Validate `data` and return it serialized as JSON """
+        return jss.validate_dumps(self, data, separators)
+
+    def validate_dump(self, data, fp, separators=None):
+        """ Validate `data` and write it serialized as JSON to `fp` """
+        return jss.validate_dump(self, data, fp, separators)
+
+    def validate_many(self, documents, gc_threshold=None):
+        """
+        See `Context.validate_many`. The values of all the documents bound
+        for a `batched()` processor are looked up together, see `vino.aio`.
+        """
+        if aio.has_batches(self):
+            return aio.validate_many_batched(self, documents, gc_threshold)
+        return super(SchemaBase, self).validate_many(documents, gc_threshold)
+
+    async def validate_async(self, data=uls._undef, limit=None,
+                             yield_every=None, yield_interval=None):
+        """
+        Validate `data` with processors that may be coroutine functions, at
+        most `limit` of which are awaited at once. The event loop is given
+        back every `yield_every` items or members, or `yield_interval`
+        seconds. See `vino.aio`.
+
+            >>> data = await user.validate_async(payload, limit=10)
+        """
+        return await aio.validate(self, data, limit, yield_every,
+                                  yield_interval)
+
+    async def validate_many_async(self, documents, limit=None, window=None):
+        """
+        Validate the `documents` concurrently, `window` at a time
+        (`aio.window_size` by default), and return a
+        `contexts.BatchResult`. The values of the documents of a window
+        bound for a `batched()` processor are looked up together. See
+        `vino.aio`.
+        """
+        return await aio.validate_many(self, documents, limit, window)
+
+    def validate_offloaded(self, data=uls._undef, limit=None):
+        """
+        Validate `data`, running the processors wrapped in `offload()` on a
+        shared pool of threads, concurrently for independent members and
+        items. Blocks until done, see `vino.aio`.
+        """
+        return aio.validate_offloaded(self, data, limit)
+
     def add_empty_clause(self, processors):
         rv = processors + (vld.not_allowempty,)
         return rv
@@ -117,8 +183,28 @@ class PrimitiveTypeSchema(SchemaBase, ctx.Context):
             "Cannot qualify processors inside primitive declarations.")
             
 class ArrayTypeSchema(SchemaBase, ctx.Context):
+    """
+    Declares arrays. With a `typecode` (see the `array` module) or a NumPy
+    `dtype`, arrays of numbers come out packed in an `array.array` or a NumPy
+    array once their items are validated, see `marshalling.TypedArray`.
 
-    def __init__(self, *processors):
+        >>> series = arr(prim(is_int).apply_to('*'), typecode='l')
+
+    Arrays otherwise come out as lists. `array.array`, NumPy arrays and
+    memoryviews are accepted and unpacked to lists of Python numbers, whether
+    NumPy is installed or not. `bytes` and `bytearray` are not arrays.
+    """
+    # the `TypedArray` the arrays are packed with, if any
+    output = None
+
+    def __init__(self, *processors, **kwargs):
+        typecode = kwargs.pop('typecode', None)
+        dtype = kwargs.pop('dtype', None)
+        if kwargs:
+            raise TypeError('Unexpected arguments: {}'.format(
+                ', '.join(kwargs)))
+        if typecode is not None or dtype is not None:
+            self.output = msh.TypedArray(typecode, dtype)
         # add REQUIRED, EMPTY, NULL processors if missing
         processors = self.add_mandatory_processors(processors)
         processors = list(processors)
@@ -128,6 +214,79 @@ class ArrayTypeSchema(SchemaBase, ctx.Context):
         super(ArrayTypeSchema, self).__init__(
             *processors, qualifier_stack_cls=qls.ItemQualifierStack)
 
+    def spawn(self):
+        rv = super(ArrayTypeSchema, self).spawn()
+        rv.output = self.output
+        return rv
+
+    def finalize(self, data):
+        if self.output is None or data is None:
+            return data
+        try:
+            return self.output.run(data)
+        except err.ValidationError as e:
+            e_stack = err.ValidationErrorStack('Validation Errors').append(e)
+            self.runners._copy_data_in_err(e_stack, data)
+            raise e_stack
+
+    def chunked(self, executor, chunk_size=100000):
+        """
+        Return a new schema that splits arrays of at least `2 * chunk_size`
+        items into chunks validated on `executor`, a `concurrent.futures`
+        executor. Items are returned in order and qualifiers see their
+        absolute indices. Only the qualified runners declared so far are
+        chunked.
+
+            >>> pool = ProcessPoolExecutor(8)
+            >>> readings = arr(prim(is_int).apply_to('*')).chunked(pool)
+
+        A thread pool shares the runners, the array's state and the
+        deadline of the validation (see `vino.deadlines`). The schema
+        is not sent to the processes of a process pool, only the items and
+        their results are pickled: like `ParallelValidator`, the workers
+        have to be forked (see `multiprocessing`) once the schema is built,
+        which they are on the first submission to the pool. They validate
+        each chunk with the interpreted schema and a state of its own.
+        """
+        rv = self.spawn()
+        runners = []
+        for runner in rv.runners.runners:
+            if isinstance(runner['qualifiers'], qls.ItemQualifierStack):
+                runner = dict(runner, qualifiers=
+                    qls.ChunkedItemQualifierStack.from_stack(
+                        runner['qualifiers'], executor, chunk_size,
+                        runner['runner'], rv))
+            runners.append(runner)
+        rv.runners.runners = runners
+        return rv
+
+    def columnar(self, as_columns=False):
+        """
+        Return a new schema that validates arrays of flat objects one
+        property at a time rather than one object at a time, and with
+        `as_columns` returns them as a dict of columns instead of a list of
+        objects. See `vino.columnar` for the object schemas it applies to,
+        others are still validated one object at a time.
+
+            >>> events = arr(obj(
+            ...     prim(is_int, between(0)).apply_to('ts'),
+            ...     prim(is_str).apply_to('kind'),
+            ... ).apply_to('*')).columnar(as_columns=True)
+            >>> events.validate([{'ts': 1, 'kind': 'view'}])
+            {'ts': [1], 'kind': ['view']}
+        """
+        rv = self.spawn()
+        runners = []
+        for runner in rv.runners.runners:
+            q = runner['qualifiers']
+            if isinstance(q, qls.ItemQualifierStack) and q.qualifiers['all']:
+                runner = dict(runner, qualifiers=
+                    qls.ColumnarItemQualifierStack.from_stack(
+                        q, runner['runner'], as_columns))
+            runners.append(runner)
+        rv.runners.runners = runners
+        return rv
+
 class ObjectTypeSchema(SchemaBase, ctx.Context):
     
     def __init__(self, *processors):
@@ -141,8 +300,36 @@ class ObjectTypeSchema(SchemaBase, ctx.Context):
             *processors, qualifier_stack_cls=qls.MemberQualifierStack)
 
 
-    def run(self, *a, **kw):
-        pre_rv = super(ObjectTypeSchema, self).run(*a, **kw)
+    def cache_shapes(self, maxsize=128):
+        """
+        Return a new schema that caches, for the last `maxsize` distinct sets
+        of keys it validated, which runners apply to each key. Predicates
+        wrapped in `keyonly()` are then called once per set of keys instead of
+        once per object. Other callable qualifiers still look at every value.
+
+            >>> events = obj(
+            ...     prim(is_int).apply_to(keyonly(lambda k: k.endswith('_at'))),
+            ...     unmatched_properties('remove'),
+            ... ).cache_shapes(maxsize=32)
+        """
+        rv = self.spawn()
+        rv.runners.shape_cache_size = maxsize
+        rv.runners.build_plan()
+        return rv
+
+    def shape_cache_info(self):
+        """ Hits and misses of the caches set up by `cache_shapes()` """
+        hits = misses = currsize = 0
+        maxsize = self.runners.shape_cache_size
+        for index, runners, runs in self.runners.plan:
+            info = index.shape_cache_info() if index is not None else None
+            if info is not None:
+                hits += info.hits
+                misses += info.misses
+                currsize += info.currsize
+        return qls.CacheInfo(hits, misses, maxsize, currsize)
+
+    def finalize(self, pre_rv):
         try:
             return {k:v for k,v in pre_rv.items() if v is not uls._undef}
         except AttributeError:
@@ -151,6 +338,80 @@ class ObjectTypeSchema(SchemaBase, ctx.Context):
 
 
 
+class MapEntriesProcessor(prc.Processor):
+    """
+    Applies a key processor and a value processor to every entry of an
+    object, in a single loop. Entries whose key or value comes out as
+    missing (`_undef`) are dropped.
+    """
+
+    def __init__(self, values, keys=None):
+        self.values = rnr.Runner(values)
+        self.keys = None if keys is None else rnr.Runner(keys)
+
+    def run(self, data, state):
+        if data is None:
+            # leave it to the null clause
+            return data
+        run_value = self.values.run
+        if self.keys is None and vld.owned_objects.get() is None:
+            # the data is the object's own copy (see `is_object_type`), so
+            # values are replaced in place.
+            dropped = []
+            for k,v in data.items():
+                v = run_value(v, state)
+                if v is uls._undef:
+                    dropped.append(k)
+                else:
+                    data[k] = v
+            for k in dropped:
+                del data[k]
+            return data
+        run_key = self.keys.run if self.keys else None
+        rv = {}
+        for k,v in data.items():
+            if run_key is not None:
+                k = run_key(k, state)
+                if k is uls._undef:
+                    continue
+            v = run_value(v, state)
+            if v is not uls._undef:
+                rv[k] = v
+        return rv
+
+
+class MapTypeSchema(SchemaBase, ctx.Context):
+    """
+    Declares objects used as maps, i.e. with arbitrary keys whose values all
+    follow the same schema. The keys can also be given their own schema.
+
+        >>> users = dictof(
+        ...     obj(prim(is_str).apply_to('name')),
+        ...     maxlength(100000),
+        ...     keys=prim(is_str, userid_format),
+        ... )
+
+    Entries are validated in a single loop, without the matching machinery of
+    `ObjectTypeSchema`.
+    """
+
+    def __init__(self, values, *processors, **kwargs):
+        keys = kwargs.pop('keys', None)
+        if kwargs:
+            raise TypeError('Unexpected arguments: {}'.format(
+                ', '.join(kwargs)))
+        # add REQUIRED, EMPTY, NULL processors if missing
+        processors = self.add_mandatory_processors(processors)
+        processors = list(processors)
+        # Insert `is_object_type` processor in second place after `REQUIRED`
+        # followed by the entries.
+        processors[1:1] = [vld.is_object_type, 
+                           MapEntriesProcessor(values, keys=keys)]
+        super(MapTypeSchema, self).__init__(*processors)
+
+
 prim = PrimitiveTypeSchema
 arr = ArrayTypeSchema
 obj = ObjectTypeSchema
+dictof = MapTypeSchema
+stream = ctx.StreamContext
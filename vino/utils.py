@@ -5,6 +5,9 @@ Python types. Note that Vino does not provide any custom types, this is simply
 to ensure that third-party libraries that extend or redefine what it means for
 an object to be of a certain type may still pass the checks.
 """
+import gc
+import threading
+import contextlib
 
 # sentinel: to be used only if you're extending vino, or providing a
 # validator that knows how to use it.
@@ -76,6 +79,26 @@ def is_str(value):
 def is_bytes(value):
     return hasattr(value, '__iter__') and hasattr(value, 'decode')
 
+def is_buffer(value):
+    """ Does the value expose a one dimensional buffer, e.g. `bytes`,
+    `bytearray`, `memoryview`, `array.array` or a NumPy array? """
+    try:
+        with memoryview(value) as view:
+            return view.ndim==1
+    except (TypeError, ValueError):
+        return False
+
+def is_empty(value):
+    """ Is the value an empty string, container or buffer? """
+    try:
+        if value in ((), {}, '', set(), []):
+            return True
+    except ValueError:
+        # NumPy arrays compare element-wise
+        pass
+    return (hasattr(value, '__len__') and not is_str(value)
+            and is_buffer(value) and len(value)==0)
+
 def is_boolean(value, int_as_bool=False):
     if not int_as_bool:
         if value==1 or value==0:
@@ -98,6 +121,9 @@ def is_numberlike(value, exclude_decimal=False):
         return False
     return True
 
+# proxy classes are created once per proxied class, whatever the thread
+_proxy_cache_lock = threading.Lock()
+
 class Proxy:
     __slots__ = ["_obj", "__weakref__"]
 
@@ -167,17 +193,37 @@ class Proxy:
         class must hold its own cache)
         """
 
-        try:
-            cache = cls.__dict__["_class_proxy_cache"]
-        except KeyError:
-            cls._class_proxy_cache = cache = {}
+        with _proxy_cache_lock:
+            try:
+                cache = cls.__dict__["_class_proxy_cache"]
+            except KeyError:
+                cls._class_proxy_cache = cache = {}
 
-        try:
-            theclass = cache[obj.__class__]
-        except KeyError:
-            cache[obj.__class__] = theclass = cls._create_class_proxy(
-                obj.__class__)
+            try:
+                theclass = cache[obj.__class__]
+            except KeyError:
+                cache[obj.__class__] = theclass = cls._create_class_proxy(
+                    obj.__class__)
 
         ins = super(Proxy, cls).__new__(theclass)
         theclass.__init__(ins, obj, *args, **kwargs)
         return ins
+
+
+@contextlib.contextmanager
+def gc_tuned(threshold=None):
+    """ Temporarily set the thresholds of the garbage collector, e.g. during
+    large batches that allocate many long-lived objects. A threshold of 0
+    disables automatic collection. `None` leaves the collector as is.
+    """
+    if threshold is None:
+        yield
+        return
+    if is_intlike(threshold):
+        threshold = (threshold,)
+    previous = gc.get_threshold()
+    gc.set_threshold(*threshold)
+    try:
+        yield
+    finally:
+        gc.set_threshold(*previous)
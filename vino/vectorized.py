@@ -0,0 +1,257 @@
+import math
+from . import contexts as ctx
+from . import errors as err
+from .processors import runners as rnr
+from .processors import validating as vld
+from .processors import marshalling as msh
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+"""
+Vectorized validation of arrays of primitives, with NumPy when it's
+installed.
+
+When every item of an array goes through a primitive schema made only of
+built-in checks (`required`, `allownull`, `allowempty`, `is_int`, `is_str`,
+`between`, `one_of`, `maxlength`), the checks are evaluated on the whole array
+at once rather than item by item. Nothing changes in the declaration.
+
+    >>> readings = arr(prim(is_int, between(-50, 150)).apply_to('*'))
+    >>> readings.validate(values)
+
+The items that fail are found from boolean masks, and the first of them is
+validated again by its schema, so that the error raised is the one the
+regular path would have raised (see `ItemQualifierStack.apply()`).
+
+Arrays shorter than `min_length`, items that are not `None`, booleans,
+`int`, `float` or `str`, integers beyond 64 bits, and schemas with any other
+processor or with callbacks are validated the regular way.
+"""
+
+# arrays shorter than that aren't worth the conversion
+min_length = 256
+
+# processor type -> function returning the checks of a processor, see
+# `vectorizes()`
+_factories = {}
+
+NONE, BOOL, INT, FLOAT, STR = range(5)
+_codes = {type(None): NONE, bool: BOOL, int: INT, float: FLOAT, str: STR}
+
+
+class Fallback(Exception):
+    """ The array has to be validated the regular way """
+
+
+class Column:
+    """
+    The items of an array, and the NumPy arrays the checks look at, built
+    as they're needed. `values` are the items the array ends up with.
+    """
+
+    def __init__(self, data):
+        self._objects = None
+        self._lengths = None
+        self.values = list(data)
+        self.length = len(self.values)
+        try:
+            self.codes = np.fromiter(
+                map(_codes.__getitem__, map(type, self.values)), np.int8,
+                self.length)
+        except KeyError:
+            raise Fallback('unsupported item type')
+
+    def kind(self, *codes):
+        """ Mask of the items of the given type codes """
+        if len(codes)==1:
+            return self.codes==codes[0]
+        return np.isin(self.codes, codes)
+
+    def objects(self):
+        if self._objects is None:
+            self._objects = np.empty(self.length, dtype=object)
+            self._objects[:] = self.values
+        return self._objects
+
+    def numbers(self, mask, dtype):
+        """ The items of `mask` converted to `dtype` """
+        # raises OverflowError for integers beyond 64 bits
+        return self.objects()[mask].astype(dtype)
+
+    def lengths(self):
+        """ Length of the strings, 0 for other items """
+        if self._lengths is None:
+            strs = self.kind(STR)
+            self._lengths = np.zeros(self.length, dtype=np.int64)
+            self._lengths[strs] = np.fromiter(
+                map(len, self.objects()[strs]), np.int64)
+        return self._lengths
+
+    def truncate(self, maxlength):
+        for i in np.flatnonzero(self.lengths()>maxlength):
+            self.values[i] = self.values[i][:maxlength]
+        self._objects = None
+        self._lengths = np.minimum(self._lengths, maxlength)
+
+
+def vectorizes(*keys):
+    """ Register a function that returns the checks of the processors of
+    type (or identity) `keys`, or None when a processor can't be vectorized.
+    A check takes a `Column` and returns the mask of the failing items, if
+    any.
+    """
+    def decorator(fnc):
+        for key in keys:
+            _factories[key] = fnc
+        return fnc
+    return decorator
+
+@vectorizes(vld.Required, vld.is_primitive_type)
+def passes(processor):
+    # items are never missing, and all the supported types are primitives
+    return []
+
+@vectorizes(vld.NotAllowNull)
+def not_allownull(processor):
+    return [lambda c: c.kind(NONE)] if processor.flag else []
+
+@vectorizes(vld.NotAllowEmpty)
+def not_allowempty(processor):
+    if not processor.flag:
+        return []
+    return [lambda c: c.kind(STR) & (c.lengths()==0)]
+
+@vectorizes(vld.is_int)
+def is_int(processor):
+    if processor.flag:
+        return [lambda c: ~c.kind(INT, NONE)]
+    return [lambda c: c.kind(INT)]
+
+@vectorizes(vld.is_str)
+def is_str(processor):
+    if processor.flag:
+        return [lambda c: ~c.kind(STR, NONE)]
+    return [lambda c: c.kind(STR)]
+
+def exact_bound(bound):
+    # bounds that compare the same to int64 and float64 items as they do in
+    # Python
+    return bound is None or (type(bound) in (int, float)
+                             and abs(bound)<=2**53)
+
+def outside(values, minimum, maximum):
+    rv = np.zeros(len(values), dtype=bool)
+    if minimum is not None:
+        rv |= values<minimum
+    if maximum is not None:
+        rv |= values>maximum
+    return rv
+
+@vectorizes(vld.Between)
+def between(processor):
+    minimum, maximum = processor.minimum, processor.maximum
+    if not (exact_bound(minimum) and exact_bound(maximum)):
+        return None
+    # the same bounds, for integers
+    int_min = None if minimum is None else math.ceil(minimum)
+    int_max = None if maximum is None else math.floor(maximum)
+    def check(c):
+        rv = c.kind(STR)
+        ints = c.kind(BOOL, INT)
+        if ints.any():
+            rv[ints] = outside(c.numbers(ints, np.int64), int_min, int_max)
+        floats = c.kind(FLOAT)
+        if floats.any():
+            rv[floats] = outside(c.numbers(floats, np.float64), minimum,
+                                 maximum)
+        return rv
+    return [check]
+
+@vectorizes(vld.OneOf)
+def one_of(processor):
+    def check(c):
+        found = np.fromiter(map(processor.values.__contains__, c.values),
+                            bool, c.length)
+        return ~(found | c.kind(NONE))
+    return [check]
+
+@vectorizes(msh.MaxLength)
+def maxlength(processor):
+    if processor.maxlength<0:
+        return []
+    def check(c):
+        # numbers have no length
+        rv = c.kind(BOOL, INT, FLOAT)
+        if processor.truncate:
+            c.truncate(processor.maxlength)
+        else:
+            rv |= c.lengths()>processor.maxlength
+        return rv
+    return [check]
+
+
+def plan(runner):
+    """ The checks of the item schema run by `runner`, or None if they can't
+    be evaluated on whole arrays.
+    """
+    return getattr(runner, 'vectorized_plan', None)
+
+@rnr.describes('vectorized_plan')
+def _plan(runner):
+    context = getattr(runner, '_raw_processor', None)
+    if (not isinstance(context, ctx.Context) or has_callbacks(runner)
+        or type(context).run is not ctx.Context.run
+        or type(context).finalize is not ctx.Context.finalize
+        or type(context.runners).run is not rnr.RunnerStack.run):
+        return None
+    rv = []
+    for entry in context.runners.runners:
+        r = entry['runner']
+        if entry['qualifiers'] or has_callbacks(r):
+            return None
+        processor = r._raw_processor
+        try:
+            factory = _factories.get(type(processor)) or _factories.get(
+                processor)
+        except TypeError:
+            # unhashable
+            return None
+        checks = factory(processor) if factory is not None else None
+        if checks is None:
+            return None
+        rv.extend(checks)
+    return tuple(rv)
+
+def has_callbacks(runner):
+    processor = runner.processor
+    return bool(processor.default or processor.override or processor.failsafe)
+
+
+def vectorize(data, runner):
+    """
+    The items of `data` as validated by `runner`, and the index of the first
+    one that fails or None, or None if `runner` or `data` can't be
+    vectorized. Failing items are not validated again.
+    """
+    if np is None:
+        return None
+    checks = plan(runner)
+    if checks is None:
+        return None
+    if len(data)<min_length:
+        return None
+    try:
+        column = Column(data)
+        failed = None
+        for check in checks:
+            mask = check(column)
+            if mask is not None:
+                failed = mask if failed is None else failed | mask
+    except (Fallback, OverflowError):
+        return None
+    if failed is not None and failed.any():
+        return column.values, int(np.argmax(failed))
+    return column.values, None